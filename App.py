@@ -3,6 +3,7 @@ import sys
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from Dir.Main import Ui_Main
 from Dir.LoginWidget import LoginWidget
+from Dir.data_service import data_service
 
 def main():
     try:
@@ -15,7 +16,9 @@ def main():
             ui = Ui_Main()
             ui.setupUi(Main, user=user)
             Main.show()
-            sys.exit(app.exec_())
+            exit_code = app.exec_()
+            data_service.shutdown()
+            sys.exit(exit_code)
         else:
             sys.exit(0)
     except Exception as e:
@@ -0,0 +1,142 @@
+from PyQt5 import QtCore, QtWidgets
+from .backup import backup_manager
+from .change_watcher import change_watcher
+from .data_service import data_service
+from .database import db
+from .date_utils import gregorian_to_jalali
+from .migrations import CHANGE_LOG_TABLES
+
+
+class BackupDialog(QtWidgets.QDialog):
+    """The backup catalog: lists each backup's manifest, verifies and restores backups."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.backups = []
+        self.init_ui()
+        self.load_backups()
+
+    def init_ui(self):
+        self.setWindowTitle("بازیابی از پشتیبان")
+        self.setStyleSheet("background: #fff; font-family: 'Dubai Medium';")
+        self.setMinimumSize(560, 420)
+        layout = QtWidgets.QVBoxLayout(self)
+        title = QtWidgets.QLabel("نسخه‌های پشتیبان")
+        title.setStyleSheet("font-size: 16pt; color: #3c096c;")
+        layout.addWidget(title)
+        self.list_widget = QtWidgets.QListWidget()
+        self.list_widget.setStyleSheet("font-size: 12pt; font-family: 'B Yekan';")
+        self.list_widget.currentRowChanged.connect(self.update_buttons)
+        layout.addWidget(self.list_widget)
+        buttons = QtWidgets.QHBoxLayout()
+        self.verify_btn = QtWidgets.QPushButton("بررسی سلامت")
+        self.verify_btn.setStyleSheet("background: #2c6e49; color: white; padding: 10px; border-radius: 5px;")
+        self.verify_btn.clicked.connect(self.verify_selected)
+        self.restore_btn = QtWidgets.QPushButton("بازیابی")
+        self.restore_btn.setStyleSheet("background: #d32f2f; color: white; padding: 10px; border-radius: 5px;")
+        self.restore_btn.clicked.connect(self.restore_selected)
+        close_btn = QtWidgets.QPushButton("بستن")
+        close_btn.setStyleSheet("background: #888; color: white; padding: 10px; border-radius: 5px;")
+        close_btn.clicked.connect(self.reject)
+        buttons.addWidget(self.verify_btn)
+        buttons.addWidget(self.restore_btn)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+        self.update_buttons()
+
+    def load_backups(self):
+        # The catalog is read from the manifests, without opening any backup
+        data_service.submit(backup_manager.backups).then(self.show_backups, self.show_error)
+
+    def show_backups(self, backups):
+        self.backups = backups
+        self.list_widget.clear()
+        for backup in backups:
+            self.list_widget.addItem(self.backup_text(backup))
+        if not backups:
+            self.list_widget.addItem("هنوز نسخه پشتیبانی ایجاد نشده است")
+        self.update_buttons()
+
+    @staticmethod
+    def backup_text(backup):
+        created = f"{gregorian_to_jalali(backup.created.strftime('%Y-%m-%d'))} {backup.created.strftime('%H:%M')}"
+        parts = [created]
+        if 'members' in backup.row_counts:
+            parts.append(f"اعضا: {backup.row_counts['members']}")
+        if 'member_payments' in backup.row_counts:
+            parts.append(f"پرداخت‌ها: {backup.row_counts['member_payments']}")
+        if backup.size:
+            parts.append(f"{backup.size / (1024 * 1024):.1f} MB")
+        if backup.schema_version is not None:
+            parts.append(f"نسخه {backup.schema_version}")
+        return " | ".join(parts)
+
+    def selected_backup(self):
+        row = self.list_widget.currentRow()
+        return self.backups[row] if 0 <= row < len(self.backups) else None
+
+    def update_buttons(self, *_):
+        selected = self.selected_backup() is not None
+        self.verify_btn.setEnabled(selected)
+        self.restore_btn.setEnabled(selected)
+
+    def set_busy(self, busy):
+        self.verify_btn.setEnabled(not busy and self.selected_backup() is not None)
+        self.restore_btn.setEnabled(not busy and self.selected_backup() is not None)
+        self.list_widget.setEnabled(not busy)
+        if busy:
+            QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        else:
+            QtWidgets.QApplication.restoreOverrideCursor()
+
+    def verify_selected(self):
+        backup = self.selected_backup()
+        if backup is None:
+            return
+        self.set_busy(True)
+        data_service.submit(backup_manager.verify, backup).then(self.show_verify_result, self.show_error)
+
+    def show_verify_result(self, problems):
+        self.set_busy(False)
+        if problems:
+            QtWidgets.QMessageBox.warning(self, "بررسی سلامت", "نسخه پشتیبان معیوب است:\n" + "\n".join(problems[:10]))
+        else:
+            QtWidgets.QMessageBox.information(self, "بررسی سلامت", "نسخه پشتیبان سالم است.")
+
+    def restore_selected(self):
+        backup = self.selected_backup()
+        if backup is None:
+            return
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "تایید بازیابی",
+            f"اطلاعات فعلی با نسخه پشتیبان زیر جایگزین می‌شود:\n{self.backup_text(backup)}\n\n"
+            "از اطلاعات فعلی پیش از بازیابی یک نسخه پشتیبان گرفته می‌شود. ادامه می‌دهید؟",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            QtWidgets.QMessageBox.No
+        )
+        if reply != QtWidgets.QMessageBox.Yes:
+            return
+        self.set_busy(True)
+        # The watcher reads the database from the GUI thread; it must not reconnect mid-swap
+        change_watcher.stop()
+        data_service.submit(backup_manager.restore, backup).then(self.restored, self.restore_failed)
+
+    def restored(self, previous):
+        # Every in-memory copy and open view now describes the replaced database
+        for table in CHANGE_LOG_TABLES:
+            db.notify_change(table, None)
+        change_watcher.start()
+        self.set_busy(False)
+        QtWidgets.QMessageBox.information(
+            self, "بازیابی موفق",
+            f"اطلاعات با موفقیت بازیابی شد.\nنسخه پشتیبان اطلاعات قبلی:\n{previous.path}")
+        self.load_backups()
+
+    def restore_failed(self, error):
+        change_watcher.start()
+        self.show_error(error)
+
+    def show_error(self, error):
+        self.set_busy(False)
+        QtWidgets.QMessageBox.critical(self, "خطا", f"عملیات با خطا مواجه شد:\n{error}")
@@ -1,7 +1,9 @@
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import Qt
 import sqlite3
+from .change_bus import change_bus
 from .database import db
+from .member_index import member_index
 
 class ExpiringMembersWidget(QtWidgets.QWidget):
     def get_expiring_count(self):
@@ -12,11 +14,18 @@ class ExpiringMembersWidget(QtWidgets.QWidget):
             if "خطا" not in text:
                 count += 1
         return count
-    def __init__(self, parent=None, days_left=7):
+    def __init__(self, parent=None, days_left=7, load=True):
         super().__init__(parent)
         self.days_left = days_left
         self.init_ui()
-        self.populate_expiring_members()
+        if load:
+            self.populate_expiring_members()
+        change_bus.changed.connect(self.on_data_changed)
+
+    def on_data_changed(self, changes):
+        # End dates only change with member rows; the list is rebuilt from the in-memory index
+        if 'members' in changes:
+            self.populate_expiring_members()
 
     def init_ui(self):
         layout = QtWidgets.QVBoxLayout(self)
@@ -30,7 +39,10 @@ class ExpiringMembersWidget(QtWidgets.QWidget):
 
     def populate_expiring_members(self):
         try:
-            rows = db.get_expiring_members(self.days_left)
+            if member_index.ready:
+                rows = member_index.expiring(self.days_left)
+            else:
+                rows = db.get_expiring_members(self.days_left)
             self.listWidget.clear()
             for row in rows:
                 name = row.get('name', '')
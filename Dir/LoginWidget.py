@@ -6,6 +6,7 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon, QPixmap, QPalette, QColor
 
 from .database import db
+from .data_service import data_service
 
 class LoginWidget(QDialog):
     login_successful = pyqtSignal(dict)  
@@ -125,6 +126,7 @@ class LoginWidget(QDialog):
         
         # Login button
         login_btn = QPushButton('ورود')
+        self.login_btn = login_btn
         login_btn.clicked.connect(self.authenticate)
         login_btn.setCursor(Qt.PointingHandCursor)
         login_btn.setMinimumHeight(44)
@@ -178,7 +180,15 @@ class LoginWidget(QDialog):
         if not username or not password:
             self.show_error('لطفا نام کاربری و رمز عبور را وارد کنید')
             return
-        user = db.verify_user(username, password)
+        if not self.login_btn.isEnabled():
+            return  # A check is already running
+        # bcrypt is deliberately slow, so the check runs on the data service thread
+        self.login_btn.setEnabled(False)
+        data_service.submit(db.verify_user, username, password).then(
+            self.on_verified, self.on_verify_failed)
+
+    def on_verified(self, user):
+        self.login_btn.setEnabled(True)
         if user:
             if user.get('role') == 'admin':
                 self.user = user  # Store user info for later use
@@ -188,6 +198,10 @@ class LoginWidget(QDialog):
                 self.show_error('دسترسی فقط برای مدیران مجاز است.')
         else:
             self.show_error('رمز عبور یا نام کاربری را درست وارد کنید')
+
+    def on_verify_failed(self, error):
+        self.login_btn.setEnabled(True)
+        self.show_error(f'خطا در بررسی اطلاعات ورود: {error}')
     
     def show_error(self, message):
         """Show an error message."""
@@ -1,15 +1,16 @@
 
 from PyQt5 import QtCore, QtGui, QtWidgets
-from .MembersWidget import MembersWidget
-from .ManageWidget import ManageWidget
-from .SettingWidget import SettingWidget
-from jdatetime import datetime as jdatetime
 import datetime
 from .LoginWidget import LoginWidget
+from .change_bus import change_bus
+from .change_watcher import change_watcher
 from .database import db
+from .date_utils import get_current_jalali_date
+from .data_service import data_service
+from .member_index import member_index
+from .startup_scheduler import StartupScheduler
 
 class Ui_Main(object):
-    from .MusicPlayer import MusicPlayer
     def show_screensaver(self):
         from .ScreenSaver import ScreenSaverWidget
         if hasattr(self, 'screensaverWidget') and self.screensaverWidget is not None:
@@ -26,17 +27,23 @@ class Ui_Main(object):
             self.screensaverWidget.deleteLater()
             self.screensaverWidget = None
         self.show_dashboard()
-    def show_manage_area(self):
+    def ensure_manage_widget(self):
         if not hasattr(self, 'manageWidget'):
-            self.manageWidget = ManageWidget(self.screenWidget)
-            self.verticalLayout_6.addWidget(self.manageWidget)
-        self.show_only_in_screenWidget(self.manageWidget)
+            from .ManageWidget import ManageWidget
+            self.manageWidget = self.add_screen(ManageWidget(self.screenWidget))
+        return self.manageWidget
 
-    def show_setting_area(self):
+    def show_manage_area(self):
+        self.show_only_in_screenWidget(self.ensure_manage_widget())
+
+    def ensure_setting_widget(self):
         if not hasattr(self, 'settingWidget'):
-            self.settingWidget = SettingWidget(self.screenWidget)
-            self.verticalLayout_6.addWidget(self.settingWidget)
-        self.show_only_in_screenWidget(self.settingWidget)
+            from .SettingWidget import SettingWidget
+            self.settingWidget = self.add_screen(SettingWidget(self.screenWidget))
+        return self.settingWidget
+
+    def show_setting_area(self):
+        self.show_only_in_screenWidget(self.ensure_setting_widget())
     def handle_logout(self):
         # Stop music if playing
         if hasattr(self, 'musicPlayerWidget') and hasattr(self.musicPlayerWidget, 'stop_music'):
@@ -58,23 +65,27 @@ class Ui_Main(object):
             self._main_window = Main
         else:
             QtWidgets.QApplication.quit()
+    def current_admin_name(self):
+        if hasattr(self, 'adminUsername') and hasattr(self.adminUsername, 'toPlainText'):
+            return self.adminUsername.toPlainText().strip()
+        return None
+
+    def ensure_payment_widget(self):
+        if not hasattr(self, 'paymentWidget'):
+            from .PaymentWidget import PaymentWidget
+            self.paymentWidget = self.add_screen(PaymentWidget(self.screenWidget, admin_name=self.current_admin_name()))
+        return self.paymentWidget
+
     def show_payment_area(self):
         try:
             total_members = db.get_total_members()
         except Exception:
             total_members = 0
-        admin_name = None
-        if hasattr(self, 'adminUsername') and hasattr(self.adminUsername, 'toPlainText'):
-            admin_name = self.adminUsername.toPlainText().strip()
-        if not hasattr(self, 'paymentWidget'):
-            from .PaymentWidget import PaymentWidget
-            self.paymentWidget = PaymentWidget(self.screenWidget, total_members=total_members, admin_name=admin_name)
-            self.verticalLayout_6.addWidget(self.paymentWidget)
-        else:
-            self.paymentWidget.set_member_count(total_members)
-            if hasattr(self.paymentWidget, 'set_admin_name'):
-                self.paymentWidget.set_admin_name(admin_name)
-        self.show_only_in_screenWidget(self.paymentWidget)
+        payment_widget = self.ensure_payment_widget()
+        payment_widget.set_member_count(total_members)
+        if hasattr(payment_widget, 'set_admin_name'):
+            payment_widget.set_admin_name(self.current_admin_name())
+        self.show_only_in_screenWidget(payment_widget)
     def show_power_menu(self):
         if not hasattr(self, 'powerMenu'):
             self.powerMenu = QtWidgets.QFrame(self.centralwidget)
@@ -160,6 +171,8 @@ class Ui_Main(object):
         self.menu_anime.start()
 
     def setupUi(self, Main, user=None):
+        # Writes by the maintenance scripts or another copy of the app show up within a second
+        change_watcher.start()
         Main.setObjectName("Main")
         Main.showFullScreen()
         Main.setMinimumSize(QtCore.QSize(100, 100))
@@ -378,7 +391,7 @@ class Ui_Main(object):
 
         # Recently Joined Widget
         from .RecentlyJoinedWidget import RecentlyJoinedWidget
-        self.RecentlyJoined = RecentlyJoinedWidget(self.widget_2)
+        self.RecentlyJoined = RecentlyJoinedWidget(self.widget_2, load=False)
         self.RecentlyJoined.setObjectName("RecentlyJoined")
         if hasattr(self.RecentlyJoined, 'set_display_fields'):
             self.RecentlyJoined.set_display_fields(['name', 'surname', 'id'])
@@ -388,7 +401,7 @@ class Ui_Main(object):
 
         # Expiring Members Widget
         from .ExpiringMembersWidget import ExpiringMembersWidget
-        self.ExpiringMembers = ExpiringMembersWidget(self.widget_2)
+        self.ExpiringMembers = ExpiringMembersWidget(self.widget_2, load=False)
         self.ExpiringMembers.setObjectName("ExpiringMembers")
         self.hBox_recent.addWidget(self.ExpiringMembers)
 
@@ -399,9 +412,6 @@ class Ui_Main(object):
         self.verticalLayout_7.addWidget(self.widget_2)
         self.verticalLayout_6.addWidget(self.Dashboard)
 
-        # Add MusicPlayer widget to the bottom of the dashboard area
-        self.musicPlayerWidget = self.MusicPlayer(self.Dashboard)
-        self.verticalLayout_7.addWidget(self.musicPlayerWidget)
         self.verticalLayout_3.addWidget(self.screenWidget)
         self.horizontalLayout.addWidget(self.frame)
         self.frameMenu = QtWidgets.QFrame(self.centralwidget)
@@ -645,13 +655,6 @@ class Ui_Main(object):
         if user and 'full_name' in user:
             self.adminUsername.setHtml(f'<p align="center">{user["full_name"]}</p>')
 
-        # Get admin name if available
-        admin_name = None
-        if hasattr(self, 'adminUsername') and hasattr(self.adminUsername, 'toPlainText'):
-            admin_name = self.adminUsername.toPlainText().strip()
-            
-        self.membersWidget = MembersWidget(self.screenWidget, main_window=self, admin_name=admin_name)
-        self.membersWidget.hide()
         self.btnMembers.clicked.connect(self.show_members_area)
 
         self.btnManage.clicked.connect(self.show_manage_area)
@@ -669,6 +672,51 @@ class Ui_Main(object):
             self.current_shift = 'men'  # Default to men if outside defined hours
         # Show dashboard by default
         self.show_dashboard()
+        # Connected after ExpiringMembers, whose list (and count) is refreshed first
+        change_bus.changed.connect(self.on_data_changed)
+        # The dashboard lists are filled from the member index once it is in memory
+        data_service.submit(member_index.load).then(self.load_dashboard_lists, self.load_dashboard_lists)
+        # Everything else is built after the window has been painted, a screen per event loop turn
+        self.startup = StartupScheduler(Main)
+        self.startup.add('music player', self.ensure_music_player)
+        self.startup.add('members', self.ensure_members_widget)
+        self.startup.add('payments', self.ensure_payment_widget)
+        self.startup.add('manage', self.ensure_manage_widget)
+        self.startup.add('settings', self.ensure_setting_widget)
+        # Daily online backup, taken once startup work is done
+        self.startup.add('backups', self.start_backups)
+        self.startup.start()
+
+    def start_backups(self):
+        from .backup import backup_scheduler
+        backup_scheduler.start()
+
+    def load_dashboard_lists(self, _result=None):
+        # Also called if the index failed to load; the widgets then read SQLite
+        self.RecentlyJoined.load_recently_joined()
+        self.ExpiringMembers.populate_expiring_members()
+        self.update_dashboard_stats()
+
+    def add_screen(self, widget):
+        # Screens wait hidden in the screen area until shown
+        widget.hide()
+        self.verticalLayout_6.addWidget(widget)
+        return widget
+
+    def ensure_music_player(self):
+        if not hasattr(self, 'musicPlayerWidget'):
+            # Loads QtMultimedia, so it is left out of the first paint
+            from .MusicPlayer import MusicPlayer
+            self.musicPlayerWidget = MusicPlayer(self.Dashboard)
+            self.verticalLayout_7.addWidget(self.musicPlayerWidget)
+        return self.musicPlayerWidget
+
+    def ensure_members_widget(self):
+        if not hasattr(self, 'membersWidget'):
+            from .MembersWidget import MembersWidget
+            self.membersWidget = self.add_screen(
+                MembersWidget(self.screenWidget, main_window=self, admin_name=self.current_admin_name()))
+        return self.membersWidget
 
     def show_only_in_screenWidget(self, widget):
         # Hide all widgets in screenWidget's layout
@@ -682,25 +730,37 @@ class Ui_Main(object):
             self.verticalLayout_6.addWidget(widget)
 
     def show_members_area(self):
-        self.show_only_in_screenWidget(self.membersWidget)
+        self.show_only_in_screenWidget(self.ensure_members_widget())
 
     def show_dashboard(self):
         self.show_only_in_screenWidget(self.Dashboard)
         self.update_dashboard_stats()
 
+    def on_data_changed(self, changes):
+        # The counters are maintained by triggers on members
+        if 'members' in changes:
+            self.update_dashboard_stats()
+
     def toggle_shift(self):
         self.current_shift = 'women' if self.current_shift == 'men' else 'men'
         self.update_dashboard_stats()
 
     def update_dashboard_stats(self):
-        try:
-            stats = db.get_dashboard_stats(self.current_shift)
+        # Queried on the worker so the first paint does not wait for it
+        data_service.submit(db.get_dashboard_stats, self.current_shift, channel='dashboard-stats').then(
+            self.show_dashboard_stats, self.show_dashboard_error)
+
+    def show_dashboard_error(self, e):
+        print(f"Dashboard DB error: {e}")
+        self.show_dashboard_stats(None)
+
+    def show_dashboard_stats(self, stats):
+        if stats is not None:
             total_active = stats['total_active']
             shift_count = stats['shift_count']
             expiring = stats['expiring']
             recent = stats['recent']
-        except Exception as e:
-            print(f"Dashboard DB error: {e}")
+        else:
             total_active = shift_count = expiring = recent = 0
         # Display stats
         for stat_widget in [self.gymStat, self.gymStat_2, self.gymStat_3, self.gymStat_4]:
@@ -775,8 +835,7 @@ class Ui_Main(object):
         try:
             now = datetime.datetime.now()
             self.textTime.setHtml(f'<div align="center">{now.strftime("%H:%M:%S")}</div>')
-            jnow = jdatetime.now()
-            jalali_date = jnow.strftime("%Y/%m/%d")
+            jalali_date = get_current_jalali_date()
             self.textCalendar.setHtml(f'<div align="center">{jalali_date}</div>')
             hour = now.hour
             prev_shift = getattr(self, 'current_shift', None)
@@ -809,7 +868,9 @@ if __name__ == '__main__':
         ui = Ui_Main()
         ui.setupUi(Main, user=user)
         Main.show()
-        sys.exit(app.exec_())
+        exit_code = app.exec_()
+        data_service.shutdown()
+        sys.exit(exit_code)
     else:
         sys.exit(0)
 
@@ -6,21 +6,25 @@ import os
 from datetime import datetime
 import shutil
 
+from . import theme
+from .card_pool import CardPool
+
 class EquipmentCard(QtWidgets.QWidget):
+    """One equipment item with an inline edit form; bind() reuses the card for another item.
+
+    Styled by the theme sheet (#equipmentCard rules) installed on the screen.
+    """
+
     def __init__(self, equipment, parent_widget, parent=None):
         super().__init__(parent)
-        self.equipment = equipment
         self.parent_widget = parent_widget
         self.form_visible = False
         self.init_ui()
+        self.bind(equipment)
 
-    def init_ui(self):
-        self.main_layout = QtWidgets.QVBoxLayout(self)
-        
-        # Equipment info card
-        self.card_content = QtWidgets.QWidget()
-        card_layout = QtWidgets.QVBoxLayout(self.card_content)
-        
+    def bind(self, equipment):
+        """Show equipment on this card, with the edit form closed."""
+        self.equipment = equipment
         # Format purchase date
         purchase_date = self.equipment['purchase_date'] if 'purchase_date' in self.equipment.keys() else ''
         if purchase_date:
@@ -37,35 +41,45 @@ class EquipmentCard(QtWidgets.QWidget):
         
         # Equipment status
         status = self.equipment['status'] if 'status' in self.equipment.keys() else 'سالم و ایمن'
-        status_color = {
-            'سالم و ایمن': '#009966',
-            'نیازمند تعمیر': '#d32f2f',
-            'خراب': '#d32f2f',
-            'در حال تعمیر': '#ff9800'
-        }.get(status, '#666')
-        
-        info = f"""
-        <div style='color:black; font-size:18pt; font-family: "B Yekan"; font-weight:bold;'>{equipment_name}</div>
-        <div style='color:black; font-size:12pt; font-family: "B Yekan";'>تاریخ خرید: {formatted_date}</div>
-        <div style='color:{status_color}; font-size:12pt; font-family: "B Yekan"; font-weight:bold;'>وضعیت: {status}</div>
-        <div style='color:#666; font-size:11pt; font-family: "B Yekan";'>توضیحات: {self.equipment['description'] if 'description' in self.equipment.keys() else '-'}</div>
-        """
-        
-        info_label = QtWidgets.QLabel(info)
-        info_label.setTextFormat(QtCore.Qt.RichText)
-        info_label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
-        info_label.setStyleSheet("font-family: 'B Yekan'; padding: 10px;")
-        card_layout.addWidget(info_label)
+        
+        self.name_label.setText(equipment_name)
+        self.date_label.setText(f"تاریخ خرید: {formatted_date}")
+        self.status_label.setText(f"وضعیت: {status}")
+        theme.set_state(self.status_label, 'status', theme.EQUIPMENT_STATES.get(status, 'unknown'))
+        self.description_label.setText(f"توضیحات: {self.equipment['description'] if 'description' in self.equipment.keys() else '-'}")
+        
+        self.edit_name.setText(self.equipment['name'] if 'name' in self.equipment.keys() else '')
+        self.edit_purchase_date.setText(self.equipment['purchase_date'] if 'purchase_date' in self.equipment.keys() else '')
+        self.edit_description.setText(self.equipment['description'] if 'description' in self.equipment.keys() else '')
+        self.edit_status.setCurrentText(self.equipment['status'] if 'status' in self.equipment.keys() else 'سالم و ایمن')
+        self.hide_edit_form()
+
+    def init_ui(self):
+        self.setObjectName("equipmentCard")
+        self.main_layout = QtWidgets.QVBoxLayout(self)
+        
+        # Equipment info card
+        self.card_content = QtWidgets.QWidget()
+        card_layout = QtWidgets.QVBoxLayout(self.card_content)
+        
+        # Plain labels, named for the theme; the status colour follows their 'status' property
+        self.name_label = QtWidgets.QLabel()
+        self.date_label = QtWidgets.QLabel()
+        self.status_label = QtWidgets.QLabel()
+        self.description_label = QtWidgets.QLabel()
+        for label, name in ((self.name_label, "equipmentName"), (self.date_label, "equipmentDate"),
+                            (self.status_label, "equipmentStatus"), (self.description_label, "equipmentDescription")):
+            label.setObjectName(name)
+            label.setTextFormat(QtCore.Qt.PlainText)
+            label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+            card_layout.addWidget(label)
         
         # Buttons
         btn_layout = QtWidgets.QHBoxLayout()
         edit_btn = QtWidgets.QPushButton("ویرایش")
         delete_btn = QtWidgets.QPushButton("حذف")
-        
-        for btn in (edit_btn, delete_btn):
-            btn.setStyleSheet("color: white; font-family: 'B Yekan'; background-color: qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:0, stop:0 rgba(51, 153, 255, 255), stop:0.55 rgba(102, 0, 255, 255), stop:0.98 rgba(255, 0, 255, 255), stop:1 rgba(0, 0, 0, 0)); border-radius: 8px; font-size: 12pt; padding: 6px 18px;")
-        
-        delete_btn.setStyleSheet("background: #d32f2f; color: white; font-size: 12pt; font-family: 'B Yekan'; border-radius: 8px; padding: 6px 18px;")
+        edit_btn.setObjectName("editButton")
+        delete_btn.setObjectName("deleteButton")
         
         btn_layout.addWidget(edit_btn)
         btn_layout.addWidget(delete_btn)
@@ -78,17 +92,11 @@ class EquipmentCard(QtWidgets.QWidget):
         # Edit fields
         form_layout = QtWidgets.QFormLayout()
         
-        self.edit_name = QtWidgets.QLineEdit(self.equipment['name'] if 'name' in self.equipment.keys() else '')
-        self.edit_purchase_date = QtWidgets.QLineEdit(self.equipment['purchase_date'] if 'purchase_date' in self.equipment.keys() else '')
-        self.edit_description = QtWidgets.QLineEdit(self.equipment['description'] if 'description' in self.equipment.keys() else '')
+        self.edit_name = QtWidgets.QLineEdit()
+        self.edit_purchase_date = QtWidgets.QLineEdit()
+        self.edit_description = QtWidgets.QLineEdit()
         self.edit_status = QtWidgets.QComboBox()
         self.edit_status.addItems(['سالم و ایمن', 'نیازمند تعمیر', 'خراب', 'در حال تعمیر'])
-        self.edit_status.setCurrentText(self.equipment['status'] if 'status' in self.equipment.keys() else 'سالم و ایمن')
-        
-        for inp in [self.edit_name, self.edit_purchase_date, self.edit_description]:
-            inp.setStyleSheet("font-size: 15pt; padding: 8px 16px; border-radius: 8px; font-family: 'B Yekan';")
-        
-        self.edit_status.setStyleSheet("font-size: 15pt; padding: 8px 16px; border-radius: 8px; font-family: 'B Yekan';")
         
         form_layout.addRow("نام تجهیز:", self.edit_name)
         form_layout.addRow("تاریخ خرید:", self.edit_purchase_date)
@@ -101,9 +109,8 @@ class EquipmentCard(QtWidgets.QWidget):
         edit_btn_layout = QtWidgets.QHBoxLayout()
         save_btn = QtWidgets.QPushButton("ذخیره تغییرات")
         cancel_btn = QtWidgets.QPushButton("انصراف")
-        
-        save_btn.setStyleSheet("background: #009966; color: white; font-size: 12pt; font-family: 'B Yekan'; border-radius: 8px; padding: 8px 16px;")
-        cancel_btn.setStyleSheet("background: #888; color: white; font-size: 12pt; font-family: 'B Yekan'; border-radius: 8px; padding: 8px 16px;")
+        save_btn.setObjectName("saveButton")
+        cancel_btn.setObjectName("cancelButton")
         
         edit_btn_layout.addWidget(save_btn)
         edit_btn_layout.addWidget(cancel_btn)
@@ -115,8 +122,6 @@ class EquipmentCard(QtWidgets.QWidget):
         self.main_layout.addWidget(self.card_content)
         self.main_layout.addWidget(self.edit_form)
         
-        self.setStyleSheet("QWidget { background: rgba(255,255,255,100); border-radius: 18px; padding: 18px; font-family: 'B Yekan'; }")
-        
         # Connect buttons
         edit_btn.clicked.connect(self.show_edit_form)
         delete_btn.clicked.connect(self.delete_equipment)
@@ -152,6 +157,7 @@ class EquipmentCard(QtWidgets.QWidget):
                     WHERE id = ?
                 """, (name, purchase_date, description, status, self.equipment['id']))
                 conn.commit()
+            db.notify_change('equipment', self.equipment['id'])
 
             self.hide_edit_form()
             self.parent_widget.load_equipment()
@@ -175,6 +181,7 @@ class EquipmentCard(QtWidgets.QWidget):
                     cursor = conn.cursor()
                     cursor.execute("DELETE FROM equipment WHERE id = ?", (self.equipment['id'],))
                     conn.commit()
+                db.notify_change('equipment', self.equipment['id'], 'delete')
                 
                 self.parent_widget.load_equipment()
                 
@@ -188,6 +195,8 @@ class ManageWidget(QtWidgets.QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.form_visible = False
+        # Equipment cards take their styles from here rather than each setting its own sheet
+        theme.apply(self)
         self.init_ui()
         self.load_equipment()
 
@@ -290,7 +299,12 @@ class ManageWidget(QtWidgets.QWidget):
         self.equipment_cards_layout = QtWidgets.QGridLayout(self.equipment_cards_container)
         self.equipment_cards_layout.setSpacing(20)
         self.equipment_scroll.setWidget(self.equipment_cards_container)
+        # Cards removed by a reload are rebound to the next rows instead of rebuilt
+        self.equipment_card_pool = CardPool(
+            lambda equipment: EquipmentCard(equipment, parent_widget=self, parent=self.equipment_cards_container))
         layout.addWidget(self.equipment_scroll)
+        self.equipment_scroll.verticalScrollBar().valueChanged.connect(self._maybe_load_more_equipment)
+        self.equipment_scroll.verticalScrollBar().rangeChanged.connect(self._maybe_load_more_equipment)
         
         # Connect buttons and filters
         add_equipment_btn.clicked.connect(self.toggle_equipment_form)
@@ -351,6 +365,7 @@ class ManageWidget(QtWidgets.QWidget):
                     VALUES (?, ?, ?, ?)
                 """, (name, purchase_date, description, status))
                 conn.commit()
+            db.notify_change('equipment', cursor.lastrowid, 'insert')
             
             # Clear form
             self.input_equipment_name.clear()
@@ -407,46 +422,58 @@ class ManageWidget(QtWidgets.QWidget):
             error_msg.exec_()
 
     def load_equipment(self, filter_text=None, status_filter=None):
-        try:
-            from .database import db
-            conn = db.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Build query with filters
-            query = "SELECT * FROM equipment WHERE 1=1"
-            params = []
-            
-            if filter_text:
-                query += " AND name LIKE ?"
-                params.append(f"%{filter_text}%")
-            
-            if status_filter and status_filter != "همه تجهیزات":
-                query += " AND status = ?"
-                params.append(status_filter)
-            
-            query += " ORDER BY created_at DESC"
-            
-            cursor.execute(query, params)
-            equipment_list = cursor.fetchall()
-            
-            conn.close()
-            
-            # Clear old cards
-            for i in reversed(range(self.equipment_cards_layout.count())):
-                widget = self.equipment_cards_layout.itemAt(i).widget()
-                if widget:
-                    widget.setParent(None)
-            
-            # Add equipment cards
-            for idx, equipment in enumerate(equipment_list):
-                card = EquipmentCard(equipment, parent_widget=self, parent=self)
-                row = idx // 3
-                col = idx % 3
-                self.equipment_cards_layout.addWidget(card, row, col)
-                
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بارگذاری تجهیزات با خطا مواجه شد: {e}")
+        # Start over from the first page; later pages load as the list is scrolled
+        self._equipment_filter = (filter_text or None,
+                                  status_filter if status_filter and status_filter != "همه تجهیزات" else None)
+        self._equipment_cursor = None
+        self._equipment_has_more = True
+        self._equipment_loading = False
+        self._equipment_count = 0
+        for i in reversed(range(self.equipment_cards_layout.count())):
+            widget = self.equipment_cards_layout.takeAt(i).widget()
+            if widget:
+                self.equipment_card_pool.release(widget)
+        self.load_more_equipment()
+
+    def load_more_equipment(self):
+        if not getattr(self, '_equipment_has_more', False) or self._equipment_loading:
+            return
+        from .database import db
+        from .data_service import data_service
+        filter_text, status = self._equipment_filter
+        # Fetch the next page in the background; a reset cancels a page in flight
+        self._equipment_loading = True
+        data_service.submit(
+            db.page_equipment, cursor=self._equipment_cursor, filter_text=filter_text,
+            status=status, channel='equipment'
+        ).then(self.append_equipment_page, self.show_equipment_error)
+
+    def append_equipment_page(self, page):
+        equipment_list, self._equipment_cursor = page
+        self._equipment_has_more = self._equipment_cursor is not None
+        self._equipment_loading = False
+
+        # Append this page's cards after the ones already shown
+        for equipment in equipment_list:
+            card = self.equipment_card_pool.acquire(equipment)
+            row = self._equipment_count // 3
+            col = self._equipment_count % 3
+            self.equipment_cards_layout.addWidget(card, row, col)
+            card.show()
+            self._equipment_count += 1
+        # The page may not fill the view yet
+        self._maybe_load_more_equipment()
+
+    def show_equipment_error(self, error):
+        self._equipment_has_more = False
+        self._equipment_loading = False
+        QtWidgets.QMessageBox.critical(self, "خطا", f"بارگذاری تجهیزات با خطا مواجه شد: {error}")
+
+    def _maybe_load_more_equipment(self, *args):
+        # Near the bottom, or the page does not fill the view yet
+        bar = self.equipment_scroll.verticalScrollBar()
+        if getattr(self, '_equipment_has_more', False) and bar.value() >= bar.maximum() - 200:
+            self.load_more_equipment()
 
     def filter_equipment(self):
         filter_text = self.equipment_search_edit.text()
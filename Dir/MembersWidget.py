@@ -2,58 +2,45 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 import sqlite3
 import os
 
+from .change_bus import change_bus
+from .list_models import CardDelegate, CardListView, MemberListModel
+from .member_index import member_index
+from .search_pipeline import SearchPipeline
 
-class MemberCard(QtWidgets.QWidget):
-    def __init__(self, member, parent_widget, parent=None):
+
+_BUTTON_GRADIENT = ((0, '#3399ff'), (0.55, '#6600ff'), (0.98, '#ff00ff'))
+
+
+class MemberCardDelegate(CardDelegate):
+    """Member card: name, id, phone, join date and status, with renew and edit buttons."""
+
+    renewClicked = QtCore.pyqtSignal(object)
+    editClicked = QtCore.pyqtSignal(object)
+
+    FONTS = [('B Yekan', 18, True)] + [('B Yekan', 12, False)] * 4
+    BUTTONS = (("تمدید", _BUTTON_GRADIENT, 'renewClicked'),
+               ("ویرایش", _BUTTON_GRADIENT, 'editClicked'))
+
+    def lines(self, index):
+        name, member_id, phone, join_date, status = index.data(QtCore.Qt.DisplayRole)
+        texts = (name, f"کد: {member_id}", f"تلفن: {phone}",
+                 f"تاریخ عضویت: {join_date}", f"وضعیت عضویت: {status}")
+        return [(text, 'black') for text in texts]
+
+
+class MemberEditDialog(QtWidgets.QDialog):
+    """Edit or delete one member; accepted when the member was changed.
+
+    updated_member then holds the member's new row, or None if it was deleted.
+    """
+
+    def __init__(self, member, parent=None):
         super().__init__(parent)
         self.member = member
-        self.parent_widget = parent_widget
-        self.form_visible = False
-        # Get admin_name from parent_widget if available
-        self.admin_name = getattr(parent_widget, 'admin_name', None)
-        self.init_ui()
-
-    def init_ui(self):
-        self.main_layout = QtWidgets.QVBoxLayout(self)
-        # User info and buttons in one box, no icon
-        remaining_days = self.member['remaining_days']
-        remaining_days_text = f"{int(remaining_days)} روز باقی مانده" if remaining_days is not None and remaining_days >= 0 else "منقضی شده"
-        # Regular card content
-        self.card_content = QtWidgets.QWidget()
-        card_layout = QtWidgets.QVBoxLayout(self.card_content)
-        from .date_utils import format_jalali_date
-        # Robust join date handling for sqlite3.Row
-        join_date_raw = self.member['join_date'] if 'join_date' in self.member.keys() else None
-        if not join_date_raw or join_date_raw in (None, '', 'NULL'):
-            join_date_raw = self.member['created_at'] if 'created_at' in self.member.keys() else None
-        if not join_date_raw or join_date_raw in (None, '', 'NULL'):
-            from datetime import datetime
-            join_date_raw = datetime.now().strftime('%Y-%m-%d')
-        join_date = format_jalali_date(join_date_raw)
-        info = f"""
-        <div style='color:black; font-size:18pt; font-family: "B Yekan"; font-weight:bold;'>{self.member['name']} {self.member['family']}</div>
-        <div style='color:black; font-size:12pt; font-family: "B Yekan";'>کد: {self.member['id'] or '-'}</div>
-        <div style='color:black; font-size:12pt; font-family: "B Yekan";'>تلفن: {self.member['phone'] or '-'}</div>
-        <div style='color:black; font-size:12pt; font-family: "B Yekan";'>تاریخ عضویت: {join_date}</div>
-        <div style='color:black; font-size:12pt; font-family: "B Yekan";'>وضعیت عضویت: {remaining_days_text}</div>
-        """
-        info_label = QtWidgets.QLabel(info)
-        info_label.setTextFormat(QtCore.Qt.RichText)
-        info_label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
-        info_label.setStyleSheet("font-family: 'B Yekan';")
-        card_layout.addWidget(info_label)
-        # Regular buttons
-        btn_layout = QtWidgets.QHBoxLayout()
-        renew_btn = QtWidgets.QPushButton("تمدید")
-        edit_btn = QtWidgets.QPushButton("ویرایش")
-        for btn in (renew_btn, edit_btn):
-            btn.setStyleSheet("color: white; font-family: 'B Yekan'; background-color: qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:0, stop:0 rgba(51, 153, 255, 255), stop:0.55 rgba(102, 0, 255, 255), stop:0.98 rgba(255, 0, 255, 255), stop:1 rgba(0, 0, 0, 0)); border-radius: 8px; font-size: 12pt; padding: 6px 18px;")
-        btn_layout.addWidget(renew_btn)
-        btn_layout.addWidget(edit_btn)
-        card_layout.addLayout(btn_layout)
-        # Create expanded edit form
-        self.edit_form = QtWidgets.QWidget()
-        edit_layout = QtWidgets.QVBoxLayout(self.edit_form)
+        self.updated_member = member
+        self.setWindowTitle("ویرایش عضو")
+        self.setStyleSheet("QDialog { background: #fff; } QWidget { font-family: 'B Yekan'; }")
+        edit_layout = QtWidgets.QVBoxLayout(self)
         # Edit fields
         form_layout = QtWidgets.QFormLayout()
         self.edit_name = QtWidgets.QLineEdit(self.member['name'])
@@ -72,102 +59,14 @@ class MemberCard(QtWidgets.QWidget):
         edit_btn_layout = QtWidgets.QHBoxLayout()
         save_btn = QtWidgets.QPushButton("ذخیره تغییرات")
         delete_btn = QtWidgets.QPushButton("حذف عضو")
-        # cancel_btn = QtWidgets.QPushButton("انصراف")
         save_btn.setStyleSheet("background: #009966; color: white; font-size: 12pt; font-family: 'B Yekan'; border-radius: 8px; padding: 8px 16px;")
         delete_btn.setStyleSheet("background: #d32f2f; color: white; font-size: 12pt; font-family: 'B Yekan'; border-radius: 8px; padding: 8px 16px;")
-        # cancel_btn.setStyleSheet("background: #888; color: white; font-size: 12pt; font-family: 'B Yekan'; border-radius: 8px; padding: 8px 16px;")
         edit_btn_layout.addWidget(save_btn)
         edit_btn_layout.addWidget(delete_btn)
-        # edit_btn_layout.addWidget(cancel_btn)
         edit_layout.addLayout(edit_btn_layout)
-        # Connect edit form buttons to their methods
         save_btn.clicked.connect(self.save_changes)
         delete_btn.clicked.connect(self.delete_member)
-        # cancel_btn.clicked.connect(self.toggle_form)
-        self.edit_form.hide()
-        # Add widgets to main layout
-        self.main_layout.addWidget(self.card_content)
-        self.main_layout.addWidget(self.edit_form)
-        # Ensure card content is visible by default
-        self.card_content.show()
-        self.edit_form.hide()
-        # Setup form animation
-        self.form_anim = QtCore.QPropertyAnimation(self.edit_form, b"maximumHeight")
-        self.form_anim.setDuration(200)
-        self.form_anim.setStartValue(0)
-        self.form_anim.setEndValue(400)
-        self.setStyleSheet("QWidget { background: rgba(255,255,255,100); border-radius: 18px; padding: 18px; font-family: 'B Yekan'; }")
-        # Connect buttons
-        renew_btn.clicked.connect(self.renew_membership)
-        edit_btn.clicked.connect(self.show_edit_form)
-    def show_edit_form(self):
-        # Populate edit fields with current member data
-        self.edit_name.setText(self.member['name'])
-        self.edit_family.setText(self.member['family'])
-        self.edit_phone.setText(self.member['phone'])
-        self.edit_id.setText(self.member['id'])
-        # Show the edit form with animation
-        if not self.form_visible:
-            self.form_anim.setDirection(QtCore.QAbstractAnimation.Forward)
-            self.form_anim.start()
-            self.form_visible = True
-        self.edit_form.show()
-        self.card_content.hide()
 
-    def toggle_form(self):
-        if self.form_visible:
-            self.form_anim.setDirection(QtCore.QAbstractAnimation.Backward)
-            self.form_anim.start()
-            self.form_visible = False
-        else:
-            self.form_anim.setDirection(QtCore.QAbstractAnimation.Forward)
-            self.form_anim.start()
-            self.form_visible = True
-
-    def renew_membership(self):
-        from .database import db
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        try:
-            # Get default monthly fee from settings
-            cursor.execute("SELECT value FROM settings WHERE key = 'monthly_fee'")
-            monthly_fee_result = cursor.fetchone()
-            monthly_fee = float(monthly_fee_result[0]) if monthly_fee_result else 750000
-            # Check if the user has an end_date
-            cursor.execute("SELECT end_date FROM members WHERE id = ?", (self.member['id'],))
-            end_date = cursor.fetchone()
-            from datetime import datetime, timedelta
-            if end_date and end_date[0]:
-                # Add 30 days to the existing end_date
-                new_end_date = (datetime.strptime(end_date[0], "%Y-%m-%d") + timedelta(days=30)).strftime("%Y-%m-%d")
-            else:
-                # Set end_date to today + 30 days
-                new_end_date = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
-            cursor.execute("UPDATE members SET end_date = ? WHERE id = ?", (new_end_date, self.member['id']))
-            # Add transaction record for the renewal
-            member_name = f"{self.member['name']} {self.member['family']}"
-            admin_info = f" توسط {self.admin_name}" if self.admin_name else ""
-            description = f"تمدید عضویت {member_name}{admin_info}"
-            cursor.execute("""
-                INSERT INTO transactions (transaction_type, amount, description, created_by, payment_date)
-                VALUES (?, ?, ?, ?, date('now'))
-            """, ('membership', monthly_fee, description, 1))
-            transaction_id = cursor.lastrowid
-            # Add member payment record
-            cursor.execute("""
-                INSERT INTO member_payments (member_id, transaction_id, payment_date, due_date, status)
-                VALUES (?, ?, date('now'), ?, 'paid')
-            """, (self.member['id'], transaction_id, new_end_date))
-            conn.commit()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"تمدید عضویت با خطا مواجه شد: {e}")
-        finally:
-            conn.close()
-        try:
-            self.parent_widget.load_members()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بروزرسانی لیست اعضا با خطا مواجه شد: {e}")
-    
     def save_changes(self):
         name = self.edit_name.text().strip()
         family = self.edit_family.text().strip()
@@ -177,30 +76,11 @@ class MemberCard(QtWidgets.QWidget):
             return
         from .database import db
         try:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE members 
-                SET name = ?, family = ?, phone = ?
-                WHERE id = ?
-            """, (name, family, phone, self.member['id']))
-            conn.commit()
+            self.updated_member = db.update_member(self.member['id'], name, family, phone)
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "خطا", f"ذخیره تغییرات با خطا مواجه شد: {e}")
             return
-        finally:
-            try:
-                conn.close()
-            except:
-                pass
-        try:
-            self.toggle_form()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بستن فرم ویرایش با خطا مواجه شد: {e}")
-        try:
-            self.parent_widget.load_members()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بروزرسانی لیست اعضا با خطا مواجه شد: {e}")
+        self.accept()
 
     def delete_member(self):
         # Show confirmation dialog
@@ -214,28 +94,18 @@ class MemberCard(QtWidgets.QWidget):
         
         if reply == QtWidgets.QMessageBox.Yes:
             from .database import db
-            conn = db.get_connection()
-            cursor = conn.cursor()
             try:
-                # Gather related transaction ids, then delete dependent rows
-                cursor.execute("SELECT transaction_id FROM member_payments WHERE member_id = ?", (self.member['id'],))
-                tx_ids = [row[0] for row in cursor.fetchall() if row and row[0] is not None]
-                cursor.execute("DELETE FROM member_payments WHERE member_id = ?", (self.member['id'],))
-                if tx_ids:
-                    placeholders = ",".join(["?"] * len(tx_ids))
-                    cursor.execute(f"DELETE FROM transactions WHERE id IN ({placeholders})", tx_ids)
-                cursor.execute("DELETE FROM members WHERE id = ?", (self.member['id'],))
-                conn.commit()
-                try:
-                    self.parent_widget.load_members()
-                except Exception as e:
-                    QtWidgets.QMessageBox.critical(self, "خطا", f"بروزرسانی لیست اعضا با خطا مواجه شد: {e}")
+                db.delete_member(self.member['id'], with_payments=True)
             except Exception as e:
                 QtWidgets.QMessageBox.critical(self, "خطا", f"حذف عضو با خطا مواجه شد: {e}")
-            finally:
-                conn.close()
+                return
+            self.updated_member = None
+            self.accept()
 
 class MembersWidget(QtWidgets.QWidget):
+    # Pause in typing before the member search runs
+    SEARCH_DEBOUNCE_MS = 250
+
     def __init__(self, parent=None, main_window=None, admin_name=None):
         super().__init__(parent)
         self.main_window = main_window
@@ -243,6 +113,7 @@ class MembersWidget(QtWidgets.QWidget):
         self.admin_name = admin_name
         self.init_ui()
         self.load_members()
+        change_bus.changed.connect(self.on_data_changed)
         
     def set_admin_name(self, admin_name):
         self.admin_name = admin_name
@@ -359,16 +230,26 @@ class MembersWidget(QtWidgets.QWidget):
         self.filter_combo.addItem("همه ورزشکاران")
         self.filter_combo.setStyleSheet("color: white; text-align: center; background: rgba(255,255,255,45); border-radius: 8px; font-size: 15pt; font-family: 'Dubai Medium';")
         search_layout.addWidget(self.filter_combo)
+        # Searches run once typing pauses; narrowing a result filters it in memory
+        from .database import db
+        self.search_pipeline = SearchPipeline(
+            self.search_members, refine=db.refine_member_search,
+            interval_ms=self.SEARCH_DEBOUNCE_MS, channel='members', parent=self)
+        self.search_pipeline.resultsReady.connect(self.show_search_results)
+        self.search_pipeline.failed.connect(
+            lambda e: QtWidgets.QMessageBox.critical(self, "خطا", f"جستجوی اعضا با خطا مواجه شد: {e}"))
         self.search_edit.textChanged.connect(self.filter_members)
         main_layout.addLayout(search_layout)
-        # Scroll area for cards
-        self.scroll = QtWidgets.QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.cards_container = QtWidgets.QWidget()
-        self.cards_layout = QtWidgets.QGridLayout(self.cards_container)
-        self.cards_layout.setSpacing(20)
-        self.scroll.setWidget(self.cards_container)
-        main_layout.addWidget(self.scroll)
+        # Member cards are painted by a delegate; rows load page by page as the list scrolls
+        self.members_model = MemberListModel(self)
+        self.members_model.loadFailed.connect(
+            lambda e: QtWidgets.QMessageBox.critical(self, "خطا", f"بارگذاری اعضا با خطا مواجه شد: {e}"))
+        self.card_delegate = MemberCardDelegate(self)
+        self.card_delegate.renewClicked.connect(self.renew_membership)
+        self.card_delegate.editClicked.connect(self.open_edit_dialog)
+        self.members_view = CardListView(self.card_delegate, columns=3)
+        self.members_view.setModel(self.members_model)
+        main_layout.addWidget(self.members_view)
 
     def show_custom_warning(self, title, message):
         msg_box = QtWidgets.QMessageBox(self)
@@ -416,20 +297,11 @@ class MembersWidget(QtWidgets.QWidget):
         end_date = (datetime.strptime(gregorian_join_date, "%Y-%m-%d") + timedelta(days=membership_days)).strftime("%Y-%m-%d")
         from .database import db
         try:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            # Insert with join_date, start_date, and end_date
-            cursor.execute('INSERT INTO members (id, name, family, gender, phone, start_date, end_date, join_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', 
-                         (id_, name, family, gender, phone, start_date, end_date, gregorian_join_date))
-            conn.commit()
+            # start_date is the join date
+            db.add_member(id_, name, family, gender, phone, join_date=start_date, end_date=end_date)
         except Exception as e:
             self.show_custom_warning("خطا", f"ثبت ورزشکار جدید با خطا مواجه شد: {e}")
             return
-        finally:
-            try:
-                conn.close()
-            except:
-                pass
         try:
             self.input_name.clear()
             self.input_family.clear()
@@ -445,140 +317,67 @@ class MembersWidget(QtWidgets.QWidget):
             self.toggle_form()
         except Exception as e:
             self.show_custom_warning("خطا", f"بستن فرم با خطا مواجه شد: {e}")
-        try:
-            self.load_members()
-        except Exception as e:
-            self.show_custom_warning("خطا", f"بروزرسانی لیست اعضا با خطا مواجه شد: {e}")
-        # Refresh payment area if available
-        try:
-            if hasattr(self, 'main_window') and self.main_window and hasattr(self.main_window, 'paymentWidget'):
-                self.main_window.paymentWidget.refresh()
-        except Exception:
-            pass
+        # The new card arrives through the change bus (on_data_changed)
 
     def load_members(self, filter_text=None):
-        from .database import db
-        conn = db.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        base_query = """
-            SELECT *, 
-                CASE WHEN end_date IS NOT NULL THEN CAST(julianday(end_date) - julianday('now') AS INT) ELSE NULL END AS remaining_days,
-                join_date
-            FROM members
-        """
-        
-        if filter_text:
-            cursor.execute(f"{base_query} WHERE name LIKE ? OR family LIKE ? OR phone LIKE ? OR id LIKE ?", 
-                         [f"%{filter_text}%"]*4)
-        else:
-            cursor.execute(base_query)
-        members = cursor.fetchall()
-        conn.close()
-        # Clear old cards
-        for i in reversed(range(self.cards_layout.count())):
-            widget = self.cards_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-        # Add cards
-        for idx, member in enumerate(members):
-            card = MemberCard(member, parent_widget=self, parent=self)
-            row = idx // 3
-            col = idx % 3
-            self.cards_layout.addWidget(card, row, col)
+        # Reload now (after an edit), bypassing the debounce and refinement
+        if filter_text is None:
+            filter_text = self.search_edit.text()
+        self.search_pipeline.search_now(filter_text)
 
     def filter_members(self, text):
-        self.load_members(text)
+        self.search_pipeline.set_text(text)
 
-    def toggle_edit_form(self):
-        self.is_expanded = not self.is_expanded
-        if self.is_expanded:
-            self.edit_form.show()
-            self.card_content.hide()
+    @staticmethod
+    def search_members(text):
+        """Search pipeline query: the member index once loaded, else the search index in SQLite."""
+        from .database import db
+        if member_index.ready:
+            return member_index.search(text)
+        return db.search_members(text, limit=None)
+
+    def show_search_results(self, text, members):
+        if members is None:
+            # Blank query: page through every member
+            self.members_model.set_filter(None)
         else:
-            self.edit_form.hide()
-            self.card_content.show()
+            self.members_model.set_rows(members)
 
-    def save_changes(self):
-        name = self.edit_name.text().strip()
-        family = self.edit_family.text().strip()
-        phone = self.edit_phone.text().strip()
-        if not all([name, family, phone]):
-            QtWidgets.QMessageBox.warning(self, "خطا", "لطفا همه فیلدها را پر کنید.")
-            return
+    def open_edit_dialog(self, member):
+        dialog = MemberEditDialog(member, self)
+        if dialog.exec_() == QtWidgets.QDialog.Accepted:
+            self.show_member_change(member['id'], dialog.updated_member)
+
+    def renew_membership(self, member):
         from .database import db
+        member_name = f"{member['name']} {member['family']}"
+        admin_info = f" توسط {self.admin_name}" if self.admin_name else ""
         try:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE members 
-                SET name = ?, family = ?, phone = ?
-                WHERE id = ?
-            """, (name, family, phone, self.member['id']))
-            conn.commit()
+            renewed = db.renew_membership(member['id'], f"تمدید عضویت {member_name}{admin_info}")
         except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"ذخیره تغییرات با خطا مواجه شد: {e}")
+            QtWidgets.QMessageBox.critical(self, "خطا", f"تمدید عضویت با خطا مواجه شد: {e}")
             return
-        finally:
-            try:
-                conn.close()
-            except:
-                pass
-        try:
-            self.toggle_edit_form()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بستن فرم ویرایش با خطا مواجه شد: {e}")
-        try:
-            self.parent_widget.load_members()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بروزرسانی لیست اعضا با خطا مواجه شد: {e}")
+        self.show_member_change(member['id'], renewed)
 
-    def delete_member(self):
-        reply = QtWidgets.QMessageBox.question(
-            self, 'تایید حذف',
-            'آیا از حذف این عضو اطمینان دارید؟',
-            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
-            QtWidgets.QMessageBox.No
-        )
-        
-        if reply == QtWidgets.QMessageBox.Yes:
-            from .database import db
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute("DELETE FROM members WHERE id = ?", (self.member['id'],))
-                conn.commit()
-                # Refresh the member list
-                self.parent_widget.load_members()
-            except Exception as e:
-                QtWidgets.QMessageBox.critical(self, "خطا", f"حذف عضو با خطا مواجه شد: {e}")
-            finally:
-                conn.close()
+    def on_data_changed(self, changes):
+        """Apply member writes made anywhere in the app to the cards shown."""
+        if 'members' not in changes:
+            return
+        self.search_pipeline.invalidate()
+        keys = changes.keys('members')
+        searching = bool(self.search_edit.text().strip())
+        if searching and keys and 'insert' in keys.values():
+            # Whether a new member matches the search is the search's call
+            self.load_members()
+        elif not self.members_model.apply_changes(keys, self.current_member, insert_new=not searching):
+            self.load_members()
 
-    def renew_membership(self):
+    @staticmethod
+    def current_member(member_id):
         from .database import db
-        try:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            # Check if the user has a start_date
-            cursor.execute("SELECT start_date FROM members WHERE id = ?", (self.member['id'],))
-            start_date = cursor.fetchone()
-            if start_date and start_date[0]:
-                # Add 30 days to the existing start_date
-                cursor.execute("UPDATE members SET start_date = date(julianday(start_date), '+30 days') WHERE id = ?", (self.member['id'],))
-            else:
-                # Set start_date to today and add 30 days
-                cursor.execute("UPDATE members SET start_date = date('now', '+30 days') WHERE id = ?", (self.member['id'],))
-            conn.commit()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"تمدید عضویت با خطا مواجه شد: {e}")
-            return
-        finally:
-            try:
-                conn.close()
-            except:
-                pass
-        try:
-            self.parent_widget.load_members()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بروزرسانی لیست اعضا با خطا مواجه شد: {e}")
+        return member_index.get(member_id) if member_index.ready else db.get_member(member_id)
+
+    def show_member_change(self, member_id, member):
+        """Update (or, for a deleted member, remove) just this member's card."""
+        self.search_pipeline.invalidate()
+        self.members_model.update_row(member_id, member)
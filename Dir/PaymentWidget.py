@@ -1,11 +1,11 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 import sqlite3
 import os
-import csv
-import json
-import shutil
-from datetime import datetime, timedelta
+from .change_bus import change_bus
 from .database import db
+from .exporter import ExportJob, with_filter_suffix
+from .list_models import CardDelegate, CardListView, PaymentListModel
+from .member_index import member_index
 
 class CustomMessageBox(QtWidgets.QDialog):
     def __init__(self, parent=None, title="", message="", status="success"):
@@ -115,94 +115,49 @@ class CustomMessageBox(QtWidgets.QDialog):
         # Set fixed size
         self.setFixedSize(400, 250)
 
-class PaymentCard(QtWidgets.QWidget):
-    def __init__(self, payment, parent_widget, parent=None):
+class PaymentCardDelegate(CardDelegate):
+    """Payment card: member, amount, date, status and description, with edit and delete buttons."""
+
+    editClicked = QtCore.pyqtSignal(object)
+    deleteClicked = QtCore.pyqtSignal(object)
+
+    FONTS = [('Dubai Medium', 18, True), ('B Yekan', 14, False), ('B Yekan', 12, False),
+             ('Dubai Medium', 12, True), ('Dubai Medium', 11, False)]
+    BUTTONS = (("ویرایش", ((0, '#3399ff'), (0.55, '#6600ff'), (0.98, '#ff00ff')), 'editClicked'),
+               ("حذف", ((0, '#d32f2f'),), 'deleteClicked'))
+
+    def lines(self, index):
+        member_name, amount, payment_date, (status_text, status_color), description = index.data(QtCore.Qt.DisplayRole)
+        return [
+            (member_name, 'black'),
+            (f"مبلغ: {amount} تومان", 'black'),
+            (f"تاریخ پرداخت: {payment_date}", 'black'),
+            (f"وضعیت: {status_text}", status_color),
+            (f"توضیحات: {description}", '#666'),
+        ]
+
+
+class PaymentEditDialog(QtWidgets.QDialog):
+    """Edit one payment's amount, description and status; accepted when saved.
+
+    updated_payment then holds the payment's new row.
+    """
+
+    def __init__(self, payment, admin_name=None, parent=None):
         super().__init__(parent)
         self.payment = payment
-        self.parent_widget = parent_widget
-        self.form_visible = False
-        self.init_ui()
-
-    def init_ui(self):
-        self.main_layout = QtWidgets.QVBoxLayout(self)
-        
-        # Payment info card
-        self.card_content = QtWidgets.QWidget()
-        card_layout = QtWidgets.QVBoxLayout(self.card_content)
-        
-        # Format payment date (Jalali, robust fallback)
-        from .date_utils import format_jalali_date
-        payment_date_raw = self.payment['payment_date'] if 'payment_date' in self.payment.keys() else None
-        if not payment_date_raw or payment_date_raw in (None, '', 'NULL'):
-            payment_date_raw = self.payment['created_at'] if 'created_at' in self.payment.keys() else None
-        if not payment_date_raw or payment_date_raw in (None, '', 'NULL'):
-            payment_date_raw = self.payment['due_date'] if 'due_date' in self.payment.keys() else None
-        if not payment_date_raw or payment_date_raw in (None, '', 'NULL'):
-            from datetime import datetime
-            payment_date_raw = datetime.now().strftime('%Y-%m-%d')
-        formatted_date = format_jalali_date(payment_date_raw)
-        
-        # Get member info
-        member_name = f"{self.payment['member_name'] if 'member_name' in self.payment.keys() else ''} {self.payment['member_family'] if 'member_family' in self.payment.keys() else ''}"
-        if not member_name.strip():
-            member_name = f"عضو {self.payment['member_id'] if 'member_id' in self.payment.keys() else 'نامشخص'}"
-        
-        # Format amount
-        amount = self.payment['amount'] if 'amount' in self.payment.keys() else 0
-        formatted_amount = f"{amount:,}" if amount else "0"
-        
-        # Payment status
-        status = self.payment['status'] if 'status' in self.payment.keys() else 'paid'
-        status_text = {
-            'paid': 'پرداخت شده',
-            'pending': 'در انتظار',
-            'overdue': 'معوقه'
-        }.get(status, status)
-        
-        # Status color
-        status_color = {
-            'paid': '#009966',
-            'pending': '#ff9800',
-            'overdue': '#d32f2f'
-        }.get(status, '#666')
-        
-        info = f"""
-        <div style='color:black; font-size:18pt; font-family: "Dubai Medium"; font-weight:bold;'>{member_name}</div>
-        <div style='color:black; font-size:14pt; font-family: "B Yekan";'>مبلغ: {formatted_amount} تومان</div>
-        <div style='color:black; font-size:12pt; font-family: "B Yekan";'>تاریخ پرداخت: {formatted_date}</div>
-        <div style='color:{status_color}; font-size:12pt; font-family: "Dubai Medium"; font-weight:bold;'>وضعیت: {status_text}</div>
-        <div style='color:#666; font-size:11pt; font-family: "Dubai Medium";'>توضیحات: {self.payment['description'] if 'description' in self.payment.keys() else '-'}</div>
-        """
-        
-        info_label = QtWidgets.QLabel(info)
-        info_label.setTextFormat(QtCore.Qt.RichText)
-        info_label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
-        info_label.setStyleSheet("font-family: 'B Yekan'; padding: 10px;")
-        card_layout.addWidget(info_label)
-        
-        # Buttons
-        btn_layout = QtWidgets.QHBoxLayout()
-        edit_btn = QtWidgets.QPushButton("ویرایش")
-        delete_btn = QtWidgets.QPushButton("حذف")
-        
-        for btn in (edit_btn, delete_btn):
-            btn.setStyleSheet("color: white; font-family: 'B Yekan'; background-color: qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:0, stop:0 rgba(51, 153, 255, 255), stop:0.55 rgba(102, 0, 255, 255), stop:0.98 rgba(255, 0, 255, 255), stop:1 rgba(0, 0, 0, 0)); border-radius: 8px; font-size: 12pt; padding: 6px 18px;")
-        
-        delete_btn.setStyleSheet("background: #d32f2f; color: white; font-size: 12pt; font-family: 'B Yekan'; border-radius: 8px; padding: 6px 18px;")
-        
-        btn_layout.addWidget(edit_btn)
-        btn_layout.addWidget(delete_btn)
-        card_layout.addLayout(btn_layout)
-        
-        self.edit_form = QtWidgets.QWidget()
-        edit_layout = QtWidgets.QVBoxLayout(self.edit_form)
+        self.updated_payment = payment
+        self.admin_name = admin_name
+        self.setWindowTitle("ویرایش پرداخت")
+        self.setStyleSheet("QDialog { background: #fff; } QWidget { font-family: 'B Yekan'; }")
+        edit_layout = QtWidgets.QVBoxLayout(self)
         form_layout = QtWidgets.QFormLayout()
         
-        self.edit_amount = QtWidgets.QLineEdit(str(self.payment['amount'] if 'amount' in self.payment.keys() else ''))
-        self.edit_description = QtWidgets.QLineEdit(self.payment['description'] if 'description' in self.payment.keys() else '')
+        self.edit_amount = QtWidgets.QLineEdit(str(self.payment['amount'] if self.payment['amount'] is not None else ''))
+        self.edit_description = QtWidgets.QLineEdit(self.payment['description'] or '')
         self.edit_status = QtWidgets.QComboBox()
         self.edit_status.addItems(['paid', 'pending', 'overdue'])
-        self.edit_status.setCurrentText(self.payment['status'] if 'status' in self.payment.keys() else 'paid')
+        self.edit_status.setCurrentText(self.payment['status'] or 'paid')
         
         for inp in [self.edit_amount, self.edit_description]:
             inp.setStyleSheet("font-size: 15pt; padding: 8px 16px; border-radius: 8px; font-family: 'B Yekan';")
@@ -227,25 +182,8 @@ class PaymentCard(QtWidgets.QWidget):
         edit_btn_layout.addWidget(cancel_btn)
         edit_layout.addLayout(edit_btn_layout)
         
-        self.edit_form.hide()
-        
-        self.main_layout.addWidget(self.card_content)
-        self.main_layout.addWidget(self.edit_form)
-        
-        self.setStyleSheet("QWidget { background: rgba(255,255,255,100); border-radius: 18px; padding: 18px; font-family: 'B Yekan'; }")
-        
-        edit_btn.clicked.connect(self.show_edit_form)
-        delete_btn.clicked.connect(self.delete_payment)
         save_btn.clicked.connect(self.save_changes)
-        cancel_btn.clicked.connect(self.hide_edit_form)
-
-    def show_edit_form(self):
-        self.card_content.hide()
-        self.edit_form.show()
-
-    def hide_edit_form(self):
-        self.edit_form.hide()
-        self.card_content.show()
+        cancel_btn.clicked.connect(self.reject)
 
     def save_changes(self):
         try:
@@ -253,30 +191,15 @@ class PaymentCard(QtWidgets.QWidget):
             description = self.edit_description.text().strip()
             status = self.edit_status.currentText()
             
-            # Get admin name from parent widget
-            admin_name = getattr(self.parent_widget, 'admin_name', None)
-            if admin_name:
-                admin_info = f" (دریافت توسط: {admin_name})"
+            if self.admin_name:
+                admin_info = f" (دریافت توسط: {self.admin_name})"
                 if admin_info not in description:
                     description += admin_info
             
             from .database import db
-            with db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE transactions 
-                    SET amount = ?, description = ?
-                    WHERE id = ?
-                """, (amount, description, self.payment['transaction_id']))
-                cursor.execute("""
-                    UPDATE member_payments 
-                    SET status = ?
-                    WHERE id = ?
-                """, (status, self.payment['id']))
-                conn.commit()
-
-            self.hide_edit_form()
-            self.parent_widget.load_payments()
+            self.updated_payment = db.update_payment(self.payment['id'], amount, description, status)
+
+            self.accept()
             
         except ValueError:
             popup = CustomMessageBox(
@@ -293,31 +216,6 @@ class PaymentCard(QtWidgets.QWidget):
             )
             popup.exec_()
 
-    def delete_payment(self):
-        confirm_dialog = CustomMessageBox(
-            self, "تایید حذف",
-            "آیا از حذف این پرداخت اطمینان دارید؟",
-            "warning"
-        )
-        if confirm_dialog.exec_() == QtWidgets.QDialog.Accepted:
-            try:
-                from .database import db
-                with db.get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM member_payments WHERE id = ?", (self.payment['id'],))
-                    cursor.execute("DELETE FROM transactions WHERE id = ?", (self.payment['transaction_id'],))
-                    conn.commit()
-                
-                self.parent_widget.load_payments()
-                
-            except Exception as e:
-                popup = CustomMessageBox(
-                    self, "خطا",
-                    f"حذف پرداخت با خطا مواجه شد:\n{str(e)}",
-                    "error"
-                )
-                popup.exec_()
-
 
 class PaymentWidget(QtWidgets.QWidget):
     def refresh(self):
@@ -330,6 +228,7 @@ class PaymentWidget(QtWidgets.QWidget):
         self.admin_name = admin_name
         self.init_ui()
         self.load_payments()
+        change_bus.changed.connect(self.on_data_changed)
 
     def set_admin_name(self, admin_name):
         self.admin_name = admin_name
@@ -541,14 +440,15 @@ class PaymentWidget(QtWidgets.QWidget):
         stats_layout.addStretch()
         main_layout.addLayout(stats_layout)
         
-        # Scroll area for payment cards
-        self.scroll = QtWidgets.QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.cards_container = QtWidgets.QWidget()
-        self.cards_layout = QtWidgets.QGridLayout(self.cards_container)
-        self.cards_layout.setSpacing(20)
-        self.scroll.setWidget(self.cards_container)
-        main_layout.addWidget(self.scroll)
+        # Payment cards are painted by a delegate; history loads page by page as the list scrolls
+        self.payments_model = PaymentListModel(self)
+        self.payments_model.loadFailed.connect(self.show_load_error)
+        self.card_delegate = PaymentCardDelegate(self)
+        self.card_delegate.editClicked.connect(self.open_edit_dialog)
+        self.card_delegate.deleteClicked.connect(self.delete_payment)
+        self.payments_view = CardListView(self.card_delegate, columns=2)
+        self.payments_view.setModel(self.payments_model)
+        main_layout.addWidget(self.payments_view)
 
     def toggle_form(self):
         if self.form_visible:
@@ -586,150 +486,129 @@ class PaymentWidget(QtWidgets.QWidget):
             popup.exec_()
             return
         
-        try:
-            from .database import db
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            
-            # Check if member exists
-            cursor.execute("SELECT id, name, family FROM members WHERE id = ?", (member_id,))
-            member = cursor.fetchone()
-            if not member:
-                popup = CustomMessageBox(
-                    self, "خطا در ورودی",
-                    "عضو با این کد یافت نشد.",
-                    "error"
-                )
-                popup.exec_()
-                return
-            
-            # Prepare description with admin name
-            admin_info = f" (دریافت توسط: {self.admin_name})" if self.admin_name else ""
-            final_description = description if description else f"پرداخت عضویت {member[1]} {member[2]}"
-            if admin_info and admin_info not in final_description:
-                final_description += admin_info
-
-            # Add transaction
-            cursor.execute("""
-                INSERT INTO transactions (transaction_type, amount, description, created_by, payment_date)
-                VALUES (?, ?, ?, ?, ?)
-            """, ('membership', amount, final_description, 1, payment_date))
-            
-            transaction_id = cursor.lastrowid
-            
-            # Add member payment
-            due_date = (datetime.strptime(payment_date, "%Y-%m-%d") + timedelta(days=30)).strftime("%Y-%m-%d")
-            cursor.execute("""
-                INSERT INTO member_payments (member_id, transaction_id, payment_date, due_date, status)
-                VALUES (?, ?, ?, ?, ?)
-            """, (member_id, transaction_id, payment_date, due_date, 'paid'))
-            
-            conn.commit()
-            conn.close()
-            
-            # Clear form
-            self.input_member_id.clear()
-            self.input_amount.clear()
-            self.input_description.clear()
-            self.input_payment_date.setDate(QtCore.QDate.currentDate())
-            
-            self.toggle_form()
-            self.load_payments()
-            
-            popup = CustomMessageBox(
-                self, "ثبت موفق", 
-                f"پرداخت جدید به مبلغ {amount:,} تومان با موفقیت ثبت شد.",
-                "success"
-            )
-            popup.exec_()
-            
-        except Exception as e:
+        # Check if member exists (from the member index once it is loaded)
+        if member_index.ready:
+            record = member_index.get(member_id)
+            member = (record.id, record.name, record.family) if record else None
+        else:
+            member = db.get_member(member_id)
+            member = (member['id'], member['name'], member['family']) if member else None
+        if not member:
             popup = CustomMessageBox(
-                self, "خطا",
-                f"ثبت پرداخت با خطا مواجه شد:\n{str(e)}",
+                self, "خطا در ورودی",
+                "عضو با این کد یافت نشد.",
                 "error"
             )
             popup.exec_()
+            return
+
+        # Prepare description with admin name
+        admin_info = f" (دریافت توسط: {self.admin_name})" if self.admin_name else ""
+        final_description = description if description else f"پرداخت عضویت {member[1]} {member[2]}"
+        if admin_info and admin_info not in final_description:
+            final_description += admin_info
+
+        # Both rows are written in one transaction on the data service thread;
+        # the new card and totals arrive through the change bus (on_data_changed)
+        from .data_service import data_service
+        data_service.submit(db.add_payment, member_id, amount, final_description, payment_date).then(
+            lambda ids: self.payment_added(ids, amount), self.payment_failed)
+
+    def payment_added(self, ids, amount):
+        if ids is None:
+            CustomMessageBox(self, "خطا در ورودی", "عضو با این کد یافت نشد.", "error").exec_()
+            return
+
+        # Clear form
+        self.input_member_id.clear()
+        self.input_amount.clear()
+        self.input_description.clear()
+        self.input_payment_date.setDate(QtCore.QDate.currentDate())
+
+        self.toggle_form()
+
+        popup = CustomMessageBox(
+            self, "ثبت موفق",
+            f"پرداخت جدید به مبلغ {amount:,} تومان با موفقیت ثبت شد.",
+            "success"
+        )
+        popup.exec_()
+
+    def payment_failed(self, error):
+        popup = CustomMessageBox(
+            self, "خطا",
+            f"ثبت پرداخت با خطا مواجه شد:\n{str(error)}",
+            "error"
+        )
+        popup.exec_()
 
     def load_payments(self, filter_text=None, status_filter=None, date_from=None, date_to=None):
-        try:
-            from .database import db
-            conn = db.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Build query with filters
-            query = """
-                SELECT mp.*, t.amount, t.description, t.transaction_type, t.payment_date as trans_date,
-                       m.name as member_name, m.family as member_family, m.id as member_id
-                FROM member_payments mp
-                JOIN transactions t ON mp.transaction_id = t.id
-                JOIN members m ON mp.member_id = m.id
-                WHERE 1=1
-            """
-            params = []
-            
-            if filter_text:
-                query += " AND (m.name LIKE ? OR m.family LIKE ? OR m.id LIKE ?)"
-                params.extend([f"%{filter_text}%"] * 3)
-            
-            if status_filter and status_filter != "همه پرداخت‌ها":
-                status_map = {
-                    "پرداخت شده": "paid",
-                    "در انتظار": "pending", 
-                    "معوقه": "overdue"
-                }
-                if status_filter in status_map:
-                    query += " AND mp.status = ?"
-                    params.append(status_map[status_filter])
-            
-            if date_from:
-                query += " AND mp.payment_date >= ?"
-                params.append(date_from)
-            
-            if date_to:
-                query += " AND mp.payment_date <= ?"
-                params.append(date_to)
-            
-            query += " ORDER BY mp.payment_date DESC"
-            
-            cursor.execute(query, params)
-            payments = cursor.fetchall()
-            
-            # Calculate statistics
-            cursor.execute("SELECT SUM(amount) FROM transactions WHERE transaction_type = 'membership'")
-            total_income = cursor.fetchone()[0] or 0
-            
-            # Monthly income (current month)
-            current_month = datetime.now().strftime("%Y-%m")
-            cursor.execute("""
-                SELECT SUM(amount) FROM transactions 
-                WHERE transaction_type = 'membership' 
-                AND strftime('%Y-%m', payment_date) = ?
-            """, (current_month,))
-            monthly_income = cursor.fetchone()[0] or 0
-            
-            conn.close()
-            
-            # Update statistics labels
-            self.total_income_label.setText(f"کل درآمد: {total_income:,} تومان")
-            self.monthly_income_label.setText(f"درآمد ماهانه: {monthly_income:,} تومان")
-            
-            # Clear old cards
-            for i in reversed(range(self.cards_layout.count())):
-                widget = self.cards_layout.itemAt(i).widget()
-                if widget:
-                    widget.setParent(None)
-            
-            # Add payment cards
-            for idx, payment in enumerate(payments):
-                card = PaymentCard(payment, parent_widget=self, parent=self)
-                row = idx // 2
-                col = idx % 2
-                self.cards_layout.addWidget(card, row, col)
+        status_map = {
+            "پرداخت شده": "paid",
+            "در انتظار": "pending", 
+            "معوقه": "overdue"
+        }
+        # Only the first page is queried now; the rest follows as the list scrolls
+        self.payments_model.set_query(
+            filter_text=filter_text, status=status_map.get(status_filter),
+            date_from=date_from or None, date_to=date_to or None)
+        self.load_income()
+
+    def load_income(self):
+        # Statistics come from the trigger-maintained revenue rollup
+        from .data_service import data_service
+        data_service.submit(db.get_income_summary, channel='payment-stats').then(
+            self.show_income, self.show_load_error)
+
+    def show_income(self, income):
+        self.total_income_label.setText(f"کل درآمد: {income['total']:,} تومان")
+        self.monthly_income_label.setText(f"درآمد ماهانه: {income['monthly']:,} تومان")
+
+    def show_load_error(self, error):
+        QtWidgets.QMessageBox.critical(self, "خطا", f"بارگذاری پرداخت‌ها با خطا مواجه شد: {error}")
+
+    def open_edit_dialog(self, payment):
+        dialog = PaymentEditDialog(payment, self.admin_name, self)
+        if dialog.exec_() == QtWidgets.QDialog.Accepted:
+            self.payments_model.update_row(payment['id'], dialog.updated_payment)
+
+    def on_data_changed(self, changes):
+        """Apply payment writes made anywhere in the app to the cards and totals shown."""
+        if changes.touches('transactions', 'member_payments'):
+            self.load_income()
+        keys = changes.keys('member_payments')
+        members = changes.keys('members')
+        if members and keys is not None:
+            # Cards show the member's name
+            for payment_id in self.payments_model.payments_of(members):
+                keys.setdefault(payment_id, 'update')
+        if keys == {}:
+            return
+        searching = bool(self.search_edit.text().strip())
+        if searching and keys and 'insert' in keys.values():
+            # Whether a new payment matches the member search is the database's call
+            self.filter_payments()
+        elif not self.payments_model.apply_changes(keys, db.get_payment, insert_new=not searching):
+            self.filter_payments()
+
+    def delete_payment(self, payment):
+        confirm_dialog = CustomMessageBox(
+            self, "تایید حذف",
+            "آیا از حذف این پرداخت اطمینان دارید؟",
+            "warning"
+        )
+        if confirm_dialog.exec_() == QtWidgets.QDialog.Accepted:
+            try:
+                db.delete_payment(payment['id'])
+                self.payments_model.remove_row(payment['id'])
                 
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "خطا", f"بارگذاری پرداخت‌ها با خطا مواجه شد: {e}")
+            except Exception as e:
+                popup = CustomMessageBox(
+                    self, "خطا",
+                    f"حذف پرداخت با خطا مواجه شد:\n{str(e)}",
+                    "error"
+                )
+                popup.exec_()
 
     def filter_payments(self):
         filter_text = self.search_edit.text()
@@ -755,6 +634,11 @@ class PaymentWidget(QtWidgets.QWidget):
         backup_btn.clicked.connect(self.create_database_backup)
         layout.addWidget(backup_btn)
 
+        restore_btn = QtWidgets.QPushButton("بازیابی از پشتیبان")
+        restore_btn.setStyleSheet("background: #2c6e49; color: white; padding: 10px; border-radius: 5px; font-family: 'Dubai Medium';")
+        restore_btn.clicked.connect(self.show_backup_catalog)
+        layout.addWidget(restore_btn)
+
         # Export section
         export_label = QtWidgets.QLabel("خروجی‌گیری:")
         export_label.setStyleSheet("font-size: 14pt; font-family: 'Dubai Medium'; color: #333; margin-top: 20px;")
@@ -793,133 +677,81 @@ class PaymentWidget(QtWidgets.QWidget):
         
         layout.addLayout(date_range)
 
-        dialog.setFixedSize(400, 300)
+        dialog.setFixedSize(400, 350)
         dialog.exec_()
 
     def create_database_backup(self):
-        try:
-            from .database import db
-            source_db = db.db_path
-            backup_dir = os.path.join(os.path.dirname(__file__), 'backups')
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_path = os.path.join(backup_dir, f'gym_backup_{timestamp}.db')
-            
-            shutil.copy2(source_db, backup_path)
-            
-            popup = CustomMessageBox(
-                self, "پشتیبان‌گیری موفق",
-                f"فایل پشتیبان با موفقیت در مسیر زیر ایجاد شد:\n{backup_path}",
-                "success"
-            )
-            popup.exec_()
-        except Exception as e:
-            popup = CustomMessageBox(
+        from .backup import backup_manager
+        from .data_service import data_service
+        # An online backup on the data service thread; writes carry on meanwhile
+        data_service.submit(backup_manager.create_backup).then(
+            self.show_backup_result,
+            lambda e: CustomMessageBox(
                 self, "خطا",
                 f"خطا در ایجاد نسخه پشتیبان:\n{str(e)}",
                 "error"
-            )
-            popup.exec_()
+            ).exec_()
+        )
 
-    def get_export_data(self):
-        try:
-            date_from = self.export_date_from.date().toString("yyyy-MM-dd")
-            date_to = self.export_date_to.date().toString("yyyy-MM-dd")
-            
-            from .database import db
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            
-            query = """
-                SELECT 
-                    m.name || ' ' || m.family as member_name,
-                    m.id as member_id,
-                    t.amount,
-                    t.description,
-                    mp.status,
-                    mp.payment_date,
-                    mp.due_date
-                FROM member_payments mp
-                JOIN transactions t ON mp.transaction_id = t.id
-                JOIN members m ON mp.member_id = m.id
-                WHERE mp.payment_date BETWEEN ? AND ?
-                ORDER BY mp.payment_date DESC
-            """
-            
-            cursor.execute(query, (date_from, date_to))
-            data = cursor.fetchall()
-            headers = ['نام عضو', 'کد عضویت', 'مبلغ', 'توضیحات', 'وضعیت', 'تاریخ پرداخت', 'تاریخ سررسید']
-            
-            return headers, data
-        finally:
-            conn.close()
+    def show_backup_catalog(self):
+        from .BackupDialog import BackupDialog
+        BackupDialog(self).exec_()
+
+    def show_backup_result(self, outcome):
+        backup, created = outcome
+        if created:
+            message = f"فایل پشتیبان با موفقیت در مسیر زیر ایجاد شد:\n{backup.path}"
+        else:
+            message = f"از آخرین پشتیبان تغییری نکرده است؛ همان نسخه معتبر است:\n{backup.path}"
+        CustomMessageBox(self, "پشتیبان‌گیری موفق", message, "success").exec_()
+
+    def run_export(self, file_path, title, error_text):
+        """Stream the export to file_path in the background, with a progress dialog that can cancel it."""
+        date_from = self.export_date_from.date().toString("yyyy-MM-dd")
+        date_to = self.export_date_to.date().toString("yyyy-MM-dd")
+        progress = QtWidgets.QProgressDialog("در حال ایجاد فایل خروجی...", "لغو", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(300)
+        job = ExportJob(file_path, date_from, date_to, parent=self)
+
+        def show_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(min(done, total))
+
+        def finish(message=None, status="success", message_title=title):
+            progress.reset()
+            progress.deleteLater()
+            job.deleteLater()
+            if message:
+                CustomMessageBox(self, message_title, message, status).exec_()
+
+        job.progress.connect(show_progress)
+        job.finished.connect(lambda path, count: finish(
+            f"{count} ردیف با موفقیت در مسیر زیر ذخیره شد:\n{path}"))
+        job.failed.connect(lambda e: finish(f"{error_text}:\n{str(e)}", "error", "خطا"))
+        job.cancelled.connect(finish)
+        progress.canceled.connect(job.cancel)
+        job.start()
 
     def export_to_csv(self):
-        try:
-            headers, data = self.get_export_data()
-            
-            file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
-                self,
-                "ذخیره فایل CSV",
-                os.path.expanduser("~"),
-                "CSV Files (*.csv)"
-            )
-            
-            if file_path:
-                with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(headers)
-                    writer.writerows(data)
-                
-                popup = CustomMessageBox(
-                    self, "خروجی CSV",
-                    f"فایل CSV با موفقیت در مسیر زیر ایجاد شد:\n{file_path}",
-                    "success"
-                )
-                popup.exec_()
-                
-        except Exception as e:
-            popup = CustomMessageBox(
-                self, "خطا",
-                f"خطا در ایجاد فایل CSV:\n{str(e)}",
-                "error"
-            )
-            popup.exec_()
+        file_path, selected_filter = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            "ذخیره فایل CSV",
+            os.path.expanduser("~"),
+            "CSV Files (*.csv);;CSV Files, gzip (*.csv.gz)"
+        )
+        if file_path:
+            self.run_export(with_filter_suffix(file_path, selected_filter), "خروجی CSV", "خطا در ایجاد فایل CSV")
 
     def export_to_json(self):
-        try:
-            headers, data = self.get_export_data()
-            
-            json_data = []
-            for row in data:
-                json_data.append(dict(zip(headers, row)))
-            
-            file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
-                self,
-                "ذخیره فایل JSON",
-                os.path.expanduser("~"),
-                "JSON Files (*.json)"
-            )
-            
-            if file_path:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(json_data, f, ensure_ascii=False, indent=2)
-                
-                popup = CustomMessageBox(
-                    self, "خروجی JSON",
-                    f"فایل JSON با موفقیت در مسیر زیر ایجاد شد:\n{file_path}",
-                    "success"
-                )
-                popup.exec_()
-                
-        except Exception as e:
-            popup = CustomMessageBox(
-                self, "خطا",
-                f"خطا در ایجاد فایل JSON:\n{str(e)}",
-                "error"
-            )
-            popup.exec_()
+        file_path, selected_filter = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            "ذخیره فایل JSON",
+            os.path.expanduser("~"),
+            "JSON Files (*.json);;JSON Lines (*.jsonl);;JSON Lines, gzip (*.jsonl.gz);;JSON Files, gzip (*.json.gz)"
+        )
+        if file_path:
+            self.run_export(with_filter_suffix(file_path, selected_filter), "خروجی JSON", "خطا در ایجاد فایل JSON")
 
 
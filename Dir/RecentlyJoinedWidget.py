@@ -1,11 +1,17 @@
 from PyQt5 import QtWidgets, QtCore
+from .change_bus import change_bus
 from .database import db
+from .member_index import member_index
 
 class RecentlyJoinedWidget(QtWidgets.QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, load=True):
         super().__init__(parent)
+        self.items = {}  # member id -> list item
         self.init_ui()
-        self.load_recently_joined()
+        # Ui_Main fills the list once the member index has loaded instead
+        if load:
+            self.load_recently_joined()
+        change_bus.changed.connect(self.on_data_changed)
 
     def init_ui(self):
         layout = QtWidgets.QVBoxLayout(self)
@@ -42,13 +48,40 @@ class RecentlyJoinedWidget(QtWidgets.QWidget):
 
     def load_recently_joined(self):
         self.list_widget.clear()
-        members = db.get_members()
-        for member in members:
-            m = dict(member)
-            display = f"{m['name']} {m['family']} | کد: {m['id']}"
-            item = QtWidgets.QListWidgetItem(display)
-            item.setTextAlignment(QtCore.Qt.AlignCenter)
-            self.list_widget.addItem(item)
+        self.items = {}
+        members = member_index.all() if member_index.ready else db.get_members()
+        for m in members:
+            self.add_member_item(m)
+
+    def add_member_item(self, m):
+        item = QtWidgets.QListWidgetItem(self.member_text(m))
+        item.setTextAlignment(QtCore.Qt.AlignCenter)
+        self.list_widget.addItem(item)
+        self.items[m['id']] = item
+
+    @staticmethod
+    def member_text(m):
+        return f"{m['name']} {m['family']} | کد: {m['id']}"
+
+    def on_data_changed(self, changes):
+        """Add, relabel or drop the items of the members that changed."""
+        if 'members' not in changes:
+            return
+        keys = changes.keys('members')
+        if keys is None:
+            self.load_recently_joined()
+            return
+        for member_id in keys:
+            member = member_index.get(member_id) if member_index.ready else db.get_member(member_id)
+            item = self.items.get(member_id)
+            if member is None:
+                if item is not None:
+                    self.list_widget.takeItem(self.list_widget.row(item))
+                    del self.items[member_id]
+            elif item is None:
+                self.add_member_item(member)
+            else:
+                item.setText(self.member_text(member))
 
 if __name__ == "__main__":
     import sys
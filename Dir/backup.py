@@ -0,0 +1,412 @@
+"""Online backups of gym.db with deduplication and a retention policy.
+
+A backup is taken with SQLite's backup API from a connection of its own,
+a number of pages per step, so it reads a consistent snapshot while the app
+keeps writing (in WAL mode readers never block the writer). The snapshot
+is hashed; if it is identical to the newest backup nothing is kept.
+Otherwise it is stored, gzip-compressed by default, next to a JSON sidecar
+with its hash, and old backups are thinned out by RetentionPolicy:
+
+    gym_backup_20250711_093000.db.gz
+    gym_backup_20250711_093000.db.gz.json
+
+The sidecars are the backup catalog: each is a manifest with the time,
+schema version, row counts of the main tables, checksum and size, so the
+list of backups can be shown without opening any of them. verify() checks
+a backup's checksum and runs PRAGMA quick_check on it; restore() verifies
+one, brings it to the current schema and swaps it in for the live
+database without restarting the app.
+
+Backups live in a 'backups' directory beside the database, which is the
+per-user writable location. BackupScheduler takes one whenever the newest
+is older than its interval.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+
+from PyQt5 import QtCore
+
+from .database import db
+from .migrations import SCHEMA_VERSION, get_schema_version, migrate
+
+BACKUP_PREFIX = 'gym_backup_'
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+SIDECAR_SUFFIX = '.json'
+# Tables whose row counts go into the manifest
+MANIFEST_TABLES = ('members', 'member_payments', 'transactions', 'equipment', 'users')
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    partial = path + '.part'
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(partial, path)
+
+
+def _copy_hashed(src, dst_path):
+    """Copy the file object src to dst_path; returns the sha256 of the bytes copied."""
+    digest = hashlib.sha256()
+    with open(dst_path, 'wb') as dst:
+        for block in iter(lambda: src.read(1 << 20), b''):
+            digest.update(block)
+            dst.write(block)
+    return digest.hexdigest()
+
+
+def describe(path):
+    """Schema version and row counts of the database file at path."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return {
+            'schema_version': get_schema_version(conn),
+            'row_counts': {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                           for table in MANIFEST_TABLES if table in tables},
+        }
+    finally:
+        conn.close()
+
+
+def quick_check(path):
+    """Problems PRAGMA quick_check finds in the database file at path ([] if none)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA quick_check")]
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    finally:
+        conn.close()
+    return [] if rows == ['ok'] else rows
+
+
+class RestoreError(Exception):
+    """A backup that failed verification or cannot be restored into this version."""
+
+
+class _TooManyRestarts(Exception):
+    """Raised from the backup progress callback to abandon a stepwise copy."""
+
+
+class Backup:
+    """One stored backup, described by its sidecar."""
+
+    def __init__(self, path, info):
+        self.path = path
+        self.info = info
+        self.created = datetime.strptime(info['created'], TIMESTAMP_FORMAT)
+        self.sha256 = info['sha256']
+        self.compressed = info.get('compressed', path.endswith('.gz'))
+        # Uncompressed size; the manifest fields below are absent from older sidecars
+        self.size = info.get('size')
+        self.schema_version = info.get('schema_version')
+        self.row_counts = info.get('row_counts', {})
+
+    @property
+    def sidecar(self):
+        return self.path + SIDECAR_SUFFIX
+
+    def __repr__(self):
+        return f"Backup({os.path.basename(self.path)!r})"
+
+
+class RetentionPolicy:
+    """Which backups to keep: the newest keep_last, plus the newest of each of
+    the last daily days and of each of the last weekly ISO weeks."""
+
+    def __init__(self, keep_last=5, daily=7, weekly=8):
+        self.keep_last = keep_last
+        self.daily = daily
+        self.weekly = weekly
+
+    def select(self, backups, now=None):
+        """The subset of backups to keep."""
+        now = now or datetime.now()
+        newest_first = sorted(backups, key=lambda b: b.created, reverse=True)
+        keep = set(newest_first[:self.keep_last])
+        days, weeks = set(), set()
+        day_cutoff = (now - timedelta(days=self.daily)).date()
+        week_cutoff = (now - timedelta(weeks=self.weekly)).date()
+        for backup in newest_first:
+            day = backup.created.date()
+            if day > day_cutoff and day not in days:
+                days.add(day)
+                keep.add(backup)
+            week = day.isocalendar()[:2]
+            if day > week_cutoff and week not in weeks:
+                weeks.add(week)
+                keep.add(backup)
+        return keep
+
+
+class BackupManager:
+    """Takes, lists and prunes the backups of one database."""
+
+    # Pages copied per backup step; the read lock is released between steps
+    DEFAULT_PAGES_PER_STEP = 1024
+    # Restarts caused by concurrent writes before the copy is made in one step
+    MAX_RESTARTS = 3
+
+    def __init__(self, database=None, directory=None, pages_per_step=DEFAULT_PAGES_PER_STEP,
+                 compress=True, policy=None):
+        self.db = database or db
+        self.directory = directory or os.path.join(os.path.dirname(os.path.abspath(self.db.db_path)), 'backups')
+        self.pages_per_step = pages_per_step
+        self.compress = compress
+        self.policy = policy or RetentionPolicy()
+
+    def backups(self):
+        """Stored backups, newest first (files without a readable sidecar are ignored)."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith(BACKUP_PREFIX) and name.endswith(SIDECAR_SUFFIX)):
+                continue
+            path = os.path.join(self.directory, name[:-len(SIDECAR_SUFFIX)])
+            try:
+                with open(path + SIDECAR_SUFFIX, encoding='utf-8') as f:
+                    info = json.load(f)
+                if os.path.exists(path):
+                    found.append(Backup(path, info))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping backup {name}: {e}")
+        return sorted(found, key=lambda b: b.created, reverse=True)
+
+    def latest(self):
+        backups = self.backups()
+        return backups[0] if backups else None
+
+    def snapshot(self, target_path, progress=None):
+        """Copy the live database to target_path with the backup API.
+
+        progress(remaining, total) is called after each step of
+        pages_per_step pages. A write by another connection between steps
+        makes SQLite start the copy again; after MAX_RESTARTS of those the
+        copy is made in a single step, which holds one read transaction (in
+        WAL mode that still does not block the writer). The copy is
+        switched out of WAL mode so it is a single self-contained file.
+        """
+        source = sqlite3.connect(self.db.db_path, timeout=self.db.busy_timeout_ms / 1000)
+        target = sqlite3.connect(target_path)
+        try:
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=self._step_callback(progress))
+            except _TooManyRestarts:
+                source.backup(target, pages=-1)
+                if progress is not None:
+                    progress(0, 0)
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+
+    def _step_callback(self, progress):
+        last = {'remaining': None, 'restarts': 0}
+
+        def step(status, remaining, total):
+            if last['remaining'] is not None and remaining > last['remaining']:
+                last['restarts'] += 1
+                if last['restarts'] > self.MAX_RESTARTS:
+                    raise _TooManyRestarts()
+            last['remaining'] = remaining
+            if progress is not None:
+                progress(remaining, total)
+        return step
+
+    def _new_path(self, now):
+        base = os.path.join(self.directory, BACKUP_PREFIX + now.strftime(TIMESTAMP_FORMAT))
+        suffix = '.db.gz' if self.compress else '.db'
+        path, n = base + suffix, 1
+        while os.path.exists(path):
+            path, n = f"{base}_{n}{suffix}", n + 1
+        return path
+
+    def create_backup(self, progress=None):
+        """Back up the database; returns (backup, created).
+
+        When the snapshot is identical to the newest backup, that backup is
+        returned with created False and nothing new is stored.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        now = datetime.now()
+        path = self._new_path(now)
+        snapshot = path + '.snapshot'
+        try:
+            self.snapshot(snapshot, progress)
+            digest = _sha256(snapshot)
+            latest = self.latest()
+            if latest is not None and latest.sha256 == digest:
+                return latest, False
+            info = {
+                'created': now.strftime(TIMESTAMP_FORMAT),
+                'sha256': digest,
+                'size': os.path.getsize(snapshot),
+                'compressed': self.compress,
+            }
+            info.update(describe(snapshot))
+            partial = path + '.part'
+            if self.compress:
+                # Dedup compares the plain snapshot's sha256 above. An empty name and
+                # mtime=0 just keep the temporary path and the time out of the header
+                with open(snapshot, 'rb') as src, open(partial, 'wb') as raw, \
+                        gzip.GzipFile(filename='', fileobj=raw, mode='wb', compresslevel=6, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+            else:
+                shutil.copyfile(snapshot, partial)
+            os.replace(partial, path)
+            _write_json(path + SIDECAR_SUFFIX, info)
+        finally:
+            for leftover in (snapshot, path + '.part'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        backup = Backup(path, info)
+        self.apply_retention()
+        return backup, True
+
+    def extract(self, backup, target_path):
+        """Write the plain database file of backup to target_path; returns its sha256."""
+        opener = gzip.open if backup.compressed else open
+        with opener(backup.path, 'rb') as src:
+            return _copy_hashed(src, target_path)
+
+    def _check_extracted(self, backup, path, digest):
+        problems = []
+        if digest != backup.sha256:
+            problems.append("checksum does not match the manifest")
+        problems.extend(quick_check(path))
+        return problems
+
+    def verify(self, backup):
+        """Problems found in backup ([] if none): its checksum against the manifest, then PRAGMA quick_check."""
+        os.makedirs(self.directory, exist_ok=True)
+        handle, path = tempfile.mkstemp(suffix='.verify', dir=self.directory)
+        os.close(handle)
+        try:
+            try:
+                digest = self.extract(backup, path)
+            except (OSError, EOFError, zlib.error) as e:
+                return [f"unreadable: {e}"]
+            return self._check_extracted(backup, path, digest)
+        finally:
+            os.remove(path)
+
+    def restore(self, backup):
+        """Replace the live database with backup; returns the backup taken of the database it replaced.
+
+        The backup is extracted next to the database, verified, migrated to
+        the current schema and switched to WAL before it goes live, so the
+        swap itself is a rename. Callers stop other database work first and
+        afterwards tell the views that every table changed.
+        """
+        if backup.schema_version is not None and backup.schema_version > SCHEMA_VERSION:
+            raise RestoreError("backup was made by a newer version of the app")
+        staged = self.db.db_path + '.restore'
+        try:
+            try:
+                digest = self.extract(backup, staged)
+            except (OSError, EOFError, zlib.error) as e:
+                raise RestoreError(f"unreadable: {e}")
+            problems = self._check_extracted(backup, staged, digest)
+            if problems:
+                raise RestoreError("; ".join(problems))
+            conn = sqlite3.connect(staged)
+            try:
+                if get_schema_version(conn) > SCHEMA_VERSION:
+                    raise RestoreError("backup was made by a newer version of the app")
+                migrate(conn)
+                conn.execute("PRAGMA journal_mode=WAL")
+            finally:
+                conn.close()
+            # The database being replaced stays recoverable
+            previous, _created = self.create_backup()
+            self.db.replace_file(staged)
+        finally:
+            for leftover in (staged, staged + '-journal', staged + '-wal', staged + '-shm'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        return previous
+
+    def apply_retention(self, now=None):
+        """Delete the backups the policy does not keep; returns their paths."""
+        backups = self.backups()
+        keep = self.policy.select(backups, now)
+        removed = []
+        for backup in backups:
+            if backup in keep:
+                continue
+            for path in (backup.path, backup.sidecar):
+                if os.path.exists(path):
+                    os.remove(path)
+            removed.append(backup.path)
+        return removed
+
+
+class BackupScheduler(QtCore.QObject):
+    """Backs up on the data service worker whenever the newest backup is older than interval_hours."""
+
+    DEFAULT_INTERVAL_HOURS = 24
+    # How often the age of the newest backup is checked
+    CHECK_INTERVAL_MS = 10 * 60 * 1000
+
+    finished = QtCore.pyqtSignal(object, bool)
+    failed = QtCore.pyqtSignal(object)
+
+    def __init__(self, manager=None, interval_hours=DEFAULT_INTERVAL_HOURS, parent=None):
+        super().__init__(parent)
+        self.manager = manager or backup_manager
+        self.interval = timedelta(hours=interval_hours)
+        self._running = False
+        self._last_checked = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(self.CHECK_INTERVAL_MS)
+        self._timer.timeout.connect(self.check)
+
+    def start(self):
+        """Check now and then periodically (GUI thread)."""
+        self._timer.start()
+        self.check()
+
+    def stop(self):
+        self._timer.stop()
+
+    def check(self):
+        if self._running:
+            return
+        # Deduplicated runs store nothing, so the last attempt counts as well
+        last = max(filter(None, [self._last_checked, getattr(self.manager.latest(), 'created', None)]),
+                   default=None)
+        if last is not None and datetime.now() - last < self.interval:
+            return
+        from .data_service import data_service
+        self._running = True
+        self._last_checked = datetime.now()
+        data_service.submit(self.manager.create_backup).then(self._done, self._failed)
+
+    def _done(self, outcome):
+        self._running = False
+        self.finished.emit(*outcome)
+
+    def _failed(self, error):
+        self._running = False
+        print(f"Scheduled backup failed: {error}")
+        self.failed.emit(error)
+
+
+# Shared manager and scheduler; Ui_Main starts the scheduler after startup
+backup_manager = BackupManager()
+backup_scheduler = BackupScheduler()
@@ -0,0 +1,130 @@
+"""Card creation benchmark: per-card style sheets versus the shared theme.
+
+Builds equipment cards in an offscreen window twice: styled the old way, where
+each card and its children call setStyleSheet with their own CSS
+(LEGACY_STYLES repeats those strings), and styled by the theme sheet
+installed once on the host. Each round times building, laying out and
+polishing the cards; a final round times rebinding them through a CardPool.
+
+Run from the project root:
+
+    python -m Dir.bench_cards [--cards 150] [--rounds 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtWidgets
+
+from . import theme
+from .card_pool import CardPool
+from .ManageWidget import EquipmentCard
+
+_FONT = "font-family: 'B Yekan';"
+# The inline sheets the equipment card set before the theme: (child attribute or None for the card, sheet)
+LEGACY_STYLES = [
+    (None, "QWidget { background: rgba(255,255,255,100); border-radius: 18px; padding: 18px; " + _FONT + " }"),
+    ('name_label', _FONT + " padding: 10px;"),
+    ('date_label', _FONT + " padding: 10px;"),
+    ('status_label', _FONT + " padding: 10px;"),
+    ('description_label', _FONT + " padding: 10px;"),
+    ('edit_name', "font-size: 15pt; padding: 8px 16px; border-radius: 8px; " + _FONT),
+    ('edit_purchase_date', "font-size: 15pt; padding: 8px 16px; border-radius: 8px; " + _FONT),
+    ('edit_description', "font-size: 15pt; padding: 8px 16px; border-radius: 8px; " + _FONT),
+    ('edit_status', "font-size: 15pt; padding: 8px 16px; border-radius: 8px; " + _FONT),
+]
+_LEGACY_BUTTONS = {
+    'editButton': "color: white; " + _FONT + " background-color: " + theme.GRADIENT
+                  + "; border-radius: 8px; font-size: 12pt; padding: 6px 18px;",
+    'deleteButton': "background: #d32f2f; color: white; font-size: 12pt; " + _FONT + " border-radius: 8px; padding: 6px 18px;",
+    'saveButton': "background: #009966; color: white; font-size: 12pt; " + _FONT + " border-radius: 8px; padding: 8px 16px;",
+    'cancelButton': "background: #888; color: white; font-size: 12pt; " + _FONT + " border-radius: 8px; padding: 8px 16px;",
+}
+STATUSES = list(theme.EQUIPMENT_STATES)
+
+
+def sample_equipment(count, offset=0):
+    return [{'id': i, 'name': f"تجهیز {i}", 'purchase_date': '2024-03-20', 'description': 'توضیح نمونه',
+             'status': STATUSES[i % len(STATUSES)]} for i in range(offset, offset + count)]
+
+
+def legacy_card(equipment, parent):
+    """A card styled as before: its own sheet plus one per child."""
+    card = EquipmentCard(equipment, parent_widget=None, parent=parent)
+    card.setObjectName('')
+    for attribute, sheet in LEGACY_STYLES:
+        (getattr(card, attribute) if attribute else card).setStyleSheet(sheet)
+    for button in card.findChildren(QtWidgets.QPushButton):
+        button.setStyleSheet(_LEGACY_BUTTONS[button.objectName()])
+    return card
+
+
+def themed_card(equipment, parent):
+    return EquipmentCard(equipment, parent_widget=None, parent=parent)
+
+
+def build_round(app, factory, themed, equipment):
+    """Seconds to create, lay out and polish one screenful of cards."""
+    host = QtWidgets.QWidget()
+    if themed:
+        theme.apply(host)
+    grid = QtWidgets.QGridLayout(host)
+    start = time.perf_counter()
+    cards = []
+    for i, item in enumerate(equipment):
+        card = factory(item, host)
+        grid.addWidget(card, i // 3, i % 3)
+        cards.append(card)
+    host.show()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    return elapsed, host, grid, cards
+
+
+def rebind_round(app, host, grid, cards, equipment):
+    """Seconds to hand every card to a pool and take them back bound to new rows."""
+    pool = CardPool(None, limit=len(cards))
+    start = time.perf_counter()
+    for i in reversed(range(grid.count())):
+        pool.release(grid.takeAt(i).widget())
+    for i, item in enumerate(equipment):
+        card = pool.acquire(item)
+        grid.addWidget(card, i // 3, i % 3)
+        card.show()
+    app.processEvents()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=150)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args(argv)
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    app.setStyle('Fusion')
+    equipment = sample_equipment(args.cards)
+    results = {}
+    for label, factory, themed in (("per-card sheets", legacy_card, False), ("theme sheet", themed_card, True)):
+        times = []
+        for _ in range(args.rounds):
+            elapsed, host, grid, cards = build_round(app, factory, themed, equipment)
+            times.append(elapsed)
+            host.deleteLater()
+            app.sendPostedEvents(None, 0)
+        elapsed, host, grid, cards = build_round(app, factory, themed, equipment)
+        rebind = rebind_round(app, host, grid, cards, sample_equipment(args.cards, offset=args.cards))
+        host.deleteLater()
+        results[label] = statistics.median(times)
+        print(f"{label:16} build {results[label] * 1000:8.1f} ms "
+              f"({results[label] * 1000 / args.cards:.2f} ms/card), rebind {rebind * 1000:7.1f} ms")
+    before, after = results["per-card sheets"], results["theme sheet"]
+    print(f"\ntheme sheet builds cards {before / after:.1f}x faster ({args.cards} cards, median of {args.rounds})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Reuse of card widgets across list reloads.
+
+Building a card means creating its child widgets, parsing their style sheets
+and polishing them; binding an existing card to new data only sets texts.
+A list that reloads (a new search, a status filter, an edit) therefore hands
+its cards back to a pool and takes them out again for the next result.
+"""
+
+
+class CardPool:
+    """Keeps released cards, hidden but still parented, and rebinds them on acquire.
+
+    factory(data) builds a new card, and card.bind(data) points an existing
+    one at other data. At most limit cards wait in the pool; cards released
+    beyond that are destroyed with deleteLater.
+    """
+
+    DEFAULT_LIMIT = 60
+
+    def __init__(self, factory, limit=DEFAULT_LIMIT):
+        self.factory = factory
+        self.limit = limit
+        self._free = []
+
+    def __len__(self):
+        return len(self._free)
+
+    def acquire(self, data):
+        """A card showing data: a pooled one if there is one, else a new one."""
+        if self._free:
+            card = self._free.pop()
+            card.bind(data)
+            return card
+        return self.factory(data)
+
+    def release(self, card):
+        """Take a card out of use; the caller has already removed it from its layout."""
+        card.hide()
+        if len(self._free) < self.limit:
+            self._free.append(card)
+        else:
+            card.deleteLater()
+
+    def clear(self):
+        """Destroy every pooled card."""
+        for card in self._free:
+            card.deleteLater()
+        self._free = []
@@ -0,0 +1,100 @@
+"""Application-wide notification of committed database writes.
+
+Database.notify_change reports every write as (table, key, operation) on
+the thread that made it. The bus collects those reports on the GUI thread
+and, a moment after the first one, emits them together as one ChangeSet, so
+a burst of writes (a renewal touches a member, a transaction and a payment)
+refreshes each view once:
+
+    change_bus.changed.connect(self.on_data_changed)
+
+    def on_data_changed(self, changes):
+        if 'members' in changes:
+            ...
+"""
+from PyQt5 import QtCore
+
+from .database import db
+
+
+class ChangeSet:
+    """The writes of one coalescing interval, by table and key.
+
+    Several writes to the same row collapse into one operation: the last one,
+    except that a row inserted and then updated is still reported as inserted.
+    A key of None in notify_change marks the whole table as changed.
+    """
+
+    def __init__(self):
+        self._tables = {}
+
+    def add(self, table, key, operation):
+        keys = self._tables.setdefault(table, {})
+        if keys is None:
+            return
+        if key is None:
+            self._tables[table] = None
+        elif not (operation == 'update' and keys.get(key) == 'insert'):
+            keys[key] = operation
+
+    def __contains__(self, table):
+        return table in self._tables
+
+    def __bool__(self):
+        return bool(self._tables)
+
+    def touches(self, *tables):
+        return any(table in self._tables for table in tables)
+
+    def tables(self):
+        return list(self._tables)
+
+    def keys(self, table):
+        """{key: operation} for the changed rows of table, {} if it is untouched,
+        or None if the whole table changed and must be read again."""
+        keys = self._tables.get(table, {})
+        return None if keys is None else dict(keys)
+
+    def __repr__(self):
+        return f"ChangeSet({self._tables!r})"
+
+
+class ChangeBus(QtCore.QObject):
+    """Delivers coalesced database changes to widgets on the GUI thread."""
+
+    DEFAULT_INTERVAL_MS = 50
+
+    changed = QtCore.pyqtSignal(object)
+    # Emitted from the writing thread; queued to the GUI thread when they differ
+    _received = QtCore.pyqtSignal(str, object, str)
+
+    def __init__(self, database=None, interval_ms=DEFAULT_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.db = database or db
+        self._pending = ChangeSet()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._received.connect(self._collect)
+        self.db.subscribe(self._on_write)
+
+    def _on_write(self, table, key, operation):
+        self._received.emit(table, key, operation)
+
+    def _collect(self, table, key, operation):
+        self._pending.add(table, key, operation)
+        # Not restarted by later writes, so a steady stream still flushes on time
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """Emit the pending changes now."""
+        self._timer.stop()
+        changes, self._pending = self._pending, ChangeSet()
+        if changes:
+            self.changed.emit(changes)
+
+
+# Shared bus used by the widgets
+change_bus = ChangeBus()
@@ -0,0 +1,126 @@
+"""Picks up writes made to gym.db outside this process.
+
+The maintenance scripts and a second copy of the app write through their
+own connections, which Database.notify_change never hears about. Every poll
+reads PRAGMA data_version, which changes only when another connection has
+committed, so an idle database costs one pragma per interval. When it
+changes, the rows the change_log triggers recorded since the last poll are
+replayed through notify_change, and the member index and the change bus
+refresh just those rows. The log is trimmed when the watcher starts and
+then every PRUNE_INTERVAL_MS, so a copy left running does not grow it
+without limit.
+"""
+import threading
+
+from PyQt5 import QtCore
+
+from .database import db
+from .migrations import CHANGE_LOG_TABLES
+
+
+class ChangeWatcher(QtCore.QObject):
+    """Polls for commits by other connections and reports the rows they changed."""
+
+    DEFAULT_INTERVAL_MS = 1000
+    # More changed rows than this in one table are reported as the whole table changing
+    MAX_KEYS_PER_TABLE = 200
+    PRUNE_INTERVAL_MS = 60 * 60 * 1000
+
+    def __init__(self, database=None, interval_ms=DEFAULT_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.db = database or db
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.poll)
+        self._prune_timer = QtCore.QTimer(self)
+        self._prune_timer.setInterval(self.PRUNE_INTERVAL_MS)
+        self._prune_timer.timeout.connect(self.prune)
+        self._version = None
+        self._last_seq = 0
+        # Rows this process wrote (and announced itself), each with the log
+        # position its write had reached; dropped once the log is read past it
+        self._lock = threading.Lock()
+        self._own = {}
+        # Thread replaying changes; its notifications are not writes of ours
+        self._replaying_thread = None
+        self.db.subscribe(self._on_write)
+
+    def start(self):
+        """Trim the log, note where it ends and start polling (GUI thread)."""
+        self.db.prune_change_log()
+        self._version = self.db.data_version()
+        self._last_seq = self.db.change_log_position()
+        with self._lock:
+            self._own.clear()
+        self._timer.start()
+        self._prune_timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._prune_timer.stop()
+
+    def prune(self):
+        """Trim the log on the data service thread, so the write never waits on the GUI thread."""
+        from .data_service import data_service
+        data_service.submit(self.db.prune_change_log)
+
+    def _on_write(self, table, key, operation):
+        if table not in CHANGE_LOG_TABLES:
+            return
+        with self._lock:
+            if self._replaying_thread == threading.get_ident():
+                return
+        # Announced after the commit, so the log already holds this write's rows
+        position = self.db.change_log_position()
+        with self._lock:
+            self._own[(table, key)] = max(position, self._own.get((table, key), 0))
+
+    def poll(self):
+        """Replay the rows other connections changed since the last poll."""
+        version = self.db.data_version()
+        with self._lock:
+            pending_own = bool(self._own)
+        # Our own commits do not move data_version, but their log rows still need skipping
+        if version == self._version and not pending_own:
+            return
+        self._version = version
+        entries = self.db.read_change_log(self._last_seq)
+        last_seq = entries[-1][0] if entries else self._last_seq
+        with self._lock:
+            own = self._own
+            # Writes announced after the read keep their entries for the next poll
+            self._own = {row: position for row, position in own.items() if position > last_seq}
+        if not entries:
+            return
+        # Sequence numbers have no gaps unless rows we had not read were pruned
+        missed = entries[0][0] > self._last_seq + 1
+        self._last_seq = last_seq
+        changes = {}
+        for seq, table, key, operation in entries:
+            # Rows up to the position of one of our writes to the same row were refreshed by it
+            if seq <= own.get((table, key), 0):
+                continue
+            keys = changes.setdefault(table, {})
+            if not (operation == 'update' and keys.get(key) == 'insert'):
+                keys[key] = operation
+        if missed:
+            changes = {table: None for table in CHANGE_LOG_TABLES}
+        self._replay(changes)
+
+    def _replay(self, changes):
+        with self._lock:
+            self._replaying_thread = threading.get_ident()
+        try:
+            for table, keys in changes.items():
+                if keys is None or len(keys) > self.MAX_KEYS_PER_TABLE:
+                    self.db.notify_change(table, None)
+                    continue
+                for key, operation in keys.items():
+                    self.db.notify_change(table, key, operation)
+        finally:
+            with self._lock:
+                self._replaying_thread = None
+
+
+# Shared watcher; Ui_Main starts it
+change_watcher = ChangeWatcher()
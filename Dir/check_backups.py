@@ -0,0 +1,136 @@
+"""Check that damaged backups are reported by verify() and refused by restore().
+
+Builds a synthetic database, backs it up, then damages copies of the backup
+in the ways a disk or a copy can: a wrong checksum, bytes overwritten in the
+compressed stream (which zlib or the gzip CRC rejects), a truncated file and
+a corrupt database page under a matching checksum, which only quick_check
+can catch. Each one must come back from verify() as a problem list and
+raise RestoreError from restore(), leaving the live database as it was.
+Finally the intact backup is restored, once on this thread and once on a
+data service worker as the backup dialog does it. Exits with 1 if any case
+misbehaves.
+
+Run from the project root:
+
+    python -m Dir.check_backups [--members 2000]
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+from PyQt5 import QtCore
+
+from .backup import Backup, BackupManager, RestoreError
+from .check_query_plans import build_synthetic_db
+from .data_service import DataService
+
+
+def damaged_copies(backup, directory):
+    """(label, Backup) for each way of damaging backup, written to directory."""
+    with open(backup.path, 'rb') as f:
+        packed = f.read()
+    with gzip.open(backup.path, 'rb') as f:
+        plain = f.read()
+
+    def copy(name, data, info=None):
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return Backup(path, info or backup.info)
+
+    # Bytes early in the deflate stream break its block structure (zlib.error);
+    # later ones usually decode to wrong data and fail the gzip CRC
+    early = 128
+    middle = len(packed) // 2
+    bad_page = bytearray(plain)
+    bad_page[8192:12288] = b'\xff' * 4096
+    return [
+        ("wrong checksum", copy('checksum.db.gz', packed, dict(backup.info, sha256='0' * 64))),
+        ("broken deflate stream", copy('deflate.db.gz', packed[:early] + b'\xff' * 8 + packed[early + 8:])),
+        ("overwritten gzip bytes", copy('overwritten.db.gz', packed[:middle] + b'\x00' * 64 + packed[middle + 64:])),
+        ("truncated gzip", copy('truncated.db.gz', packed[:middle])),
+        ("corrupt page", copy('page.db.gz', gzip.compress(bytes(bad_page), mtime=0),
+                              dict(backup.info, sha256=hashlib.sha256(bad_page).hexdigest()))),
+    ]
+
+
+def member_count(database):
+    conn = database.get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def restore_on_worker(database, manager, backup):
+    """Restore backup through a DataService, as BackupDialog does; returns the error or None."""
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv[:1])
+    service = DataService(database)
+    outcome = []
+    service.submit(manager.restore, backup).then(
+        lambda _previous: outcome.append(None), outcome.append)
+    while not outcome:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+    service.shutdown()
+    return outcome[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=2000)
+    args = parser.parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='gym_backups_')
+    failures = []
+    try:
+        database = build_synthetic_db(os.path.join(workdir, 'gym.db'), members=args.members)
+        manager = BackupManager(database, directory=os.path.join(workdir, 'backups'))
+        backup, _ = manager.create_backup()
+        problems = manager.verify(backup)
+        print(f"intact backup: {problems or 'ok'}")
+        if problems:
+            failures.append("the intact backup does not verify")
+        database.add_member('check-backups', 'a', 'b', 'مرد', '0')
+        expected = member_count(database)
+        for label, damaged in damaged_copies(backup, workdir):
+            try:
+                problems = manager.verify(damaged)
+            except Exception as e:
+                failures.append(f"{label}: verify raised {type(e).__name__}: {e}")
+                continue
+            print(f"{label}: {problems[0].splitlines()[0] if problems else 'ok'}")
+            if not problems:
+                failures.append(f"{label}: verify found no problem")
+            try:
+                manager.restore(damaged)
+                failures.append(f"{label}: restore went ahead")
+            except RestoreError:
+                pass
+            except Exception as e:
+                failures.append(f"{label}: restore raised {type(e).__name__}: {e}")
+            if member_count(database) != expected:
+                failures.append(f"{label}: the live database changed")
+        manager.restore(backup)
+        if member_count(database) != expected - 1:
+            failures.append("restoring the intact backup did not bring back its members")
+        database.add_member('check-backups', 'a', 'b', 'مرد', '0')
+        error = restore_on_worker(database, manager, backup)
+        print(f"restore on the data service thread: {error or 'ok'}")
+        if error is not None:
+            failures.append(f"restore on the data service thread raised {type(error).__name__}: {error}")
+        elif member_count(database) != expected - 1:
+            failures.append("restoring on the data service thread did not bring back its members")
+        database.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        print(f"  FAILED {failure}")
+    print("\nFAILED" if failures else "\nOK")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Parity check of the date_utils lookup table against jdatetime.
+
+Converts every day the table covers, plus a margin on each side that takes
+the fallback path, with both date_utils and plain jdatetime (the code
+date_utils replaced), in both directions and for both output formats. Also
+feeds every Jalali day number up to 31 of every month, so that dates which
+do not exist must be rejected the same way. Exits with 1 on the first
+mismatches, and finishes with a timing of both versions.
+
+Run from the project root:
+
+    python -m Dir.check_jalali_table [--margin 400]
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import jdatetime
+
+from . import date_utils
+
+MAX_REPORTED = 20
+
+
+def reference_gregorian_to_jalali(date_str):
+    try:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        return jdatetime.date.fromgregorian(date=date_obj.date()).strftime("%Y/%m/%d")
+    except Exception:
+        return None
+
+
+def reference_jalali_to_gregorian(jalali_date_str):
+    try:
+        return jdatetime.datetime.strptime(jalali_date_str, "%Y/%m/%d").togregorian().strftime("%Y-%m-%d")
+    except Exception:
+        return None
+
+
+def reference_format_jalali_date(date_str):
+    try:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        jalali = jdatetime.date.fromgregorian(date=date_obj.date())
+        return f"{jalali.day} {date_utils.MONTH_NAMES[jalali.month - 1]} {jalali.year}"
+    except Exception:
+        return date_utils.UNKNOWN_DATE
+
+
+def gregorian_days(table, margin):
+    day = date.fromordinal(table.first_ordinal) - timedelta(days=margin)
+    end = date.fromordinal(table.end_ordinal) + timedelta(days=margin)
+    while day < end:
+        yield day
+        day += timedelta(days=1)
+
+
+def jalali_strings(table, margin_years):
+    for year in range(table.first_year - margin_years, table.last_year + margin_years + 1):
+        for month in range(1, 13):
+            for day in range(1, 32):
+                yield f"{year}/{month:02d}/{day:02d}"
+                if month < 10 or day < 10:
+                    yield f"{year}/{month}/{day}"
+
+
+def compare(label, func, reference, values, mismatches):
+    count = 0
+    for value in values:
+        count += 1
+        got, expected = func(value), reference(value)
+        if got != expected:
+            mismatches.append(f"{label}({value!r}) = {got!r}, jdatetime gives {expected!r}")
+            if len(mismatches) >= MAX_REPORTED:
+                break
+    return count
+
+
+def timed(func, values):
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--margin', type=int, default=400, help="days checked outside the table on each side")
+    args = parser.parse_args(argv)
+    table = date_utils.jalali_table()
+    print(f"table: Jalali {table.first_year}-{table.last_year}, {len(table.days)} days")
+    iso_days = [day.isoformat() for day in gregorian_days(table, args.margin)]
+    jalali_days = list(jalali_strings(table, 2))
+    odd_inputs = ["2024-3-5", "2024-02-30", " 2024-03-20", "2024-03-20 10:00", "0999-01-01", "۲۰۲۴-۰۳-۲۰",
+                  "1404/۰۴/20", "1403/12/30", "1404/12/30", "1404/13/01", "1404/00/01", "404/04/20", "abc", "//"]
+    mismatches = []
+    # Uncached functions, so every value is converted rather than looked up
+    checks = [
+        ("gregorian_to_jalali", date_utils.gregorian_to_jalali.__wrapped__, reference_gregorian_to_jalali),
+        ("format_jalali_date", date_utils.format_jalali_date.__wrapped__, reference_format_jalali_date),
+        ("jalali_to_gregorian", date_utils.jalali_to_gregorian.__wrapped__, reference_jalali_to_gregorian),
+    ]
+    for label, func, reference in checks:
+        values = jalali_days if label == "jalali_to_gregorian" else iso_days
+        count = compare(label, func, reference, values + odd_inputs, mismatches)
+        print(f"{label}: {count} values compared")
+    columns = date_utils.gregorian_to_jalali_many(iso_days[:1000] * 2)
+    if columns != [reference_gregorian_to_jalali(value) for value in iso_days[:1000] * 2]:
+        mismatches.append("gregorian_to_jalali_many differs from converting one value at a time")
+    for mismatch in mismatches:
+        print(f"  MISMATCH {mismatch}")
+    sample = iso_days[::7]
+    before = timed(reference_gregorian_to_jalali, sample)
+    after = timed(date_utils.gregorian_to_jalali.__wrapped__, sample)
+    print(f"\ngregorian_to_jalali: jdatetime {before / len(sample) * 1e6:.2f} us, "
+          f"table {after / len(sample) * 1e6:.2f} us per date ({before / after:.0f}x)")
+    print("\nFAILED" if mismatches else "\nOK")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Query-plan regression check for the public Database queries.
+
+Builds a large synthetic database, calls every public query method while
+recording the SQL it runs, and asks SQLite for the plan of each SELECT. The
+check fails (exit code 1) if any statement falls back to a full table scan
+that is not listed in KNOWN_SCANS.
+
+Run from the project root:
+
+    python -m Dir.check_query_plans [--members 20000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from .database import Database
+from .date_utils import get_current_jalali_date, register_sql_functions
+
+
+# Methods allowed to scan, with the reason. Keep this list short: every entry
+# is a query whose cost grows with the table.
+KNOWN_SCANS = {
+    'get_members()': "lists every member by design",
+    'search_members(short)': "terms under three characters are substring matches, which no index serves",
+}
+
+FIRST_NAMES = ["علی", "مریم", "حسین", "سارا", "رضا", "زهرا", "محمد", "فاطمه", "امیر", "نگار"]
+LAST_NAMES = ["رضایی", "کاظمی", "محمدی", "احمدی", "حسینی", "کریمی", "موسوی", "جعفری"]
+
+
+def build_synthetic_db(path, members=20000, payments_per_member=3, seed=1403):
+    """Create a migrated database at ``path`` filled with synthetic rows."""
+    rng = random.Random(seed)
+    db = Database(path)
+    today = date.today()
+    member_rows = []
+    for i in range(members):
+        start = today - timedelta(days=rng.randint(0, 400))
+        end = start + timedelta(days=30 * rng.randint(1, 3))
+        member_rows.append((
+            str(100000 + i), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+            rng.choice(["مرد", "زن"]), f"0912{rng.randint(0, 9999999):07d}",
+            start.isoformat(), start.isoformat(), end.isoformat(),
+        ))
+    with db.transaction() as conn:
+        conn.executemany('''
+            INSERT INTO members (id, name, family, gender, phone, join_date, start_date, end_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', member_rows)
+        for member_id, *_rest, start, _end in member_rows:
+            for k in range(payments_per_member):
+                paid = (date.fromisoformat(start) + timedelta(days=30 * k)).isoformat()
+                cursor = conn.execute('''
+                    INSERT INTO transactions (transaction_type, amount, description, created_by, payment_date)
+                    VALUES ('membership', 500000, 'synthetic', 1, ?)
+                ''', (paid,))
+                conn.execute('''
+                    INSERT INTO member_payments (member_id, transaction_id, payment_date, due_date, status)
+                    VALUES (?, ?, ?, date(?, '+30 days'), 'paid')
+                ''', (member_id, cursor.lastrowid, paid, paid))
+    return db
+
+
+def query_cases(db):
+    """(label, callable) pairs covering the public query methods."""
+    today = date.today()
+    member_id = '100042'
+    return [
+        ('get_expiring_members()', lambda: db.get_expiring_members(7)),
+        ('get_monthly_fee()', db.get_monthly_fee),
+        ('get_recently_joined_members()', db.get_recently_joined_members),
+        ('get_members()', db.get_members),
+        ('get_members(filter)', lambda: db.get_members('رضا')),
+        ('search_members()', lambda: db.search_members('0912 کاظ')),
+        ('search_members(short)', lambda: db.search_members('رض')),
+        ('member_filter()', lambda: member_filter_query(db, 'كاظمي ۰۹')),
+        ('get_member_payments()', lambda: db.get_member_payments(member_id)),
+        ('get_payments_between_dates()', lambda: db.get_payments_between_dates(
+            (today - timedelta(days=30)).isoformat(), today.isoformat())),
+        ('get_last_payment_for_member()', lambda: db.get_last_payment_for_member(member_id)),
+        ('get_total_members()', db.get_total_members),
+        ('page_members()', lambda: db.page_members(cursor=db.page_members()[1])),
+        ('page_members(filter)', lambda: db.page_members(filter_text='رضا', order_by='start_date')),
+        ('page_payments()', lambda: db.page_payments(cursor=db.page_payments()[1])),
+        ('page_equipment()', lambda: db.page_equipment()),
+        ('get_income_summary()', db.get_income_summary),
+        ('get_revenue_by_period()', lambda: db.get_revenue_by_period('jmonth', '1403-01', '1403-12')),
+        ('get_payments_by_jalali_month()', lambda: db.get_payments_by_jalali_month(
+            int(get_current_jalali_date()[:4]), status='paid')),
+        ('get_dashboard_stats()', lambda: db.get_dashboard_stats('men')),
+        ('verify_user()', lambda: db.verify_user('admin', 'admin123')),
+    ]
+
+
+def member_filter_query(db, text):
+    """Run a payments-style join restricted with Database.member_filter."""
+    condition, params = db.member_filter(text)
+    return db.get_connection().execute(f'''
+        SELECT mp.id FROM member_payments mp
+        JOIN members m ON mp.member_id = m.id
+        WHERE {condition}
+    ''', params).fetchall()
+
+
+def full_scans(conn, sql):
+    """Return the plan lines of ``sql`` that scan a whole table."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    scans = []
+    for row in plan:
+        detail = row[3]
+        if not detail.startswith('SCAN '):
+            continue
+        if 'VIRTUAL TABLE' in detail or 'CONSTANT ROW' in detail:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def check_query_plans(db):
+    """Run every case against ``db``; return a list of (label, sql, scans, known)."""
+    conn = db.get_connection()
+    explain_conn = sqlite3.connect(db.db_path)
+    register_sql_functions(explain_conn)
+    findings = []
+    try:
+        for label, call in query_cases(db):
+            statements = []
+            conn.set_trace_callback(statements.append)
+            started = time.perf_counter()
+            try:
+                call()
+            finally:
+                conn.set_trace_callback(None)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"{label:<34} {elapsed_ms:8.2f} ms")
+            for sql in statements:
+                if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                scans = full_scans(explain_conn, sql)
+                if scans:
+                    findings.append((label, sql, scans, label in KNOWN_SCANS))
+    finally:
+        explain_conn.close()
+    return findings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=20000)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'plans.db')
+        db = build_synthetic_db(path, members=args.members)
+        findings = check_query_plans(db)
+        db.close_all()
+    failed = False
+    for label, sql, scans, known in findings:
+        status = f"known: {KNOWN_SCANS[label]}" if known else "FULL SCAN"
+        failed = failed or not known
+        print(f"\n[{status}] {label}\n  {' '.join(sql.split())}")
+        for detail in scans:
+            print(f"  -> {detail}")
+    print("\nFAILED" if failed else "\nOK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Background execution of database work for the widgets.
+
+Queries and other slow calls (bcrypt checks, file copies) run on one
+long-lived worker thread, which therefore keeps its own pooled connection
+open, and hand their results back to the GUI thread through Qt signals:
+
+    future = data_service.submit(db.search_members, text, channel='members')
+    future.then(self.show_members, self.show_error)
+
+Submitting on a channel cancels the previous request on that channel, so a
+stale keystroke's query is skipped, or interrupted if it is already running,
+and its result is never delivered.
+"""
+import threading
+
+from PyQt5 import QtCore
+
+from .database import db
+
+
+class DbFuture(QtCore.QObject):
+    """Handle for one submitted call; signals are delivered on the GUI thread."""
+
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancelled = False
+        self._done = False
+        self._result = None
+        self._error = None
+
+    def then(self, on_result=None, on_error=None):
+        """Connect callbacks for the result and for an exception; returns self."""
+        if on_result is not None:
+            self.finished.connect(on_result)
+        if on_error is not None:
+            self.failed.connect(on_error)
+        return self
+
+    def cancel(self):
+        """Drop the call: it is skipped if queued and its outcome is never delivered."""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """The result once finished (raises the call's exception if it failed)."""
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _deliver(self, result, error):
+        if self._cancelled:
+            return
+        self._done = True
+        self._result, self._error = result, error
+        if error is not None:
+            self.failed.emit(error)
+        else:
+            self.finished.emit(result)
+
+
+class _DbTask(QtCore.QRunnable):
+    """Runs one call on the worker thread and reports back through its future."""
+
+    def __init__(self, service, future, fn, args, kwargs, interruptible):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.service = service
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.interruptible = interruptible
+        self.conn = None
+        self.running = False
+
+    def run(self):
+        if self.future.is_cancelled():
+            # Bookkeeping stays on the GUI thread; a cancelled future delivers nothing
+            self.service._task_finished.emit(self, (None, None))
+            return
+        with self.service._lock:
+            self.conn = self.service.db.get_connection()
+            self.running = True
+        result = error = None
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            with self.service._lock:
+                self.running = False
+                self.conn = None
+        # Queued across threads, so delivery happens on the GUI thread; the
+        # interrupted statement of a cancelled call is dropped there
+        self.service._task_finished.emit(self, (result, error))
+
+    def cancel(self):
+        """Cancel the future; interrupt the running statement when that is safe."""
+        self.future.cancel()
+        with self.service._lock:
+            if self.running and self.interruptible:
+                self.conn.interrupt()
+
+
+class DataService(QtCore.QObject):
+    """Single background worker for database calls, with per-channel cancellation."""
+
+    _task_finished = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, database=None, parent=None):
+        super().__init__(parent)
+        self._task_finished.connect(self._deliver)
+        self.db = database or db
+        self._pool = QtCore.QThreadPool(self)
+        # One persistent thread, so one dedicated connection that stays open
+        self._pool.setMaxThreadCount(1)
+        self._pool.setExpiryTimeout(-1)
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._channels = {}
+
+    def submit(self, fn, *args, channel=None, interruptible=None, **kwargs):
+        """Run fn(*args, **kwargs) on the worker thread and return a DbFuture.
+
+        A channel names a stream of requests where only the newest matters;
+        submitting on it cancels the one before. Calls on a channel are
+        assumed to be reads, which may be interrupted mid-statement; pass
+        interruptible=False for channel calls that write.
+        """
+        if interruptible is None:
+            interruptible = channel is not None
+        future = DbFuture(self)
+        task = _DbTask(self, future, fn, args, kwargs, interruptible)
+        if channel is not None:
+            previous = self._channels.get(channel)
+            if previous is not None:
+                self.cancel(previous)
+            self._channels[channel] = task
+        self._tasks.add(task)
+        self._pool.start(task)
+        return future
+
+    def cancel(self, target):
+        """Cancel a channel (by name) or a single task."""
+        task = self._channels.pop(target, None) if isinstance(target, str) else target
+        if task is None:
+            return
+        task.cancel()
+        if self._pool.tryTake(task):
+            self._task_done(task)
+
+    def shutdown(self, msecs=5000):
+        """Cancel channel requests and wait for the rest (call when the app quits)."""
+        for channel in list(self._channels):
+            self.cancel(channel)
+        return self._pool.waitForDone(msecs)
+
+    def _deliver(self, task, outcome):
+        self._task_done(task)
+        task.future._deliver(*outcome)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        # Futures are children of the service; free each one (and the slots
+        # connected to it) once it is settled. Deferred, so a delivery in
+        # progress, even one running a nested event loop, finishes first.
+        task.future.deleteLater()
+        for channel, current in list(self._channels.items()):
+            if current is task:
+                del self._channels[channel]
+
+
+# Shared service used by the widgets
+data_service = DataService()
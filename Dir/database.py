@@ -1,11 +1,20 @@
 import sqlite3
 import bcrypt
-from datetime import datetime
+import base64
+import gc
+import json
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import os
 import sys
 import shutil
-from .date_utils import gregorian_to_jalali, jalali_to_gregorian, get_current_jalali_date, format_jalali_date
+import threading
+import weakref
+from contextlib import contextmanager
+from .migrations import migrate, rebuild_revenue_rollup
+from .text_utils import normalize_text, normalize_phone
+from .date_utils import (gregorian_to_jalali, jalali_to_gregorian, get_current_jalali_date, format_jalali_date,
+                         jalali_year_bounds, register_sql_functions)
 
 
 def _get_writable_app_dir() -> Path:
@@ -43,18 +52,166 @@ def _resolve_default_db_path() -> str:
     return str(user_db_path)
 
 
+def _utc_today():
+    """Today's date as SQLite's date('now') sees it (UTC)."""
+    return datetime.now(timezone.utc).date()
+
+
+def _days_from_today(days):
+    """ISO date ``days`` away from the UTC today used by date('now')."""
+    return (_utc_today() + timedelta(days=days)).isoformat()
+
+
+def _encode_cursor(order_key, descending, sort_value, row_id):
+    """Opaque page cursor: the ordering plus the last row's sort key and id."""
+    payload = json.dumps([order_key, int(descending), sort_value, row_id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor, order_key, descending):
+    """Return (sort_value, row_id) from a cursor made for the same ordering."""
+    try:
+        key, desc, sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid page cursor")
+    if key != order_key or bool(desc) != bool(descending):
+        raise ValueError("Page cursor belongs to a different ordering")
+    return sort_value, row_id
+
+
+def _keyset_phases(sort_expr, id_expr, descending, after):
+    """(condition, params) ranges that continue an ordering after ``after``.
+
+    SQLite sorts NULLs first ascending and last descending. The NULL and
+    non-NULL parts are separate phases so each one is a plain index range
+    instead of an OR the planner cannot seek on.
+    """
+    is_null, not_null = f"{sort_expr} IS NULL", f"{sort_expr} IS NOT NULL"
+    op = '<' if descending else '>'
+    if after is None:
+        return [(not_null, []), (is_null, [])] if descending else [(is_null, []), (not_null, [])]
+    sort_value, row_id = after
+    if sort_value is None:
+        phases = [(f"{is_null} AND {id_expr} {op} ?", [row_id])]
+        return phases if descending else phases + [(not_null, [])]
+    phases = [(f"({sort_expr}, {id_expr}) {op} (?, ?)", [sort_value, row_id])]
+    return phases + [(is_null, [])] if descending else phases
+
+
+def _search_terms(text):
+    """Normalized query terms; a term that is a phone number also loses its separators."""
+    terms = []
+    for term in (normalize_text(text) or '').split():
+        phone = normalize_phone(term)
+        terms.append(phone if phone.isdigit() else term)
+    return terms
+
+
+def _fts_match(terms):
+    """FTS5 query ANDing the terms long enough for the trigram index, or None."""
+    long_terms = [term for term in terms if len(term) >= 3]
+    if not long_terms:
+        return None
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in long_terms)
+
+
+def _short_term_conditions(terms, alias):
+    """Substring conditions for terms too short for the trigram index."""
+    conditions, params = [], []
+    for term in terms:
+        if len(term) >= 3:
+            continue
+        # Short terms are rare; checking them with instr keeps LIKE '%x%' semantics
+        conditions.append(f"(instr({alias}.name_norm, ?) > 0 OR instr({alias}.family_norm, ?) > 0 "
+                          f"OR instr({alias}.phone_norm, ?) > 0 OR instr({alias}.id_norm, ?) > 0)")
+        params.extend([term] * 4)
+    return conditions, params
+
+
+_MEMBER_SEARCH_KEYS = ('id_norm', 'name_norm', 'family_norm', 'phone_norm')
+
+
+def _term_matches(term, values):
+    """Python form of one term's search predicate: a substring of one of the values."""
+    return any(term in value for value in values)
+
+
+def _narrows(previous_terms, terms):
+    """True when every member matching terms also matches previous_terms."""
+    # Containing an old term as a substring implies matching it
+    return all(any(old in term for term in terms) for old in previous_terms)
+
+
+class _PooledConnection(sqlite3.Connection):
+    """A long-lived connection that outlives the callers borrowing it.
+
+    Widgets and helpers still call ``conn.close()`` when they are done; for a
+    pooled connection that only discards uncommitted work (as closing used to)
+    and keeps the handle open for the next caller.
+    """
+
+    closed = False
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def _close(self):
+        super().close()
+        self.closed = True
+
+
 class Database:
+    # Connection tuning applied once per pooled connection.
+    DEFAULT_CACHE_SIZE_KB = 16384
+    DEFAULT_MMAP_SIZE = 64 * 1024 * 1024
+    DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+    # Select list shared by the member listing and search queries (alias m).
+    MEMBER_COLUMNS = '''
+        m.*,
+        CASE
+            WHEN m.end_date IS NOT NULL THEN CAST(julianday(m.end_date) - julianday('now') AS INT)
+            ELSE NULL
+        END AS remaining_days,
+        COALESCE(m.join_date, m.created_at) as join_date
+    '''
+
+    # Select list and joins of a payment as the finance screen shows it.
+    PAYMENT_COLUMNS = '''
+        mp.*, t.amount, t.description, t.transaction_type, t.payment_date as trans_date,
+        m.name as member_name, m.family as member_family, m.id as member_id
+    '''
+    PAYMENT_TABLES = '''
+        member_payments mp
+        JOIN transactions t ON mp.transaction_id = t.id
+        JOIN members m ON mp.member_id = m.id
+    '''
+
+    # change_log rows kept when it is pruned; a watcher further behind rereads whole tables.
+    CHANGE_LOG_KEEP = 10000
+
+    # Keyset pagination: rows per page and the indexed columns each list can be ordered by.
+    DEFAULT_PAGE_SIZE = 50
+    MEMBER_SORT_KEYS = {'end_date': 'm.end_date', 'start_date': 'm.start_date'}
+    PAYMENT_SORT_KEYS = {'payment_date': 'mp.payment_date'}
+    EQUIPMENT_SORT_KEYS = {'created_at': 'e.created_at'}
+
     def get_expiring_members(self, days=7):
         """Return members with less than 'days' days remaining. Returns list of dicts with id and name."""
+        if days <= 0:
+            return []
+        # remaining_days truncates a fractional day count, so "0 <= remaining < days"
+        # is exactly "today <= end_date <= today + days" on the raw column.
         with self.get_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, name, family, end_date, CAST(julianday(end_date) - julianday('now') AS INT) AS remaining_days
                 FROM members
-                WHERE end_date IS NOT NULL AND CAST(julianday(end_date) - julianday('now') AS INT) < ? AND CAST(julianday(end_date) - julianday('now') AS INT) >= 0
+                WHERE end_date >= ? AND end_date <= ?
                 ORDER BY end_date ASC
-            ''', (days,))
+            ''', (_days_from_today(0), _days_from_today(days)))
             return [dict(row) for row in cursor.fetchall()]
 
     def get_monthly_fee(self):
@@ -73,6 +230,7 @@ class Database:
             if cursor.rowcount == 0:
                 cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", ('monthly_fee', str(fee)))
             conn.commit()
+        self.notify_change('settings', 'monthly_fee')
     def get_recently_joined_members(self):
         """Return all members who joined in the last 7 days."""
         with self.get_connection() as conn:
@@ -81,34 +239,191 @@ class Database:
             cursor.execute('''
                 SELECT *, CASE WHEN end_date IS NOT NULL THEN CAST(julianday(end_date) - julianday('now') AS INT) ELSE NULL END AS remaining_days
                 FROM members
-                WHERE julianday('now') - julianday(start_date) <= 7
-                ORDER BY end_date DESC
-            ''')
+                WHERE start_date >= ?
+                ORDER BY +end_date DESC  -- '+': sort the few matches instead of walking the end_date index
+            ''', (_days_from_today(-6),))
             return cursor.fetchall()
     def get_members(self, filter_text=None):
         """Return all members, optionally filtered by name, family, phone, or id. Adds remaining_days field."""
+        if filter_text and filter_text.split():
+            return self.search_members(filter_text, limit=None)
         with self.get_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            base_query = '''
-                SELECT 
-                    *,
-                    CASE 
-                        WHEN end_date IS NOT NULL THEN CAST(julianday(end_date) - julianday('now') AS INT)
-                        ELSE NULL
-                    END AS remaining_days,
-                    COALESCE(join_date, created_at) as join_date
-                FROM members
+            cursor.execute(f"SELECT {self.MEMBER_COLUMNS} FROM members m")
+            return cursor.fetchall()
+
+    def search_members(self, text, limit=50):
+        """Return members matching text, best matches first (exact id, then bm25 rank).
+
+        The query is normalized like the stored keys (text_utils), and every
+        whitespace-separated term must occur in the id, name, family or
+        phone. Terms of three or more characters go through the trigram
+        index; shorter ones are checked with instr on the rows it matched,
+        or on every member when the query has only short terms. limit=None
+        returns every match.
+        """
+        terms = _search_terms(text)
+        if not terms:
+            return []
+        match = _fts_match(terms)
+        conditions, params = _short_term_conditions(terms, 'm')
+        if match:
+            query = f'''
+                SELECT {self.MEMBER_COLUMNS}
+                FROM members_fts
+                JOIN members m ON m.rowid = members_fts.rowid
+                WHERE members_fts MATCH ?
             '''
-            if filter_text:
-                cursor.execute(f"{base_query} WHERE name LIKE ? OR family LIKE ? OR phone LIKE ? OR id LIKE ?",
-                             [f"%{filter_text}%"]*4)
-            else:
-                cursor.execute(base_query)
+            params.insert(0, match)
+            order = "ORDER BY (m.id_norm = ?) DESC, members_fts.rank"
+        else:
+            query = f"SELECT {self.MEMBER_COLUMNS} FROM members m WHERE 1=1"
+            order = "ORDER BY (m.id_norm = ?) DESC"
+        for condition in conditions:
+            query += f" AND {condition}"
+        params.extend([' '.join(terms), -1 if limit is None else int(limit)])
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(f"{query} {order} LIMIT ?", params)
             return cursor.fetchall()
 
+    def refine_member_search(self, rows, previous_text, text):
+        """Filter search_members(previous_text) rows down to the matches of text.
+
+        Returns None when text is not a narrowing of previous_text (a term
+        was removed or shortened, or changed into one that does not contain
+        it), in which case the database has to be asked again.
+        The rows keep their order apart from an exact id match moving first.
+        """
+        previous_terms, terms = _search_terms(previous_text), _search_terms(text)
+        if not previous_terms or not terms or not _narrows(previous_terms, terms):
+            return None
+        matches = []
+        for row in rows:
+            values = [row[key] or '' for key in _MEMBER_SEARCH_KEYS]
+            if all(_term_matches(term, values) for term in terms):
+                matches.append(row)
+        exact_id = ' '.join(terms)
+        matches.sort(key=lambda row: row['id_norm'] != exact_id)
+        return matches
+
+    def member_filter(self, text, alias='m'):
+        """Return (condition, params) restricting ``alias`` (a members row) to matches of text.
+
+        Same matching as search_members, for queries that join members; the
+        condition is None when text has no terms.
+        """
+        terms = _search_terms(text)
+        if not terms:
+            return None, []
+        conditions, params = _short_term_conditions(terms, alias)
+        match = _fts_match(terms)
+        if match:
+            conditions.insert(0, f"{alias}.rowid IN (SELECT rowid FROM members_fts WHERE members_fts MATCH ?)")
+            params.insert(0, match)
+        return ' AND '.join(conditions), params
+
+    def rebuild_member_search(self):
+        """Re-index members_fts from members (e.g. after a VACUUM renumbered rowids)."""
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO members_fts (members_fts) VALUES ('rebuild')")
+
+    def _keyset_page(self, columns, from_sql, conditions, params, sort_expr, id_expr, order_key,
+                     descending, page_size, cursor):
+        """Run a keyset-paginated query; returns (rows, next_cursor or None)."""
+        page_size = max(1, int(page_size))
+        after = _decode_cursor(cursor, order_key, descending) if cursor else None
+        direction = 'DESC' if descending else 'ASC'
+        rows = []
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            for phase, phase_params in _keyset_phases(sort_expr, id_expr, descending, after):
+                wanted = page_size + 1 - len(rows)
+                if wanted <= 0:
+                    break
+                where = ' AND '.join(conditions + [phase])
+                conn_cursor = conn.execute(f'''
+                    SELECT {columns}, {sort_expr} AS page_sort_key, {id_expr} AS page_row_id
+                    FROM {from_sql}
+                    WHERE {where}
+                    ORDER BY {sort_expr} {direction}, {id_expr} {direction}
+                    LIMIT ?
+                ''', params + phase_params + [wanted])
+                rows.extend(conn_cursor.fetchall())
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        last = rows[-1]
+        return rows, _encode_cursor(order_key, descending, last['page_sort_key'], last['page_row_id'])
+
+    def page_members(self, page_size=DEFAULT_PAGE_SIZE, cursor=None, order_by='end_date',
+                     descending=False, filter_text=None):
+        """Return (members, next_cursor) for one page, ordered by order_by then row id.
+
+        order_by is one of MEMBER_SORT_KEYS. Pass the returned cursor back to
+        get the following page; it is None after the last page.
+        """
+        if order_by not in self.MEMBER_SORT_KEYS:
+            raise ValueError(f"Cannot page members by {order_by!r}")
+        condition, params = self.member_filter(filter_text)
+        return self._keyset_page(
+            self.MEMBER_COLUMNS, "members m", [condition] if condition else [], params,
+            self.MEMBER_SORT_KEYS[order_by], 'm.rowid', order_by, descending, page_size, cursor)
+
+    def page_payments(self, page_size=DEFAULT_PAGE_SIZE, cursor=None, order_by='payment_date',
+                      descending=True, filter_text=None, status=None, date_from=None, date_to=None):
+        """Return (payments, next_cursor) for one page of member payments, newest first by default.
+
+        Rows carry the transaction amount/description and the member's name,
+        as PaymentWidget shows them; filters match load_payments.
+        """
+        if order_by not in self.PAYMENT_SORT_KEYS:
+            raise ValueError(f"Cannot page payments by {order_by!r}")
+        conditions, params = [], []
+        condition, member_params = self.member_filter(filter_text)
+        if condition:
+            conditions.append(condition)
+            params.extend(member_params)
+        if status:
+            conditions.append("mp.status = ?")
+            params.append(status)
+        if date_from:
+            conditions.append("mp.payment_date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("mp.payment_date <= ?")
+            params.append(date_to)
+        return self._keyset_page(
+            self.PAYMENT_COLUMNS, self.PAYMENT_TABLES, conditions, params, self.PAYMENT_SORT_KEYS[order_by], 'mp.id',
+            order_by, descending, page_size, cursor)
+
+    def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None, order_by='created_at',
+                       descending=True, filter_text=None, status=None):
+        """Return (equipment, next_cursor) for one page, newest first by default."""
+        if order_by not in self.EQUIPMENT_SORT_KEYS:
+            raise ValueError(f"Cannot page equipment by {order_by!r}")
+        conditions, params = [], []
+        if filter_text:
+            conditions.append("e.name LIKE ?")
+            params.append(f"%{filter_text}%")
+        if status:
+            conditions.append("e.status = ?")
+            params.append(status)
+        return self._keyset_page(
+            "e.*", "equipment e", conditions, params, self.EQUIPMENT_SORT_KEYS[order_by], 'e.id',
+            order_by, descending, page_size, cursor)
+
+    def get_member(self, member_id):
+        """Return one member with the listing columns (remaining_days, join_date), or None."""
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            return conn.execute(f"SELECT {self.MEMBER_COLUMNS} FROM members m WHERE m.id = ?",
+                                (member_id,)).fetchone()
+
     def add_member(self, id_, name, family, gender, phone, join_date=None, end_date=None):
-        """Add a new member with start_date, end_date, and specified join_date."""
+        """Add a new member with start_date, end_date, and specified join_date; returns the new row."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             if join_date and end_date:
@@ -133,8 +448,10 @@ class Database:
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (id_, name, family, gender, phone, today, end_date_calc, today))
             conn.commit()
+        self.notify_change('members', id_, 'insert')
+        return self.get_member(id_)
     def update_member(self, member_id, name, family, phone):
-        """Update member information."""
+        """Update member information; returns the updated row."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -143,12 +460,59 @@ class Database:
                 WHERE id = ?
             ''', (name, family, phone, member_id))
             conn.commit()
-    def delete_member(self, member_id):
-        """Delete a member by ID."""
-        with self.get_connection() as conn:
+        self.notify_change('members', member_id)
+        return self.get_member(member_id)
+    def delete_member(self, member_id, with_payments=False):
+        """Delete a member by ID; with_payments also deletes their payments and transactions."""
+        with self.transaction() as conn:
             cursor = conn.cursor()
+            payments = []
+            if with_payments:
+                cursor.execute("SELECT id, transaction_id FROM member_payments WHERE member_id = ?", (member_id,))
+                payments = cursor.fetchall()
+                cursor.execute('''
+                    DELETE FROM transactions
+                    WHERE id IN (SELECT transaction_id FROM member_payments WHERE member_id = ?)
+                ''', (member_id,))
+                cursor.execute("DELETE FROM member_payments WHERE member_id = ?", (member_id,))
             cursor.execute("DELETE FROM members WHERE id = ?", (member_id,))
-            conn.commit()
+        for payment_id, transaction_id in payments:
+            self.notify_change('member_payments', payment_id, 'delete')
+            self.notify_change('transactions', transaction_id, 'delete')
+        self.notify_change('members', member_id, 'delete')
+    def renew_membership(self, member_id, description, days=30):
+        """Extend a membership by days from its end date (or today) and record the fee paid.
+
+        The end date, the transaction and the member payment are written in one
+        transaction. Returns the updated member row, or None if there is no such member.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT end_date FROM members WHERE id = ?", (member_id,))
+            member = cursor.fetchone()
+            if member is None:
+                return None
+            cursor.execute("SELECT value FROM settings WHERE key = 'monthly_fee'")
+            fee = cursor.fetchone()
+            monthly_fee = float(fee[0]) if fee else 750000
+            from datetime import datetime, timedelta
+            start = datetime.strptime(member[0], "%Y-%m-%d") if member[0] else datetime.now()
+            new_end_date = (start + timedelta(days=days)).strftime("%Y-%m-%d")
+            cursor.execute("UPDATE members SET end_date = ? WHERE id = ?", (new_end_date, member_id))
+            cursor.execute('''
+                INSERT INTO transactions (transaction_type, amount, description, created_by, payment_date)
+                VALUES (?, ?, ?, ?, date('now'))
+            ''', ('membership', monthly_fee, description, 1))
+            transaction_id = cursor.lastrowid
+            cursor.execute('''
+                INSERT INTO member_payments (member_id, transaction_id, payment_date, due_date, status)
+                VALUES (?, ?, date('now'), ?, 'paid')
+            ''', (member_id, transaction_id, new_end_date))
+            payment_id = cursor.lastrowid
+        self.notify_change('transactions', transaction_id, 'insert')
+        self.notify_change('member_payments', payment_id, 'insert')
+        self.notify_change('members', member_id)
+        return self.get_member(member_id)
     def renew_member_start_date(self, member_id):
         """Renew a member's start_date by adding 30 days to the later of today or current start_date."""
         with self.get_connection() as conn:
@@ -167,6 +531,7 @@ class Database:
             else:
                 cursor.execute("UPDATE members SET start_date = date('now', '+30 days') WHERE id = ?", (member_id,))
             conn.commit()
+        self.notify_change('members', member_id)
     def add_transaction(self, transaction_type, amount, description, created_by):
         """Add a new transaction and return its ID."""
         with self.get_connection() as conn:
@@ -176,7 +541,8 @@ class Database:
                 VALUES (?, ?, ?, ?)
             ''', (transaction_type, amount, description, created_by))
             conn.commit()
-            return cursor.lastrowid
+        self.notify_change('transactions', cursor.lastrowid, 'insert')
+        return cursor.lastrowid
 
     def add_member_payment(self, member_id, transaction_id, payment_date, due_date, status='paid'):
         """Add a new member payment record."""
@@ -187,7 +553,67 @@ class Database:
                 VALUES (?, ?, ?, ?, ?)
             ''', (member_id, transaction_id, payment_date, due_date, status))
             conn.commit()
-            return cursor.lastrowid
+        self.notify_change('member_payments', cursor.lastrowid, 'insert')
+        return cursor.lastrowid
+
+    def add_payment(self, member_id, amount, description, payment_date, days=30, created_by=1):
+        """Record a membership payment made on payment_date ('YYYY-MM-DD'), due days later.
+
+        The transaction and the member payment are written in one transaction.
+        Returns (transaction_id, payment_id), or None if there is no such member.
+        """
+        from datetime import datetime, timedelta
+        due_date = (datetime.strptime(payment_date, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM members WHERE id = ?", (member_id,))
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('''
+                INSERT INTO transactions (transaction_type, amount, description, created_by, payment_date)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ('membership', amount, description, created_by, payment_date))
+            transaction_id = cursor.lastrowid
+            cursor.execute('''
+                INSERT INTO member_payments (member_id, transaction_id, payment_date, due_date, status)
+                VALUES (?, ?, ?, ?, 'paid')
+            ''', (member_id, transaction_id, payment_date, due_date))
+            payment_id = cursor.lastrowid
+        self.notify_change('transactions', transaction_id, 'insert')
+        self.notify_change('member_payments', payment_id, 'insert')
+        return transaction_id, payment_id
+
+    def get_payment(self, payment_id):
+        """Return one member payment with the finance screen's columns, or None."""
+        with self.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            return conn.execute(f"SELECT {self.PAYMENT_COLUMNS} FROM {self.PAYMENT_TABLES} WHERE mp.id = ?",
+                                (payment_id,)).fetchone()
+
+    def update_payment(self, payment_id, amount, description, status):
+        """Change a payment's amount, description and status; returns the updated row."""
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE transactions SET amount = ?, description = ?
+                WHERE id = (SELECT transaction_id FROM member_payments WHERE id = ?)
+            ''', (amount, description, payment_id))
+            conn.execute("UPDATE member_payments SET status = ? WHERE id = ?", (status, payment_id))
+        payment = self.get_payment(payment_id)
+        if payment is not None:
+            self.notify_change('transactions', payment['transaction_id'])
+        self.notify_change('member_payments', payment_id)
+        return payment
+
+    def delete_payment(self, payment_id):
+        """Delete a member payment and its transaction."""
+        with self.transaction() as conn:
+            row = conn.execute("SELECT transaction_id FROM member_payments WHERE id = ?", (payment_id,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM transactions WHERE id = ?", (row[0],))
+            conn.execute("DELETE FROM member_payments WHERE id = ?", (payment_id,))
+        if row is not None:
+            self.notify_change('transactions', row[0], 'delete')
+        self.notify_change('member_payments', payment_id, 'delete')
 
     def get_member_payments(self, member_id):
         """Return all payment records for a member, ordered by payment_date descending."""
@@ -207,7 +633,7 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT mp.*, t.amount, t.description, t.transaction_type, m.full_name, m.id as member_id
+                SELECT mp.*, t.amount, t.description, t.transaction_type, m.name || ' ' || m.family AS full_name, m.id as member_id
                 FROM member_payments mp
                 JOIN transactions t ON mp.transaction_id = t.id
                 JOIN members m ON mp.member_id = m.id
@@ -229,173 +655,349 @@ class Database:
                 LIMIT 1
             ''', (member_id,))
             return cursor.fetchone()
+    def get_income_summary(self, month=None, transaction_type='membership'):
+        """Return {'total': ..., 'monthly': ...} income from the revenue rollup.
+
+        month is a Gregorian 'YYYY-MM' and defaults to the current local month.
+        """
+        if month is None:
+            month = datetime.now().strftime("%Y-%m")
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    (SELECT total FROM revenue_rollup WHERE kind = 'all' AND period = '' AND transaction_type = ?),
+                    (SELECT total FROM revenue_rollup WHERE kind = 'month' AND period = ? AND transaction_type = ?)
+            ''', (transaction_type, month, transaction_type))
+            total, monthly = cursor.fetchone()
+            return {'total': total or 0, 'monthly': monthly or 0}
+
+    def get_revenue_by_period(self, kind, period_from=None, period_to=None, transaction_type='membership'):
+        """Return (period, total, count) rollup rows of one kind, oldest first.
+
+        kind is 'day' ('YYYY-MM-DD'), 'month' ('YYYY-MM') or 'jmonth' (Jalali
+        'YYYY-MM'); the optional bounds are inclusive periods of that kind.
+        """
+        query = "SELECT period, total, count FROM revenue_rollup WHERE kind = ? AND transaction_type = ?"
+        params = [kind, transaction_type]
+        if period_from:
+            query += " AND period >= ?"
+            params.append(period_from)
+        if period_to:
+            query += " AND period <= ?"
+            params.append(period_to)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " ORDER BY period", params)
+            return cursor.fetchall()
+
+    def get_payments_by_jalali_month(self, year, status=None):
+        """Return (jmonth, total, count) of member payments per Jalali month of a Jalali year.
+
+        The year is turned into a Gregorian date range first, so only that
+        year's payments are read (through the payment_date index) before
+        SQLite groups them with jalali_month().
+        """
+        start, end = jalali_year_bounds(year)
+        query = '''
+            SELECT jalali_month(mp.payment_date) AS jmonth, SUM(t.amount), COUNT(*)
+            FROM member_payments mp
+            JOIN transactions t ON t.id = mp.transaction_id
+            WHERE mp.payment_date >= ? AND mp.payment_date < ?
+        '''
+        params = [start, end]
+        if status:
+            query += " AND mp.status = ?"
+            params.append(status)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " GROUP BY jmonth ORDER BY jmonth", params)
+            return cursor.fetchall()
+
+    def rebuild_revenue_rollup(self):
+        """Recompute the revenue rollup from transactions. Returns the number of rollup rows."""
+        with self.transaction() as conn:
+            return rebuild_revenue_rollup(conn.cursor())
+
     def get_total_members(self):
         """Return the total number of members."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM members")
+            cursor.execute("SELECT value FROM dashboard_counters WHERE key = 'total'")
             result = cursor.fetchone()
             return result[0] if result else 0
 
+    def _dashboard_window_bounds(self):
+        """(as_of, recent_from, expiring_from, expiring_to) for the UTC today."""
+        # Expiring = started 25-29 days ago (under 5 days left); recent = last 7 days
+        return (_days_from_today(0), _days_from_today(-6),
+                _days_from_today(-29), _days_from_today(-25))
+
+    def _roll_dashboard_window(self):
+        """Move the dashboard date windows to today and recount them.
+
+        Runs on the first dashboard read of a day; both counts are start_date
+        index range scans, so this stays cheap however large members grows.
+        """
+        as_of, recent_from, expiring_from, expiring_to = self._dashboard_window_bounds()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT as_of FROM dashboard_window WHERE id = 1")
+            row = cursor.fetchone()
+            if row and row[0] == as_of:
+                return  # Another connection rolled it while we waited for the lock
+            cursor.execute('''
+                INSERT OR REPLACE INTO dashboard_window (id, as_of, recent_from, expiring_from, expiring_to)
+                VALUES (1, ?, ?, ?, ?)
+            ''', (as_of, recent_from, expiring_from, expiring_to))
+            cursor.execute('''
+                UPDATE dashboard_counters
+                SET value = (SELECT COUNT(*) FROM members WHERE start_date BETWEEN ? AND ?)
+                WHERE key = 'expiring'
+            ''', (expiring_from, expiring_to))
+            cursor.execute('''
+                UPDATE dashboard_counters
+                SET value = (SELECT COUNT(*) FROM members WHERE start_date >= ?)
+                WHERE key = 'recent'
+            ''', (recent_from,))
+
     def get_dashboard_stats(self, current_shift):
-        """Return dashboard statistics: total_active, shift_count, expiring, recent."""
+        """Return dashboard statistics: total_active, shift_count, expiring, recent.
+
+        Reads the trigger-maintained counters as one row; the date windows are
+        rolled forward first when the day has changed.
+        """
+        query = '''
+            SELECT w.as_of,
+                   (SELECT value FROM dashboard_counters WHERE key = 'total'),
+                   (SELECT value FROM dashboard_counters WHERE key = 'gender:' || ?),
+                   (SELECT value FROM dashboard_counters WHERE key = 'expiring'),
+                   (SELECT value FROM dashboard_counters WHERE key = 'recent')
+            FROM dashboard_window w
+            WHERE w.id = 1
+        '''
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            # Total members
-            cursor.execute("SELECT COUNT(*) FROM members")
-            total_active = cursor.fetchone()
-            total_active = total_active[0] if total_active else 0
-            # Current shift members
-            cursor.execute("SELECT COUNT(*) FROM members WHERE gender=?", (current_shift,))
-            shift_count = cursor.fetchone()
-            shift_count = shift_count[0] if shift_count else 0
-            # Expiring memberships (less than 5 days left)
-            cursor.execute("SELECT COUNT(*) FROM members WHERE julianday('now') - julianday(start_date) >= 25 AND julianday('now') - julianday(start_date) < 30")
-            expiring = cursor.fetchone()
-            expiring = expiring[0] if expiring else 0
-            # Recently joined (last 7 days)
-            cursor.execute("SELECT COUNT(*) FROM members WHERE julianday('now') - julianday(start_date) <= 7")
-            recent = cursor.fetchone()
-            recent = recent[0] if recent else 0
+            cursor.execute(query, (current_shift,))
+            row = cursor.fetchone()
+            if not row or row[0] != _days_from_today(0):
+                self._roll_dashboard_window()
+                cursor.execute(query, (current_shift,))
+                row = cursor.fetchone()
             return {
-                'total_active': total_active,
-                'shift_count': shift_count,
-                'expiring': expiring,
-                'recent': recent
+                'total_active': row[1] or 0,
+                'shift_count': row[2] or 0,
+                'expiring': row[3] or 0,
+                'recent': row[4] or 0
             }
-    def __init__(self, db_path=None):
+
+    def verify_dashboard_counters(self, fix=False):
+        """Recount the dashboard counters from members and report drift.
+
+        Returns {key: (stored, actual)} for every counter that disagrees with
+        a full recount against the stored window bounds. With fix=True the
+        recounted values are written back in the same transaction.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT recent_from, expiring_from, expiring_to FROM dashboard_window WHERE id = 1")
+            recent_from, expiring_from, expiring_to = cursor.fetchone() or (None, None, None)
+            actual = {}
+            cursor.execute("SELECT COUNT(*) FROM members")
+            actual['total'] = cursor.fetchone()[0]
+            cursor.execute("SELECT gender, COUNT(*) FROM members WHERE gender IS NOT NULL GROUP BY gender")
+            for gender, count in cursor.fetchall():
+                actual[f'gender:{gender}'] = count
+            cursor.execute("SELECT COUNT(*) FROM members WHERE start_date BETWEEN ? AND ?",
+                           (expiring_from, expiring_to))
+            actual['expiring'] = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM members WHERE start_date >= ?", (recent_from,))
+            actual['recent'] = cursor.fetchone()[0]
+
+            cursor.execute("SELECT key, value FROM dashboard_counters")
+            stored = dict(cursor.fetchall())
+            drift = {}
+            for key in set(stored) | set(actual):
+                # A gender counter that dropped to zero matches a missing one
+                if stored.get(key, 0) != actual.get(key, 0):
+                    drift[key] = (stored.get(key), actual.get(key, 0))
+            if fix and drift:
+                cursor.executemany('''
+                    INSERT INTO dashboard_counters (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                ''', [(key, counts[1]) for key, counts in drift.items()])
+            return drift
+    def __init__(self, db_path=None, cache_size_kb=None, mmap_size=None, busy_timeout_ms=None):
         if db_path is None:
             # Use a per-user writable location; copy seed DB on first run
             db_path = _resolve_default_db_path()
         self.db_path = db_path
-        self.init_database()
-        self._migrate_database()  # Add migration step
+        self.cache_size_kb = self.DEFAULT_CACHE_SIZE_KB if cache_size_kb is None else cache_size_kb
+        self.mmap_size = self.DEFAULT_MMAP_SIZE if mmap_size is None else mmap_size
+        self.busy_timeout_ms = self.DEFAULT_BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        self._subscribers = []
+        self._migrate_database()
+
+    def subscribe(self, callback):
+        """Call callback(table, key, operation) after each committed write reported through notify_change.
+
+        Callbacks run on the writing thread, so they must be thread-safe;
+        change_bus.ChangeBus hands them to the GUI thread for widgets.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def notify_change(self, table, key=None, operation='update'):
+        """Report a committed write to the row of table identified by key.
+
+        operation is 'insert', 'update' or 'delete'; key None means rows of
+        the table changed that cannot be named one by one. The Database methods
+        call this themselves; code that writes with raw SQL calls it after
+        committing so in-memory copies and open views stay current.
+        """
+        for callback in list(self._subscribers):
+            try:
+                callback(table, key, operation)
+            except Exception as e:
+                # The write is committed; a stale copy must not turn it into an error
+                print(f"Change subscriber failed for {table} {key!r}: {e}")
+
+    def data_version(self):
+        """PRAGMA data_version of this thread's connection; it changes when another connection commits."""
+        return self.get_connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def change_log_position(self):
+        """The newest change_log sequence number (0 when the log is empty)."""
+        # No 'with': a caller's open transaction on this connection must not be committed
+        return self.get_connection().execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    def read_change_log(self, after_seq):
+        """(seq, table, key, operation) of every change_log row after after_seq, oldest first."""
+        with self.get_connection() as conn:
+            return conn.execute('''
+                SELECT seq, table_name, row_key, operation FROM change_log
+                WHERE seq > ? ORDER BY seq
+            ''', (after_seq,)).fetchall()
+
+    def prune_change_log(self, keep=CHANGE_LOG_KEEP):
+        """Drop all but the newest keep rows of change_log."""
+        with self.transaction() as conn:
+            conn.execute('''
+                DELETE FROM change_log
+                WHERE seq <= (SELECT COALESCE(MAX(seq), 0) FROM change_log) - ?
+            ''', (keep,))
 
     def get_connection(self):
-        """Create and return a database connection."""
-        return sqlite3.connect(self.db_path)
-        
+        """Return this thread's long-lived connection, opening it on first use.
+
+        Connections are not shared between threads (sqlite3 forbids it), so
+        each thread gets its own handle configured for WAL. The row factory is
+        reset on every call so callers see the same defaults as a fresh
+        connection.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+        conn.row_factory = None
+        return conn
+
+    def _open_connection(self):
+        """Open and tune a new pooled connection."""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, factory=_PooledConnection)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        cursor.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+        # jalali_date(), jalali_month() and jalali_year() for reports
+        register_sql_functions(conn)
+        with self._connections_lock:
+            self._connections.add(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block in a single write transaction on this thread's connection.
+
+        Commits when the block finishes and rolls back if it raises. Nested
+        uses become savepoints of the outer transaction.
+        """
+        conn = self.get_connection()
+        if conn.in_transaction:
+            depth = getattr(self._local, 'savepoint_depth', 0) + 1
+            self._local.savepoint_depth = depth
+            name = f"sp_{depth}"
+            conn.execute(f"SAVEPOINT {name}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {name}")
+                conn.execute(f"RELEASE {name}")
+                raise
+            else:
+                conn.execute(f"RELEASE {name}")
+            finally:
+                self._local.savepoint_depth = depth - 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def close_all(self):
+        """Close every pooled connection; threads reconnect lazily on next use."""
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            try:
+                conn._close()
+            except sqlite3.ProgrammingError:
+                # Owned by another thread; it is dropped when that thread exits
+                pass
+        self._local = threading.local()
+
+    def replace_file(self, source_path):
+        """Put the database file at source_path in place of this database while the app runs.
+
+        Every pooled connection is closed first; those of other threads close
+        when close_all drops their thread-local storage. The file is then
+        renamed over the database, so it is swapped in one step, and each
+        thread reconnects to the new file on its next call. Callers must
+        stop other database work for the duration. Raises RuntimeError,
+        leaving the database as it was, if a connection is still open.
+        """
+        with self._connections_lock:
+            held = [weakref.ref(conn) for conn in self._connections]
+        self.close_all()
+        gc.collect()
+        # References may outlive a connection (the caller's own, closed above); open handles may not
+        if any(conn is not None and not conn.closed for conn in (ref() for ref in held)):
+            raise RuntimeError("The database is still in use by another connection")
+        # A log left by the old file must not be replayed into the new one
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+        os.replace(source_path, self.db_path)
+        self._migrate_database()
+
     def _migrate_database(self):
-        """Handle database migrations."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            # Check columns in members table
-            cursor.execute("PRAGMA table_info(members)")
-            columns = [column[1] for column in cursor.fetchall()]
-            # Add created_at column if missing
-            if 'created_at' not in columns:
-                try:
-                    cursor.execute("ALTER TABLE members ADD COLUMN created_at TIMESTAMP")
-                    # Set created_at to now for existing rows
-                    cursor.execute("UPDATE members SET created_at = date('now') WHERE created_at IS NULL")
-                    conn.commit()
-                    print("Added created_at column to members table")
-                except sqlite3.OperationalError as e:
-                    if 'duplicate column name' not in str(e).lower():
-                        print(f"Migration error: {e}")
-                        raise
-            # Add join_date column if missing
-            if 'join_date' not in columns:
-                try:
-                    cursor.execute('ALTER TABLE members ADD COLUMN join_date DATE')
-                    # Update join_date using created_at if available, else today
-                    cursor.execute('''
-                        UPDATE members 
-                        SET join_date = COALESCE(created_at, date('now'))
-                        WHERE join_date IS NULL
-                    ''')
-                    conn.commit()
-                    print("Added join_date column to members table")
-                except sqlite3.OperationalError as e:
-                    if 'duplicate column name' not in str(e).lower():
-                        print(f"Migration error: {e}")
-                        raise
-
-    def init_database(self):
-        """Initialize the database with required tables."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Members table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS members (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    family TEXT NOT NULL,
-                    gender TEXT NOT NULL,
-                    phone TEXT,
-                    join_date DATE,
-                    start_date DATE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    full_name TEXT NOT NULL,
-                    email TEXT UNIQUE,
-                    role TEXT NOT NULL DEFAULT 'staff',
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Settings table for system-wide configurations
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Transactions table for all financial records
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    transaction_type TEXT NOT NULL,  -- 'membership', 'income', 'expense'
-                    amount DECIMAL(10, 2) NOT NULL,
-                    description TEXT,
-                    payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    created_by INTEGER,
-                    FOREIGN KEY (created_by) REFERENCES users(id)
-                )
-            ''')
-            
-            # Member payments table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS member_payments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    member_id INTEGER NOT NULL,
-                    transaction_id INTEGER NOT NULL,
-                    payment_date TIMESTAMP NOT NULL,
-                    due_date TIMESTAMP NOT NULL,
-                    status TEXT DEFAULT 'paid',  -- 'paid', 'pending', 'overdue'
-                    FOREIGN KEY (transaction_id) REFERENCES transactions(id),
-                    FOREIGN KEY (member_id) REFERENCES members(id)
-                )
-            ''')
-            
-            # Insert default admin user if no users exist
-            cursor.execute("SELECT COUNT(*) FROM users")
-            if cursor.fetchone()[0] == 0:
-                self.create_user(
-                    username="admin",
-                    password="admin123",  # Change this in production!
-                    full_name="System Administrator",
-                    email="admin@gym.com",
-                    role="admin"
-                )
-            
-            # Set default monthly fee if not set
-            cursor.execute("SELECT value FROM settings WHERE key = 'monthly_fee'")
-            if not cursor.fetchone():
-                cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", 
-                             ('monthly_fee', '500000'))  # Default 500,000 Tomans
+        """Bring the schema up to date; a single pragma read when already current."""
+        migrate(self.get_connection())
 
     def create_user(self, username, password, full_name, email, role="staff"):
         """Create a new user with hashed password."""
@@ -1,65 +1,272 @@
+"""Gregorian <-> Jalali conversion for the UI, the database layer and exports.
+
+Conversions go through a table of every day in a range of Jalali years,
+indexed by Gregorian day ordinal, so converting a date is one array lookup
+instead of a strptime call and a jdatetime object. The table is built from
+jdatetime's own year starts on first use. Dates outside the range, and
+strings in a layout other than the canonical one, take the original
+jdatetime path, so the results are the same either way (check with
+python -m Dir.check_jalali_table).
+
+register_sql_functions adds the same conversions to an SQLite connection,
+so Jalali grouping and filtering run inside a query:
+
+    SELECT jalali_month(payment_date), SUM(amount) FROM transactions
+    WHERE payment_date >= ? AND payment_date < ? GROUP BY 1
+"""
+from array import array
+from datetime import date, datetime
+from functools import lru_cache, wraps
+
 import jdatetime
-from datetime import datetime
 
+# Jalali years covered by the table by default: 1921-03-21 to 2122-03-20
+DEFAULT_FIRST_YEAR = 1300
+DEFAULT_LAST_YEAR = 1500
+# Formatted strings kept per conversion function
+CACHE_SIZE = 4096
+
+MONTH_NAMES = ("فروردین", "اردیبهشت", "خرداد", "تیر", "مرداد", "شهریور",
+               "مهر", "آبان", "آذر", "دی", "بهمن", "اسفند")
+UNKNOWN_DATE = "تاریخ نامشخص"
+
+
+def _month_length(month, leap):
+    if month <= 6:
+        return 31
+    if month <= 11:
+        return 30
+    return 30 if leap else 29
+
+
+class JalaliTable:
+    """The Jalali date of every day from first_year to last_year (Jalali years)."""
+
+    def __init__(self, first_year=DEFAULT_FIRST_YEAR, last_year=DEFAULT_LAST_YEAR):
+        self.first_year = first_year
+        self.last_year = last_year
+        # Ordinal of 1 Farvardin of each year, and of the year after the last
+        self.year_starts = array('l', (jdatetime.date(year, 1, 1).togregorian().toordinal()
+                                       for year in range(first_year, last_year + 2)))
+        self.first_ordinal = self.year_starts[0]
+        self.end_ordinal = self.year_starts[-1]
+        # year * 10000 + month * 100 + day, one entry per day from first_ordinal
+        self.days = array('l')
+        for i, year in enumerate(range(first_year, last_year + 1)):
+            leap = self.year_starts[i + 1] - self.year_starts[i] == 366
+            for month in range(1, 13):
+                base = year * 10000 + month * 100
+                self.days.extend(range(base + 1, base + _month_length(month, leap) + 1))
+            if len(self.days) != self.year_starts[i + 1] - self.first_ordinal:
+                raise ValueError(f"Jalali year {year} does not match jdatetime's calendar")
+
+    def to_jalali(self, ordinal):
+        """(year, month, day) for a Gregorian day ordinal, or None outside the table."""
+        if not self.first_ordinal <= ordinal < self.end_ordinal:
+            return None
+        year, month_day = divmod(self.days[ordinal - self.first_ordinal], 10000)
+        return (year,) + divmod(month_day, 100)
+
+    def to_ordinal(self, year, month, day):
+        """Gregorian day ordinal of a Jalali date, or None if its year is outside the table.
+
+        Raises ValueError for a month or day that does not exist.
+        """
+        if not self.first_year <= year <= self.last_year:
+            return None
+        start = self.year_starts[year - self.first_year]
+        leap = self.year_starts[year - self.first_year + 1] - start == 366
+        if not (1 <= month <= 12 and 1 <= day <= _month_length(month, leap)):
+            raise ValueError(f"invalid Jalali date {year}/{month}/{day}")
+        return start + (month - 1) * 31 - max(month - 7, 0) + day - 1
+
+
+_table = None
+
+
+def jalali_table():
+    """The shared table, built on first use."""
+    global _table
+    if _table is None:
+        _table = JalaliTable()
+    return _table
+
+
+def configure(first_year=DEFAULT_FIRST_YEAR, last_year=DEFAULT_LAST_YEAR):
+    """Cover a different range of Jalali years; dates outside it still convert, more slowly."""
+    global _table
+    _table = JalaliTable(first_year, last_year)
+    for func in (gregorian_to_jalali, jalali_to_gregorian, format_jalali_date, _day_parts):
+        func.cache_clear()
+
+
+def _cached_for_strings(func):
+    """Memoise func for str arguments, which repeat across cards and rows; other values pass through."""
+    cached = lru_cache(maxsize=CACHE_SIZE)(func)
+
+    @wraps(func)
+    def wrapper(value):
+        if isinstance(value, str):
+            return cached(value)
+        return func(value)
+    wrapper.cache_clear = cached.cache_clear
+    wrapper.cache_info = cached.cache_info
+    return wrapper
+
+
+def _gregorian_ordinal(value):
+    """Day ordinal of a 'YYYY-MM-DD' string or a datetime."""
+    if not isinstance(value, str):
+        return value.date().toordinal()
+    if (len(value) == 10 and value[4] == '-' and value[7] == '-' and value.isascii()
+            and value[:4].isdigit() and value[5:7].isdigit() and value[8:].isdigit()):
+        return date(int(value[:4]), int(value[5:7]), int(value[8:])).toordinal()
+    return datetime.strptime(value, "%Y-%m-%d").toordinal()
+
+
+def _jalali_date(ordinal):
+    """(year, month, day) of a Gregorian day ordinal."""
+    found = jalali_table().to_jalali(ordinal)
+    if found is None:
+        jalali = jdatetime.date.fromgregorian(date=date.fromordinal(ordinal))
+        return jalali.year, jalali.month, jalali.day
+    return found
+
+
+def _jalali_ordinal(value):
+    """Gregorian day ordinal of a 'YYYY/MM/DD' Jalali string (month and day may be one digit)."""
+    parts = value.split('/')
+    if (len(parts) == 3 and value.isascii() and len(parts[0]) == 4
+            and 1 <= len(parts[1]) <= 2 and 1 <= len(parts[2]) <= 2
+            and all(part.isdigit() for part in parts)):
+        ordinal = jalali_table().to_ordinal(int(parts[0]), int(parts[1]), int(parts[2]))
+        if ordinal is not None:
+            return ordinal
+    return jdatetime.datetime.strptime(value, "%Y/%m/%d").togregorian().toordinal()
+
+
+@_cached_for_strings
 def gregorian_to_jalali(date_str):
     """Convert a Gregorian date string to Jalali date string."""
     if not date_str:
         return None
     try:
-        # Parse the Gregorian date string
-        if isinstance(date_str, str):
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        else:
-            date_obj = date_str
-        # Convert to Jalali
-        jalali_date = jdatetime.date.fromgregorian(date=date_obj.date())
-        return jalali_date.strftime("%Y/%m/%d")
+        year, month, day = _jalali_date(_gregorian_ordinal(date_str))
+        return f"{year}/{month:02d}/{day:02d}"
     except Exception:
         return None
 
+
+@_cached_for_strings
 def jalali_to_gregorian(jalali_date_str):
     """Convert a Jalali date string to Gregorian date string."""
     if not jalali_date_str:
         return None
     try:
-        # Parse the Jalali date string
-        jalali_date = jdatetime.datetime.strptime(jalali_date_str, "%Y/%m/%d").togregorian()
-        return jalali_date.strftime("%Y-%m-%d")
+        return date.fromordinal(_jalali_ordinal(jalali_date_str)).strftime("%Y-%m-%d")
     except Exception:
         return None
 
+
 def get_current_jalali_date():
     """Get current date in Jalali format."""
-    return jdatetime.datetime.now().strftime("%Y/%m/%d")
+    year, month, day = _jalali_date(date.today().toordinal())
+    return f"{year}/{month:02d}/{day:02d}"
+
 
+@_cached_for_strings
 def format_jalali_date(date_str):
     """Format a date string for display in Persian."""
     if not date_str:
-        return "تاریخ نامشخص"
+        return UNKNOWN_DATE
+    try:
+        year, month, day = _jalali_date(_gregorian_ordinal(date_str))
+        return f"{day} {MONTH_NAMES[month - 1]} {year}"
+    except Exception:
+        return UNKNOWN_DATE
+
+
+def _convert_column(func, values):
+    # Each distinct value is converted once
+    converted = {}
+    result = []
+    for value in values:
+        if value not in converted:
+            converted[value] = func(value)
+        result.append(converted[value])
+    return result
+
+
+def gregorian_to_jalali_many(values):
+    """gregorian_to_jalali of each date in a column (any iterable), as a list."""
+    return _convert_column(gregorian_to_jalali, values)
+
+
+def jalali_to_gregorian_many(values):
+    """jalali_to_gregorian of each date in a column, as a list."""
+    return _convert_column(jalali_to_gregorian, values)
+
+
+def format_jalali_dates(values):
+    """format_jalali_date of each date in a column, as a list."""
+    return _convert_column(format_jalali_date, values)
+
+
+def jalali_year_bounds(year):
+    """First Gregorian day of a Jalali year and of the year after, as 'YYYY-MM-DD'."""
+    start = jalali_to_gregorian(f"{year:04d}/01/01")
+    end = jalali_to_gregorian(f"{year + 1:04d}/01/01")
+    if start is None or end is None:
+        raise ValueError(f"Jalali year {year} is out of range")
+    return start, end
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _day_parts(day):
     try:
-        if isinstance(date_str, str):
-            # Try to parse as Gregorian first
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            jalali_date = jdatetime.date.fromgregorian(date=date_obj.date())
-        else:
-            # If it's already a datetime object
-            jalali_date = jdatetime.date.fromgregorian(date=date_str.date())
-        
-        # Format with Persian month names
-        months = {
-            1: "فروردین",
-            2: "اردیبهشت",
-            3: "خرداد",
-            4: "تیر",
-            5: "مرداد",
-            6: "شهریور",
-            7: "مهر",
-            8: "آبان",
-            9: "آذر",
-            10: "دی",
-            11: "بهمن",
-            12: "اسفند"
-        }
-        return f"{jalali_date.day} {months[jalali_date.month]} {jalali_date.year}"
+        return _jalali_date(_gregorian_ordinal(day))
     except Exception:
-        return "تاریخ نامشخص"
+        return None
+
+
+def _sql_parts(value):
+    # Dates and timestamps ('YYYY-MM-DD HH:MM:SS') alike; anything else is NULL
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    return _day_parts(value[:10])
+
+
+def sql_jalali_date(value):
+    """jalali_date(d): 'YYYY/MM/DD', as gregorian_to_jalali gives."""
+    parts = _sql_parts(value)
+    return None if parts is None else f"{parts[0]}/{parts[1]:02d}/{parts[2]:02d}"
+
+
+def sql_jalali_month(value):
+    """jalali_month(d): 'YYYY-MM', the period format of jalali_months and the jmonth rollup."""
+    parts = _sql_parts(value)
+    return None if parts is None else f"{parts[0]:04d}-{parts[1]:02d}"
+
+
+def sql_jalali_year(value):
+    """jalali_year(d): the Jalali year as an integer."""
+    parts = _sql_parts(value)
+    return None if parts is None else parts[0]
+
+
+SQL_FUNCTIONS = {
+    'jalali_date': sql_jalali_date,
+    'jalali_month': sql_jalali_month,
+    'jalali_year': sql_jalali_year,
+}
+
+
+def register_sql_functions(conn):
+    """Add jalali_date(), jalali_month() and jalali_year() to an sqlite3 connection.
+
+    They are registered as deterministic, so SQLite may also use them in
+    expression indexes and generated columns. A schema that does so can
+    then only be written by connections that have registered them.
+    """
+    for name, func in SQL_FUNCTIONS.items():
+        conn.create_function(name, 1, func, deterministic=True)
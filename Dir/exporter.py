@@ -0,0 +1,239 @@
+"""Streaming export of payments to CSV, JSON and JSON Lines.
+
+Rows are read from the cursor in fetchmany chunks and written as they
+arrive, so memory stays the same whatever the date range. The file is
+written under a temporary name and renamed when complete, so a cancelled
+or failed export leaves nothing behind. The format follows the file name:
+
+    payments.csv     CSV (UTF-8 with BOM, as Excel expects)
+    payments.json    one JSON array of objects
+    payments.jsonl   one JSON object per line
+    *.gz             any of the above, gzip-compressed
+
+ExportJob runs an export on a Qt thread pool thread and reports progress:
+
+    job = ExportJob(path, date_from, date_to)
+    job.progress.connect(bar.setValue)
+    job.start()
+"""
+import csv
+import gzip
+import json
+import os
+import threading
+
+from PyQt5 import QtCore
+
+from .database import db
+
+CHUNK_SIZE = 500
+FORMATS = ('csv', 'json', 'jsonl')
+
+PAYMENT_HEADERS = ['نام عضو', 'کد عضویت', 'مبلغ', 'توضیحات', 'وضعیت', 'تاریخ پرداخت', 'تاریخ سررسید']
+PAYMENT_QUERY = '''
+    SELECT
+        m.name || ' ' || m.family as member_name,
+        m.id as member_id,
+        t.amount,
+        t.description,
+        mp.status,
+        mp.payment_date,
+        mp.due_date
+    FROM member_payments mp
+    JOIN transactions t ON mp.transaction_id = t.id
+    JOIN members m ON mp.member_id = m.id
+    WHERE mp.payment_date BETWEEN ? AND ?
+    ORDER BY mp.payment_date DESC
+'''
+PAYMENT_COUNT_QUERY = "SELECT COUNT(*) FROM member_payments WHERE payment_date BETWEEN ? AND ?"
+
+
+class ExportCancelled(Exception):
+    """Raised inside an export when its cancel check turns true."""
+
+
+def export_format(path):
+    """(format, compressed) for a file name such as 'x.csv' or 'x.jsonl.gz'."""
+    name = path.lower()
+    compressed = name.endswith('.gz')
+    if compressed:
+        name = name[:-3]
+    ext = os.path.splitext(name)[1].lstrip('.')
+    if ext not in FORMATS:
+        raise ValueError(f"Unknown export format: {path}")
+    return ext, compressed
+
+
+def with_filter_suffix(path, name_filter):
+    """path, with the extension of a file dialog filter such as 'CSV (*.csv.gz)' added if it has none."""
+    try:
+        export_format(path)
+        return path
+    except ValueError:
+        pass
+    start = name_filter.find('(*')
+    if start == -1:
+        return path
+    return path + name_filter[start + 2:name_filter.index(')', start)]
+
+
+def iter_chunks(cursor, chunk_size=CHUNK_SIZE):
+    """Yield the cursor's remaining rows a chunk (list) at a time."""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _open(path, compressed, encoding):
+    if compressed:
+        return gzip.open(path, 'wt', encoding=encoding, newline='')
+    return open(path, 'w', encoding=encoding, newline='')
+
+
+class _CsvWriter:
+    encoding = 'utf-8-sig'
+
+    def __init__(self, f, headers):
+        self.writer = csv.writer(f)
+        self.writer.writerow(headers)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class _JsonLinesWriter:
+    encoding = 'utf-8'
+
+    def __init__(self, f, headers):
+        self.f = f
+        self.headers = headers
+
+    def write(self, rows):
+        self.f.writelines(json.dumps(dict(zip(self.headers, row)), ensure_ascii=False) + '\n' for row in rows)
+
+    def close(self):
+        pass
+
+
+class _JsonArrayWriter(_JsonLinesWriter):
+    """A JSON array written an element at a time."""
+
+    def __init__(self, f, headers):
+        super().__init__(f, headers)
+        self.f.write('[')
+        self.separator = '\n  '
+
+    def write(self, rows):
+        for row in rows:
+            self.f.write(self.separator + json.dumps(dict(zip(self.headers, row)), ensure_ascii=False))
+            self.separator = ',\n  '
+
+    def close(self):
+        self.f.write('\n]\n')
+
+
+WRITERS = {'csv': _CsvWriter, 'json': _JsonArrayWriter, 'jsonl': _JsonLinesWriter}
+
+
+def export_rows(path, headers, cursor, total=None, progress=None, is_cancelled=None):
+    """Write the rows left in cursor to path; returns the number of rows written.
+
+    progress(done, total) is called after each chunk; is_cancelled() is
+    checked before each one and stops the export with ExportCancelled.
+    """
+    fmt, compressed = export_format(path)
+    writer_class = WRITERS[fmt]
+    partial = path + '.part'
+    done = 0
+    try:
+        with _open(partial, compressed, writer_class.encoding) as f:
+            writer = writer_class(f, headers)
+            for rows in iter_chunks(cursor):
+                if is_cancelled is not None and is_cancelled():
+                    raise ExportCancelled()
+                writer.write(rows)
+                done += len(rows)
+                if progress is not None:
+                    progress(done, total)
+            writer.close()
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return done
+
+
+def export_payments(path, date_from, date_to, progress=None, is_cancelled=None, database=None):
+    """Export the member payments between two 'YYYY-MM-DD' dates to path."""
+    database = database or db
+    # Timestamps on the last day sort after the bare date
+    params = (date_from, date_to + ' 23:59:59')
+    conn = database.get_connection()
+    try:
+        total = conn.execute(PAYMENT_COUNT_QUERY, params).fetchone()[0]
+        if progress is not None:
+            progress(0, total)
+        cursor = conn.execute(PAYMENT_QUERY, params)
+        try:
+            return export_rows(path, PAYMENT_HEADERS, cursor, total, progress, is_cancelled)
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+class _ExportTask(QtCore.QRunnable):
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        job = self.job
+        try:
+            count = job.export(job.path, *job.args, progress=job._report, is_cancelled=job.is_cancelled)
+        except ExportCancelled:
+            job.cancelled.emit()
+        except Exception as e:
+            job.failed.emit(e)
+        else:
+            job.finished.emit(job.path, count)
+
+
+class ExportJob(QtCore.QObject):
+    """One export running on a thread pool thread; signals arrive on the GUI thread.
+
+    The export gets a thread (and pooled connection) of its own rather than
+    the data service worker, so a long export does not hold up the searches
+    and list pages queued there.
+    """
+
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal(str, int)
+    failed = QtCore.pyqtSignal(object)
+    cancelled = QtCore.pyqtSignal()
+
+    def __init__(self, path, date_from, date_to, export=export_payments, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.args = (date_from, date_to)
+        self.export = export
+        self._cancel = threading.Event()
+
+    def start(self, pool=None):
+        (pool or QtCore.QThreadPool.globalInstance()).start(_ExportTask(self))
+
+    def cancel(self):
+        """Stop before the next chunk; the partial file is removed."""
+        self._cancel.set()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def _report(self, done, total):
+        self.progress.emit(done, total or 0)
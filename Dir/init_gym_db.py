@@ -46,6 +46,11 @@ if __name__ == "__main__":
     # Dummy admin
     c.execute('INSERT INTO admins (username, password) VALUES (?, ?)', ("admin", "admin123"))
 
+    # The tables above were rebuilt by hand; let the app re-run its migrations
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Dir.migrations import reset_schema_version
+    reset_schema_version(conn)
+
     conn.commit()
     conn.close()
 
@@ -0,0 +1,402 @@
+"""Qt item models over the database's paged queries, and the card views for them.
+
+The views only ask for rows they are about to show: fetchMore requests the
+next keyset page on the data service thread and the rows are appended when
+it arrives, so a list of tens of thousands of members costs one small query
+per screenful instead of one widget per row. Cards are painted by a
+delegate rather than built from widgets.
+"""
+from abc import abstractmethod
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from .database import db
+from .data_service import data_service
+from .date_utils import format_jalali_date
+from .text_utils import normalize_text
+
+
+class PagedListModel(QtCore.QAbstractListModel):
+    """List model filled page by page from fetch_page on the data service.
+
+    Subclasses implement fetch_page(cursor, page_size, **query), which runs
+    off the GUI thread and returns (rows, next_cursor), and may implement
+    display(row) to precompute what their delegate paints; it is called on
+    first use and cached per row. After a write, update_row, insert_row and
+    remove_row change the one affected row (found by its KEY column) instead
+    of reloading the list.
+    """
+
+    RowRole = QtCore.Qt.UserRole + 1
+    KEY = 'id'
+    # A change touching more rows than this reloads the query instead
+    MAX_ROW_UPDATES = 100
+
+    loadFailed = QtCore.pyqtSignal(object)
+
+    def __init__(self, channel, page_size=200, parent=None):
+        super().__init__(parent)
+        self.channel = channel
+        self.page_size = page_size
+        self._query = {}
+        self._rows = []
+        self._display = []
+        self._cursor = None
+        self._has_more = False
+        self._loading = False
+        self._positions = None  # key -> row number, rebuilt after rows move
+
+    @abstractmethod
+    def fetch_page(self, cursor, page_size, **query):
+        """Return (rows, next_cursor) for one page of the query; subclasses must implement it."""
+
+    def display(self, row):
+        return row
+
+    def accepts(self, row):
+        """Whether a changed row still belongs in the current query."""
+        return True
+
+    def set_query(self, **query):
+        """Replace the query and load it again from the first page."""
+        self._query = query
+        self.reload()
+
+    def reload(self):
+        # Any page still in flight belongs to the old query
+        data_service.cancel(self.channel)
+        self.beginResetModel()
+        self._rows, self._display = [], []
+        self._positions = None
+        self._cursor = None
+        self._has_more = True
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_rows(self, rows):
+        """Show a complete result computed elsewhere (e.g. a search) instead of paging."""
+        data_service.cancel(self.channel)
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._display = [None] * len(self._rows)
+        self._positions = None
+        self._cursor = None
+        self._has_more = False
+        self._loading = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == self.RowRole:
+            return self._rows[row]
+        if role == QtCore.Qt.DisplayRole:
+            if self._display[row] is None:
+                self._display[row] = self.display(self._rows[row])
+            return self._display[row]
+        return None
+
+    def row(self, index):
+        """The database row behind a model index (or a row number)."""
+        return self._rows[index.row() if isinstance(index, QtCore.QModelIndex) else index]
+
+    def position(self, key):
+        """Row number of the row whose KEY is key, or None if it is not loaded."""
+        if self._positions is None:
+            self._positions = {row[self.KEY]: number for number, row in enumerate(self._rows)}
+        return self._positions.get(key)
+
+    def update_row(self, key, row):
+        """Show the new version of a loaded row; drops it if it was deleted (row is None) or
+        no longer matches the query. Returns True if the row was in the model."""
+        number = self.position(key)
+        if number is None:
+            return False
+        if row is None or not self.accepts(row):
+            self.remove_row(key)
+            return True
+        self._rows[number] = row
+        self._display[number] = None
+        if row[self.KEY] != key:
+            self._positions = None
+        index = self.index(number)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def insert_row(self, row, number=0):
+        """Add a newly written row at number (the top by default) if it matches the query."""
+        if not self.accepts(row):
+            return False
+        number = max(0, min(number, len(self._rows)))
+        self.beginInsertRows(QtCore.QModelIndex(), number, number)
+        self._rows.insert(number, row)
+        self._display.insert(number, None)
+        self._positions = None
+        self.endInsertRows()
+        return True
+
+    def remove_row(self, key):
+        """Drop the row whose KEY is key; returns True if it was loaded."""
+        number = self.position(key)
+        if number is None:
+            return False
+        self.beginRemoveRows(QtCore.QModelIndex(), number, number)
+        del self._rows[number]
+        del self._display[number]
+        self._positions = None
+        self.endRemoveRows()
+        return True
+
+    def apply_changes(self, keys, fetch_row, insert_new=True):
+        """Bring changed rows up to date one at a time.
+
+        keys is {key: operation} as ChangeSet.keys returns it; fetch_row(key)
+        returns a row's current version, or None if it is gone. New rows are
+        added at the top when insert_new is set. Returns False when the
+        change is too broad for that and the query should be reloaded.
+        """
+        if keys is None or len(keys) > self.MAX_ROW_UPDATES:
+            return False
+        for key, operation in keys.items():
+            row = None if operation == 'delete' else fetch_row(key)
+            if not self.update_row(key, row) and operation == 'insert' and row is not None and insert_new:
+                self.insert_row(row)
+        return True
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self._has_more and not self._loading
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._loading = True
+        data_service.submit(
+            self.fetch_page, self._cursor, self.page_size, channel=self.channel, **self._query
+        ).then(self._append_page, self._load_failed)
+
+    def _append_page(self, page):
+        rows, self._cursor = page
+        self._loading = False
+        self._has_more = self._cursor is not None
+        if rows:
+            start = len(self._rows)
+            self.beginInsertRows(QtCore.QModelIndex(), start, start + len(rows) - 1)
+            if self._positions is not None:
+                self._positions.update((row[self.KEY], start + offset) for offset, row in enumerate(rows))
+            self._rows.extend(rows)
+            self._display.extend([None] * len(rows))
+            self.endInsertRows()
+
+    def _load_failed(self, error):
+        self._loading = False
+        self._has_more = False
+        self.loadFailed.emit(error)
+
+
+class MemberListModel(PagedListModel):
+    """Members ordered by membership end date, or search results best match first."""
+
+    def __init__(self, parent=None):
+        super().__init__('members', parent=parent)
+
+    def set_filter(self, filter_text=None):
+        self.set_query(filter_text=filter_text)
+
+    def fetch_page(self, cursor, page_size, filter_text=None):
+        if filter_text and normalize_text(filter_text).split():
+            # Search results are ranked, so they arrive as a single page
+            return db.search_members(filter_text, limit=None), None
+        return db.page_members(page_size=page_size, cursor=cursor)
+
+    def display(self, member):
+        """(full name, id, phone, join date, membership status) as shown on the card."""
+        remaining_days = member['remaining_days']
+        if remaining_days is not None and remaining_days >= 0:
+            status = f"{int(remaining_days)} روز باقی مانده"
+        else:
+            status = "منقضی شده"
+        join_date = member['join_date']
+        if not join_date or join_date == 'NULL':
+            join_date = QtCore.QDate.currentDate().toString("yyyy-MM-dd")
+        return (
+            f"{member['name']} {member['family']}",
+            member['id'] or '-',
+            member['phone'] or '-',
+            format_jalali_date(join_date),
+            status,
+        )
+
+
+class PaymentListModel(PagedListModel):
+    """Member payments, newest first, with the filters of the finance screen."""
+
+    STATUS_TEXT = {'paid': 'پرداخت شده', 'pending': 'در انتظار', 'overdue': 'معوقه'}
+    STATUS_COLOR = {'paid': '#009966', 'pending': '#ff9800', 'overdue': '#d32f2f'}
+
+    def __init__(self, parent=None):
+        super().__init__('payments', parent=parent)
+
+    def fetch_page(self, cursor, page_size, **filters):
+        return db.page_payments(page_size=page_size, cursor=cursor, **filters)
+
+    def payments_of(self, member_ids):
+        """Ids of the loaded payments made by any of member_ids."""
+        return [payment['id'] for payment in self._rows if payment['member_id'] in member_ids]
+
+    def accepts(self, payment):
+        status = self._query.get('status')
+        date_from, date_to = self._query.get('date_from'), self._query.get('date_to')
+        payment_date = payment['payment_date'] or ''
+        return ((not status or payment['status'] == status)
+                and (not date_from or payment_date >= date_from)
+                and (not date_to or payment_date <= date_to))
+
+    def display(self, payment):
+        """(member name, amount, payment date, (status, colour), description) as shown on the card."""
+        keys = payment.keys()
+        payment_date = next((payment[key] for key in ('payment_date', 'created_at', 'due_date')
+                             if key in keys and payment[key] not in (None, '', 'NULL')),
+                            QtCore.QDate.currentDate().toString("yyyy-MM-dd"))
+        member_name = f"{payment['member_name'] or ''} {payment['member_family'] or ''}"
+        if not member_name.strip():
+            member_name = f"عضو {payment['member_id'] or 'نامشخص'}"
+        amount = payment['amount']
+        status = payment['status'] or 'paid'
+        return (
+            member_name,
+            f"{amount:,}" if amount else "0",
+            format_jalali_date(payment_date),
+            (self.STATUS_TEXT.get(status, status), self.STATUS_COLOR.get(status, '#666')),
+            payment['description'] or '-',
+        )
+
+
+class CardDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints a rounded card of text lines above a row of buttons.
+
+    Subclasses set FONTS, one (family, point size, bold) per text line, and
+    BUTTONS, one (label, gradient stops, signal name) per button from right to
+    left, and implement lines(index) returning one (text, colour) per line.
+    A click on a button emits the named signal with the model's row.
+    """
+
+    MARGIN = 10
+    PADDING = 18
+    BUTTON_HEIGHT = 36
+    BUTTON_SPACING = 12
+    FONTS = ()
+    BUTTONS = ()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.fonts = []
+        for family, size, bold in self.FONTS:
+            font = QtGui.QFont(family, size)
+            font.setBold(bold)
+            self.fonts.append(font)
+        self.line_heights = [QtGui.QFontMetrics(font).height() for font in self.fonts]
+        self.button_font = QtGui.QFont('B Yekan', 12)
+        self.button_brushes = []
+        for _label, stops, _signal in self.BUTTONS:
+            self.button_brushes.append([(stop, QtGui.QColor(color)) for stop, color in stops])
+
+    @abstractmethod
+    def lines(self, index):
+        """Return (text, colour) for each card line of index, in FONTS order; subclasses must implement it."""
+
+    def card_height(self):
+        return (2 * (self.MARGIN + self.PADDING) + sum(self.line_heights)
+                + self.BUTTON_SPACING + self.BUTTON_HEIGHT)
+
+    def sizeHint(self, option, index):
+        # Cards fill the view's grid cell when there is one
+        grid = option.widget.gridSize() if isinstance(option.widget, QtWidgets.QListView) else QtCore.QSize()
+        return grid if grid.isValid() else QtCore.QSize(320, self.card_height())
+
+    def _card_rect(self, rect):
+        return rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+
+    def button_rects(self, rect):
+        """Button rectangles in BUTTONS order, laid out from the right as in RTL reading."""
+        inner = self._card_rect(rect).adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        count = len(self.BUTTONS)
+        width = (inner.width() - self.BUTTON_SPACING * (count - 1)) // max(count, 1)
+        top = inner.bottom() - self.BUTTON_HEIGHT + 1
+        return [QtCore.QRect(inner.right() - (i + 1) * width - i * self.BUTTON_SPACING + 1,
+                             top, width, self.BUTTON_HEIGHT)
+                for i in range(count)]
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        card = self._card_rect(option.rect)
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(QtGui.QColor(255, 255, 255, 100))
+        painter.drawRoundedRect(card, 18, 18)
+
+        inner = card.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        align = QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter
+        top = inner.top()
+        for (text, color), font, height in zip(self.lines(index), self.fonts, self.line_heights):
+            line = QtCore.QRect(inner.left(), top, inner.width(), height)
+            painter.setFont(font)
+            painter.setPen(QtGui.QColor(color))
+            painter.drawText(line, align, painter.fontMetrics().elidedText(text, QtCore.Qt.ElideLeft, line.width()))
+            top += height
+
+        painter.setFont(self.button_font)
+        for rect, (label, _stops, _signal), stops in zip(self.button_rects(option.rect), self.BUTTONS,
+                                                          self.button_brushes):
+            gradient = QtGui.QLinearGradient(QtCore.QPointF(rect.topLeft()), QtCore.QPointF(rect.topRight()))
+            for stop, color in stops:
+                gradient.setColorAt(stop, color)
+            painter.setPen(QtCore.Qt.NoPen)
+            painter.setBrush(gradient)
+            painter.drawRoundedRect(rect, 8, 8)
+            painter.setPen(QtCore.Qt.white)
+            painter.drawText(rect, QtCore.Qt.AlignCenter, label)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QtCore.QEvent.MouseButtonRelease and event.button() == QtCore.Qt.LeftButton:
+            for rect, (_label, _stops, signal) in zip(self.button_rects(option.rect), self.BUTTONS):
+                if rect.contains(event.pos()):
+                    getattr(self, signal).emit(model.row(index))
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+
+class CardListView(QtWidgets.QListView):
+    """Cards in a fixed number of columns; only the rows in view are painted."""
+
+    def __init__(self, delegate, columns=3, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.setItemDelegate(delegate)
+        self.setViewMode(QtWidgets.QListView.IconMode)
+        self.setFlow(QtWidgets.QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(24)
+        self.setStyleSheet("QListView { background: transparent; border: none; }")
+        self.verticalScrollBar().rangeChanged.connect(self._update_grid)
+        self._update_grid()
+
+    def _update_grid(self, *args):
+        # QListView's wrapping keeps a scroll bar's width free even when the bar is shown
+        extent = self.style().pixelMetric(QtWidgets.QStyle.PM_ScrollBarExtent, None, self)
+        width = max((self.viewport().width() - extent) // self.columns, 1)
+        self.setGridSize(QtCore.QSize(width, self.itemDelegate().card_height()))
+
+    def resizeEvent(self, event):
+        self._update_grid()
+        super().resizeEvent(event)
@@ -0,0 +1,263 @@
+"""Process-wide in-memory copy of the members table for fast lookups.
+
+The index is loaded once in the background (data_service.submit(member_index.load))
+and then kept current from Database.notify_change, so id lookups, the search
+box and the dashboard lists are answered without touching SQLite. Searches
+use the same matching as Database.search_members: every term is a substring
+of a normalized key, found through a trigram map for terms of three or
+more characters and through a map of one- and two-character substrings for
+shorter ones.
+"""
+import heapq
+import threading
+from collections import defaultdict
+from operator import attrgetter
+from datetime import datetime, timedelta, timezone
+
+from .database import db, _search_terms, _term_matches
+from .text_utils import normalize_phone, normalize_text
+
+# Search results after an exact id match
+_RESULT_ORDER = attrgetter('name_norm', 'family_norm', 'id_norm')
+
+
+class MemberRecord:
+    """One member, with its normalized search keys.
+
+    Supports record['column'] and keys() like the sqlite3.Row results it
+    stands in for; remaining_days is computed as the member queries do.
+    """
+
+    __slots__ = ('id', 'name', 'family', 'phone', 'gender', 'start_date', 'end_date',
+                 'join_date', 'created_at', 'id_norm', 'name_norm', 'family_norm', 'phone_norm')
+
+    COLUMNS = __slots__[:9]
+
+    def __init__(self, row):
+        for column in self.COLUMNS:
+            setattr(self, column, row[column])
+        self.id_norm = normalize_text(self.id) or ''
+        self.name_norm = normalize_text(self.name) or ''
+        self.family_norm = normalize_text(self.family) or ''
+        self.phone_norm = normalize_phone(self.phone) or ''
+
+    @property
+    def remaining_days(self):
+        """Whole days until end_date, truncated like CAST(julianday(end_date) - julianday('now') AS INT)."""
+        if not self.end_date:
+            return None
+        try:
+            end = datetime.strptime(self.end_date[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        return int((end - datetime.now(timezone.utc)).total_seconds() / 86400)
+
+    def keys(self):
+        return self.__slots__ + ('remaining_days',)
+
+    def __getitem__(self, key):
+        if key == 'join_date':
+            return self.join_date or self.created_at
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        value = self[key] if key in self.keys() else None
+        return default if value is None else value
+
+    def search_keys(self):
+        return (self.id_norm, self.name_norm, self.family_norm, self.phone_norm)
+
+
+def _grams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def _short_grams(value):
+    return set(value) | {value[i:i + 2] for i in range(len(value) - 1)}
+
+
+class MemberIndex:
+    """Members by id plus trigram and short-substring maps over the normalized keys; thread-safe."""
+
+    def __init__(self, database=None):
+        self.db = database or db
+        self._lock = threading.RLock()
+        self._records = {}
+        self._grams = defaultdict(set)
+        self._short_grams = defaultdict(set)
+        self._loading = False
+        self._changed_while_loading = set()
+        self.ready = False
+        self.db.subscribe(self._on_change)
+
+    def _select(self, where='', params=()):
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(MemberRecord.COLUMNS)} FROM members {where}", params)
+        names = [d[0] for d in cursor.description]
+        return [MemberRecord(dict(zip(names, row))) for row in cursor.fetchall()]
+
+    def load(self):
+        """Read every member and replace the index contents; safe to call again to resync."""
+        with self._lock:
+            self._loading = True
+            self._changed_while_loading.clear()
+        try:
+            records = self._select()
+            grams, short_grams = defaultdict(set), defaultdict(set)
+            for record in records:
+                self._map_keys(record, grams, short_grams)
+        except BaseException:
+            with self._lock:
+                self._loading = False
+            raise
+        with self._lock:
+            self._records = {record.id: record for record in records}
+            self._grams, self._short_grams = grams, short_grams
+            self._loading = False
+            changed = list(self._changed_while_loading)
+            self.ready = True
+        # Writes committed during the full read may or may not be in it
+        for member_id in changed:
+            self.refresh(member_id)
+        return len(records)
+
+    def reload(self):
+        """Resync with a full read, in the background when called on the GUI thread.
+
+        The current contents keep answering lookups until the read finishes
+        and replaces them.
+        """
+        if threading.current_thread() is threading.main_thread():
+            from .data_service import data_service
+            # Reloads asked for while one is queued collapse into the newest
+            data_service.submit(self.load, channel='member-index', interruptible=False)
+        else:
+            self.load()
+
+    def refresh(self, member_id):
+        """Re-read one member (or drop it if it no longer exists)."""
+        rows = self._select("WHERE id = ?", (member_id,))
+        with self._lock:
+            old = self._records.pop(member_id, None)
+            if old is not None:
+                self._unmap_keys(old)
+            if rows:
+                self._records[member_id] = rows[0]
+                self._map_keys(rows[0], self._grams, self._short_grams)
+
+    def _on_change(self, table, key, operation='update'):
+        if table != 'members':
+            return
+        if key is None:
+            # Rows that cannot be named changed; only a full read can tell which
+            if self.ready:
+                self.reload()
+            return
+        with self._lock:
+            if self._loading:
+                self._changed_while_loading.add(key)
+            if not self.ready:
+                return
+        self.refresh(key)
+
+    @staticmethod
+    def _map_keys(record, grams, short_grams):
+        for value in record.search_keys():
+            for gram in _grams(value):
+                grams[gram].add(record.id)
+            for gram in _short_grams(value):
+                short_grams[gram].add(record.id)
+
+    def _unmap_keys(self, record):
+        for value in record.search_keys():
+            for gram in _grams(value):
+                ids = self._grams.get(gram)
+                if ids is not None:
+                    ids.discard(record.id)
+                    if not ids:
+                        del self._grams[gram]
+            for gram in _short_grams(value):
+                ids = self._short_grams.get(gram)
+                if ids is not None:
+                    ids.discard(record.id)
+                    if not ids:
+                        del self._short_grams[gram]
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, member_id):
+        """The member with this id, or None."""
+        return self._records.get(member_id)
+
+    def all(self):
+        with self._lock:
+            return list(self._records.values())
+
+    def _candidates(self, term):
+        """Ids that may match term; the set is exact for terms of up to three characters."""
+        if len(term) >= 3:
+            sets = [self._grams.get(gram) for gram in _grams(term)]
+            if not all(sets):
+                return set()
+            sets.sort(key=len)
+            ids = set(sets[0])
+            for other in sets[1:]:
+                ids &= other
+                if not ids:
+                    break
+            return ids
+        return set(self._short_grams.get(term, ()))
+
+    def search(self, text, limit=None):
+        """Members matching text like Database.search_members, exact id match first."""
+        terms = _search_terms(text)
+        if not terms:
+            return []
+        with self._lock:
+            # Longer terms are the most selective, so they narrow the candidates first
+            candidates = None
+            for term in sorted(terms, key=len, reverse=True):
+                ids = self._candidates(term)
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return []
+            records = self._records
+            if all(len(term) <= 3 for term in terms):
+                # Short-substring and single-trigram candidates are exact matches already
+                matches = [records[member_id] for member_id in candidates]
+            else:
+                matches = []
+                for member_id in candidates:
+                    record = records[member_id]
+                    values = record.search_keys()
+                    if all(_term_matches(term, values) for term in terms):
+                        matches.append(record)
+        if limit is None:
+            matches.sort(key=_RESULT_ORDER)
+        else:
+            matches = heapq.nsmallest(limit, matches, key=_RESULT_ORDER)
+        # An exact id match goes first, as in search_members
+        exact_id = ' '.join(terms)
+        for position, record in enumerate(matches):
+            if record.id_norm == exact_id:
+                if position:
+                    matches.insert(0, matches.pop(position))
+                break
+        return matches
+
+    def expiring(self, days=7):
+        """Members whose end_date falls within the next days days, soonest first (as get_expiring_members)."""
+        if days <= 0:
+            return []
+        today = datetime.now(timezone.utc).date()
+        first, last = today.isoformat(), (today + timedelta(days=days)).isoformat()
+        with self._lock:
+            records = [r for r in self._records.values() if r.end_date and first <= r.end_date <= last]
+        records.sort(key=lambda record: record.end_date)
+        return records
+
+
+# Shared index used by the widgets; call member_index.load() once in the background
+member_index = MemberIndex()
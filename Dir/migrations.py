@@ -0,0 +1,584 @@
+"""Versioned schema migrations for the gym database.
+
+The schema version lives in ``PRAGMA user_version``. Each entry in
+``MIGRATIONS`` brings the database from the previous version to its own and
+is applied exactly once, inside its own write transaction, together with the
+version bump. When the database is already current, ``migrate`` costs a
+single pragma read.
+
+Steps must tolerate databases created by older releases (or by the old
+standalone scripts), which may already contain some of the tables/columns.
+"""
+from datetime import timedelta
+
+from .text_utils import sql_normalize_steps
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_column(cursor, table, column, definition):
+    """Add a column unless an older schema already has it. Returns True if added."""
+    if column in _columns(cursor, table):
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+
+def _m001_base_schema(cursor):
+    """Core tables plus the columns older databases were missing, and seed rows."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS members (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            family TEXT NOT NULL,
+            gender TEXT NOT NULL,
+            phone TEXT,
+            join_date DATE,
+            start_date DATE,
+            end_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    if _add_column(cursor, 'members', 'created_at', 'TIMESTAMP'):
+        cursor.execute("UPDATE members SET created_at = date('now') WHERE created_at IS NULL")
+    if _add_column(cursor, 'members', 'join_date', 'DATE'):
+        cursor.execute('''
+            UPDATE members
+            SET join_date = COALESCE(created_at, date('now'))
+            WHERE join_date IS NULL
+        ''')
+    _add_column(cursor, 'members', 'start_date', 'DATE')
+    _add_column(cursor, 'members', 'end_date', 'TEXT')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            email TEXT UNIQUE,
+            role TEXT NOT NULL DEFAULT 'staff',
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Settings table for system-wide configurations
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Transactions table for all financial records
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_type TEXT NOT NULL,  -- 'membership', 'income', 'expense'
+            amount DECIMAL(10, 2) NOT NULL,
+            description TEXT,
+            payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by INTEGER,
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS member_payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER NOT NULL,
+            transaction_id INTEGER NOT NULL,
+            payment_date TIMESTAMP NOT NULL,
+            due_date TIMESTAMP NOT NULL,
+            status TEXT DEFAULT 'paid',  -- 'paid', 'pending', 'overdue'
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id),
+            FOREIGN KEY (member_id) REFERENCES members(id)
+        )
+    ''')
+
+    # Default admin user if no users exist
+    cursor.execute("SELECT COUNT(*) FROM users")
+    if cursor.fetchone()[0] == 0:
+        import bcrypt
+        password_hash = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt())  # Change this in production!
+        cursor.execute('''
+            INSERT INTO users (username, password_hash, full_name, email, role, is_active)
+            VALUES (?, ?, ?, ?, ?, 1)
+        ''', ("admin", password_hash, "System Administrator", "admin@gym.com", "admin"))
+
+    # Default monthly fee if not set
+    cursor.execute("SELECT value FROM settings WHERE key = 'monthly_fee'")
+    if not cursor.fetchone():
+        cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)",
+                       ('monthly_fee', '500000'))  # Default 500,000 Tomans
+
+
+def _m002_equipment(cursor):
+    """Equipment table used by ManageWidget, which nothing created before."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS equipment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            purchase_date TEXT,
+            description TEXT,
+            status TEXT DEFAULT 'سالم و ایمن',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_equipment_created_at ON equipment(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_equipment_status ON equipment(status)")
+
+
+def _m003_query_indexes(cursor):
+    """Secondary indexes for the membership, payment and income queries.
+
+    member_payments.member_id was declared INTEGER while members.id is TEXT;
+    the affinity mismatch stops SQLite from using members' primary key for
+    the join, so the column is rebuilt as TEXT first. Each stored value is
+    mapped to the members.id it matched under the old numeric comparison,
+    so ids with leading zeros keep joining. NOT NULL is dropped because the
+    tables reset_payments.py used to create allowed NULLs.
+    """
+    cursor.execute("SELECT type FROM pragma_table_info('member_payments') WHERE name = 'member_id'")
+    row = cursor.fetchone()
+    if row and row[0].upper() != 'TEXT':
+        cursor.execute('''
+            CREATE TABLE member_payments_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                member_id TEXT,
+                transaction_id INTEGER,
+                payment_date TIMESTAMP,
+                due_date TIMESTAMP,
+                status TEXT DEFAULT 'paid',  -- 'paid', 'pending', 'overdue'
+                FOREIGN KEY (transaction_id) REFERENCES transactions(id),
+                FOREIGN KEY (member_id) REFERENCES members(id)
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO member_payments_new (id, member_id, transaction_id, payment_date, due_date, status)
+            SELECT mp.id,
+                   COALESCE((SELECT m.id FROM members m WHERE m.id = CAST(mp.member_id AS TEXT)),
+                            (SELECT m.id FROM members m WHERE m.id = mp.member_id),
+                            CAST(mp.member_id AS TEXT)),
+                   mp.transaction_id, mp.payment_date, mp.due_date, mp.status
+            FROM member_payments mp
+        ''')
+        cursor.execute("DROP TABLE member_payments")
+        cursor.execute("ALTER TABLE member_payments_new RENAME TO member_payments")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_end_date ON members(end_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_start_date ON members(start_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_gender ON members(gender)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_member_payments_member_date ON member_payments(member_id, payment_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_member_payments_payment_date ON member_payments(payment_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_member_payments_transaction ON member_payments(transaction_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_type_date ON transactions(transaction_type, payment_date)")
+
+
+def _m004_dashboard_counters(cursor):
+    """Dashboard counters kept current by triggers on members.
+
+    ``dashboard_counters`` holds 'total', one 'gender:<value>' row per gender,
+    and the two date-window counts 'expiring' and 'recent'. The windows are
+    relative to today, so their bounds live in the single ``dashboard_window``
+    row; the triggers compare against those bounds and Database rolls them
+    forward on the first read of a new day. as_of starts NULL so that first
+    read also seeds the window counts.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_window (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            as_of TEXT,
+            recent_from TEXT,
+            expiring_from TEXT,
+            expiring_to TEXT
+        )
+    ''')
+    cursor.execute("DELETE FROM dashboard_counters")
+    cursor.execute("INSERT INTO dashboard_counters (key, value) SELECT 'total', COUNT(*) FROM members")
+    cursor.execute('''
+        INSERT INTO dashboard_counters (key, value)
+        SELECT 'gender:' || gender, COUNT(*) FROM members WHERE gender IS NOT NULL GROUP BY gender
+    ''')
+    cursor.execute("INSERT INTO dashboard_counters (key, value) VALUES ('expiring', 0), ('recent', 0)")
+    cursor.execute("INSERT OR REPLACE INTO dashboard_window (id, as_of) VALUES (1, NULL)")
+
+    # One statement list per direction; the update trigger runs both.
+    remove_old = '''
+        UPDATE dashboard_counters SET value = value - 1 WHERE key = 'gender:' || OLD.gender;
+        UPDATE dashboard_counters SET value = value - 1
+        WHERE key = 'expiring'
+          AND OLD.start_date BETWEEN (SELECT expiring_from FROM dashboard_window WHERE id = 1)
+                                 AND (SELECT expiring_to FROM dashboard_window WHERE id = 1);
+        UPDATE dashboard_counters SET value = value - 1
+        WHERE key = 'recent'
+          AND OLD.start_date >= (SELECT recent_from FROM dashboard_window WHERE id = 1);
+    '''
+    add_new = '''
+        INSERT INTO dashboard_counters (key, value) SELECT 'gender:' || NEW.gender, 1 WHERE NEW.gender IS NOT NULL
+        ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        UPDATE dashboard_counters SET value = value + 1
+        WHERE key = 'expiring'
+          AND NEW.start_date BETWEEN (SELECT expiring_from FROM dashboard_window WHERE id = 1)
+                                 AND (SELECT expiring_to FROM dashboard_window WHERE id = 1);
+        UPDATE dashboard_counters SET value = value + 1
+        WHERE key = 'recent'
+          AND NEW.start_date >= (SELECT recent_from FROM dashboard_window WHERE id = 1);
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_members_counters_insert AFTER INSERT ON members
+        BEGIN
+            UPDATE dashboard_counters SET value = value + 1 WHERE key = 'total';
+            {add_new}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_members_counters_delete AFTER DELETE ON members
+        BEGIN
+            UPDATE dashboard_counters SET value = value - 1 WHERE key = 'total';
+            {remove_old}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_members_counters_update AFTER UPDATE OF gender, start_date ON members
+        BEGIN
+            {remove_old}
+            {add_new}
+        END
+    ''')
+
+
+# Jalali years covered by jalali_months (about 1921-2121 Gregorian).
+JALALI_MONTHS_YEARS = range(1300, 1500)
+
+# Rollup period expressions over a payment_date value ``{d}``. Periods are
+# never NULL so every transaction lands in some row.
+_ROLLUP_PERIODS = [
+    ('day', "COALESCE(substr({d}, 1, 10), '')"),
+    ('month', "COALESCE(substr({d}, 1, 7), '')"),
+    ('jmonth', '''COALESCE((SELECT jm.jmonth FROM jalali_months jm
+                            WHERE jm.g_start <= substr({d}, 1, 10) AND jm.g_end >= substr({d}, 1, 10)
+                            ORDER BY jm.g_start DESC LIMIT 1), '')'''),
+    ('all', "''"),
+]
+
+
+def rebuild_revenue_rollup(cursor):
+    """Recompute revenue_rollup from transactions. Returns the number of rollup rows."""
+    cursor.execute("DELETE FROM revenue_rollup")
+    for kind, period in _ROLLUP_PERIODS:
+        cursor.execute(f'''
+            INSERT INTO revenue_rollup (kind, period, transaction_type, total, count)
+            SELECT '{kind}', p, transaction_type, SUM(amount), COUNT(*)
+            FROM (SELECT {period.format(d='payment_date')} AS p, transaction_type, amount FROM transactions)
+            GROUP BY p, transaction_type
+        ''')
+    cursor.execute("SELECT COUNT(*) FROM revenue_rollup")
+    return cursor.fetchone()[0]
+
+
+def _m005_revenue_rollup(cursor):
+    """Income totals per day, Gregorian month, Jalali month and overall.
+
+    revenue_rollup has one row per (kind, period, transaction_type) and is
+    kept current by triggers on transactions. Jalali months are looked up in
+    jalali_months, filled here once, so the triggers stay plain SQL that
+    any writer of the database can run.
+    """
+    import jdatetime
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jalali_months (
+            jmonth TEXT PRIMARY KEY,  -- 'YYYY-MM' in the Jalali calendar
+            g_start TEXT NOT NULL,    -- first Gregorian day of the month
+            g_end TEXT NOT NULL       -- last Gregorian day of the month
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jalali_months_g_start ON jalali_months(g_start)")
+    rows = []
+    for year in JALALI_MONTHS_YEARS:
+        for month in range(1, 13):
+            start = jdatetime.date(year, month, 1)
+            following = jdatetime.date(year + 1, 1, 1) if month == 12 else jdatetime.date(year, month + 1, 1)
+            last = following.togregorian() - timedelta(days=1)
+            rows.append((f"{year:04d}-{month:02d}", start.togregorian().isoformat(), last.isoformat()))
+    cursor.executemany("INSERT OR REPLACE INTO jalali_months (jmonth, g_start, g_end) VALUES (?, ?, ?)", rows)
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revenue_rollup (
+            kind TEXT NOT NULL,       -- 'day', 'month', 'jmonth' or 'all'
+            period TEXT NOT NULL,     -- '' for 'all'
+            transaction_type TEXT NOT NULL,
+            total NUMERIC NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, period, transaction_type)
+        ) WITHOUT ROWID
+    ''')
+    rebuild_revenue_rollup(cursor)
+
+    def apply(row, sign):
+        statements = []
+        for kind, period in _ROLLUP_PERIODS:
+            statements.append(f'''
+                INSERT INTO revenue_rollup (kind, period, transaction_type, total, count)
+                VALUES ('{kind}', {period.format(d=f'{row}.payment_date')}, {row}.transaction_type,
+                        {sign}{row}.amount, {sign}1)
+                ON CONFLICT(kind, period, transaction_type)
+                DO UPDATE SET total = total + excluded.total, count = count + excluded.count;''')
+        return ''.join(statements)
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert AFTER INSERT ON transactions
+        BEGIN {apply('NEW', '')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete AFTER DELETE ON transactions
+        BEGIN {apply('OLD', '-')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update
+        AFTER UPDATE OF amount, payment_date, transaction_type ON transactions
+        BEGIN {apply('OLD', '-')} {apply('NEW', '')}
+        END
+    ''')
+
+
+def _m006_member_search(cursor):
+    """Trigram full-text index over members' id, name, family and phone.
+
+    members_fts is an external-content FTS5 table: it indexes members by
+    rowid without storing a second copy of the text, and the triggers below
+    keep it in step with every write. The trigram tokenizer matches any
+    substring of three or more characters, which is what the old
+    LIKE '%x%' search did, but through the index.
+
+    Any existing index is dropped first: after reset_schema_version the
+    table may be migration 7's, over columns the rebuilt members lacks.
+    """
+    for suffix in ('insert', 'delete', 'update'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_members_fts_{suffix}")
+    cursor.execute("DROP TABLE IF EXISTS members_fts")
+    cursor.execute('''
+        CREATE VIRTUAL TABLE members_fts USING fts5(
+            id, name, family, phone,
+            content='members', content_rowid='rowid', tokenize='trigram'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_members_fts_insert AFTER INSERT ON members
+        BEGIN
+            INSERT INTO members_fts (rowid, id, name, family, phone)
+            VALUES (NEW.rowid, NEW.id, NEW.name, NEW.family, NEW.phone);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_members_fts_delete AFTER DELETE ON members
+        BEGIN
+            INSERT INTO members_fts (members_fts, rowid, id, name, family, phone)
+            VALUES ('delete', OLD.rowid, OLD.id, OLD.name, OLD.family, OLD.phone);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_members_fts_update AFTER UPDATE OF id, name, family, phone ON members
+        BEGIN
+            INSERT INTO members_fts (members_fts, rowid, id, name, family, phone)
+            VALUES ('delete', OLD.rowid, OLD.id, OLD.name, OLD.family, OLD.phone);
+            INSERT INTO members_fts (rowid, id, name, family, phone)
+            VALUES (NEW.rowid, NEW.id, NEW.name, NEW.family, NEW.phone);
+        END
+    ''')
+    cursor.execute("INSERT INTO members_fts (members_fts) VALUES ('rebuild')")
+
+
+# members columns with a normalized shadow column: (column, shadow, is_phone)
+_NORMALIZED_MEMBER_COLUMNS = [
+    ('id', 'id_norm', False),
+    ('name', 'name_norm', False),
+    ('family', 'family_norm', False),
+    ('phone', 'phone_norm', True),
+]
+
+
+def _member_norm_updates(source_prefix, where):
+    """UPDATE statements filling the members.*_norm columns, step by step."""
+    columns = [(sql_normalize_steps(f"{source_prefix}{column}", shadow, is_phone), shadow)
+               for column, shadow, is_phone in _NORMALIZED_MEMBER_COLUMNS]
+    statements = []
+    for index in range(max(len(steps) for steps, _shadow in columns)):
+        assignments = ', '.join(f"{shadow} = {steps[index]}" for steps, shadow in columns if index < len(steps))
+        statements.append(f"UPDATE members SET {assignments} {where};")
+    return statements
+
+
+def _m007_normalized_search_keys(cursor):
+    """Normalized shadow columns for member search, and the index rebuilt on them.
+
+    id_norm, name_norm, family_norm and phone_norm hold text_utils'
+    normalized forms. Triggers compute them in plain SQL on every write, so
+    rows written outside the app are normalized too, and then refresh
+    members_fts, which now indexes the normalized columns instead of the raw
+    ones. The columns are also indexed for short prefix lookups.
+    """
+    for _column, shadow, _is_phone in _NORMALIZED_MEMBER_COLUMNS:
+        _add_column(cursor, 'members', shadow, 'TEXT')
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_members_{shadow} ON members({shadow})")
+    for statement in _member_norm_updates('', ''):
+        cursor.execute(statement)
+
+    for suffix in ('insert', 'delete', 'update'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_members_fts_{suffix}")
+    cursor.execute("DROP TABLE IF EXISTS members_fts")
+    cursor.execute('''
+        CREATE VIRTUAL TABLE members_fts USING fts5(
+            id_norm, name_norm, family_norm, phone_norm,
+            content='members', content_rowid='rowid', tokenize='trigram'
+        )
+    ''')
+    cursor.execute("INSERT INTO members_fts (members_fts) VALUES ('rebuild')")
+
+    index_new = '''
+        INSERT INTO members_fts (rowid, id_norm, name_norm, family_norm, phone_norm)
+        SELECT rowid, id_norm, name_norm, family_norm, phone_norm FROM members WHERE rowid = NEW.rowid;
+    '''
+    unindex_old = '''
+        INSERT INTO members_fts (members_fts, rowid, id_norm, name_norm, family_norm, phone_norm)
+        VALUES ('delete', OLD.rowid, OLD.id_norm, OLD.name_norm, OLD.family_norm, OLD.phone_norm);
+    '''
+    normalize_new = '\n'.join(_member_norm_updates('NEW.', 'WHERE rowid = NEW.rowid'))
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_members_norm_insert AFTER INSERT ON members
+        BEGIN
+            {normalize_new}
+            {index_new}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_members_norm_update AFTER UPDATE OF id, name, family, phone ON members
+        BEGIN
+            {unindex_old}
+            {normalize_new}
+            {index_new}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_members_norm_delete AFTER DELETE ON members
+        BEGIN
+            {unindex_old}
+        END
+    ''')
+
+
+# Tables whose writes go to change_log: table -> (key column, columns whose update is a change).
+# Only the member columns the app shows count; the *_norm shadow columns are derived.
+CHANGE_LOG_TABLES = {
+    'members': ('id', 'id, name, family, gender, phone, join_date, start_date, end_date'),
+    'member_payments': ('id', None),
+    'transactions': ('id', None),
+    'equipment': ('id', None),
+    'settings': ('key', None),
+}
+
+
+def _m008_change_log(cursor):
+    """change_log: one row per written row of the tables the UI shows, from any connection.
+
+    The app watches PRAGMA data_version and reads the log to refresh just the
+    rows another process (a maintenance script, a second copy of the app)
+    changed. row_key has no declared type so integer ids stay integers.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key,
+            operation TEXT NOT NULL
+        )
+    ''')
+    for table, (key, columns) in CHANGE_LOG_TABLES.items():
+        log = "INSERT INTO change_log (table_name, row_key, operation) VALUES ('{table}', {row}.{key}, '{op}');"
+        update_of = f" OF {columns}" if columns else ""
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_log_insert AFTER INSERT ON {table}
+            BEGIN {log.format(table=table, row='NEW', key=key, op='insert')}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_log_delete AFTER DELETE ON {table}
+            BEGIN {log.format(table=table, row='OLD', key=key, op='delete')}
+            END
+        ''')
+        # A changed key reads as the old row deleted and the new one updated
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_log_update AFTER UPDATE{update_of} ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_key, operation)
+                SELECT '{table}', OLD.{key}, 'delete' WHERE OLD.{key} IS NOT NEW.{key};
+                {log.format(table=table, row='NEW', key=key, op='update')}
+            END
+        ''')
+
+
+# Ordered registry: (version, description, step). Append only; never renumber.
+MIGRATIONS = [
+    (1, "base schema", _m001_base_schema),
+    (2, "equipment table", _m002_equipment),
+    (3, "query indexes", _m003_query_indexes),
+    (4, "dashboard counters", _m004_dashboard_counters),
+    (5, "revenue rollup", _m005_revenue_rollup),
+    (6, "member search index", _m006_member_search),
+    (7, "normalized search keys", _m007_normalized_search_keys),
+    (8, "change log", _m008_change_log),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration to ``conn`` and return the resulting version."""
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+    if conn.in_transaction:
+        conn.commit()
+    for target, description, step in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            version = get_schema_version(conn)
+            if version >= target:
+                conn.rollback()
+                continue
+            step(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+        print(f"Applied migration {target}: {description}")
+    return version
+
+
+def reset_schema_version(conn, version=0):
+    """Force the recorded version back so the next start re-runs later migrations."""
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+
@@ -0,0 +1,27 @@
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Dir.migrations import migrate, rebuild_revenue_rollup
+
+
+def rebuild(db_path=None):
+    # Recompute the income rollup from transactions, e.g. after editing
+    # transactions with the triggers dropped or restoring an old backup
+    db_path = db_path or os.path.join(os.path.dirname(__file__), 'gym.db')
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = rebuild_revenue_rollup(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    print(f"Revenue rollup rebuilt: {rows} rows.")
+
+if __name__ == "__main__":
+    rebuild(sys.argv[1] if len(sys.argv) > 1 else None)
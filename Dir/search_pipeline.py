@@ -0,0 +1,79 @@
+"""Debounced, cancellable search-as-you-type.
+
+Keystrokes only restart a timer; the query runs once typing pauses for the
+debounce interval. A query that merely narrows the last completed one is
+answered by filtering that result in memory, and anything else goes to the
+database on the data service, where a newer query cancels an older one.
+"""
+from PyQt5 import QtCore
+
+from .data_service import data_service
+from .text_utils import normalize_text
+
+
+class SearchPipeline(QtCore.QObject):
+    """Turns a stream of search box texts into result sets.
+
+    search(text) runs on the data service thread. refine(rows, previous_text,
+    text), if given, runs on the GUI thread and returns the subset of rows
+    matching text, or None when the previous result cannot answer text.
+    resultsReady carries (text, rows); rows is None for a blank query.
+    """
+
+    DEFAULT_INTERVAL_MS = 250
+
+    resultsReady = QtCore.pyqtSignal(str, object)
+    failed = QtCore.pyqtSignal(object)
+
+    def __init__(self, search, refine=None, interval_ms=DEFAULT_INTERVAL_MS, channel='search', parent=None):
+        super().__init__(parent)
+        self.search = search
+        self.refine = refine
+        self.channel = channel
+        self._pending = ''
+        self._last = None  # (text, rows) of the last completed search
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run)
+        self.set_interval(interval_ms)
+
+    def set_interval(self, interval_ms):
+        self._timer.setInterval(max(int(interval_ms), 0))
+
+    def set_text(self, text):
+        """Called for each keystroke; only the text present when typing pauses is searched."""
+        self._pending = text or ''
+        self._timer.start()
+
+    def search_now(self, text=None):
+        """Search text (default: the pending text) at once, from the database."""
+        if text is not None:
+            self._pending = text
+        self._last = None
+        self._timer.stop()
+        self._run()
+
+    def invalidate(self):
+        """Forget the last result after a write, so the next query is not refined from stale rows."""
+        self._last = None
+
+    def _run(self):
+        text = self._pending
+        if not (normalize_text(text) or '').split():
+            data_service.cancel(self.channel)
+            self._last = None
+            self.resultsReady.emit(text, None)
+            return
+        if self._last is not None and self.refine is not None:
+            rows = self.refine(self._last[1], self._last[0], text)
+            if rows is not None:
+                self._last = (text, rows)
+                data_service.cancel(self.channel)
+                self.resultsReady.emit(text, rows)
+                return
+        data_service.submit(self.search, text, channel=self.channel).then(
+            lambda rows: self._finish(text, rows), self.failed.emit)
+
+    def _finish(self, text, rows):
+        self._last = (text, rows)
+        self.resultsReady.emit(text, rows)
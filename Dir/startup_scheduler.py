@@ -0,0 +1,58 @@
+"""Work deferred until the main window has been painted.
+
+Building every screen inside setupUi kept the window from appearing until
+all of them existed. Instead, setupUi builds the dashboard and queues the
+rest here; once the event loop is running the steps run one per turn, each
+from a zero-delay timer, so paint and input events are handled between them:
+
+    startup.add('payments', self.ensure_payment_widget)
+    startup.start()
+
+A step that is still queued when the user asks for its screen is simply
+done on the spot by the screen's ensure_* method; when its turn comes it
+finds the screen built and returns at once.
+"""
+import time
+from collections import deque
+
+from PyQt5 import QtCore
+
+
+class StartupScheduler(QtCore.QObject):
+    """Runs queued steps on the GUI thread, one per event loop turn."""
+
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._steps = deque()
+        self._running = False
+        # name -> seconds the step took, for checking startup cost
+        self.timings = {}
+
+    def add(self, name, step):
+        self._steps.append((name, step))
+
+    def pending(self):
+        return [name for name, _step in self._steps]
+
+    def start(self):
+        """Begin running the steps once control returns to the event loop."""
+        if not self._running:
+            self._running = True
+            QtCore.QTimer.singleShot(0, self._run_next)
+
+    def _run_next(self):
+        if not self._steps:
+            self._running = False
+            self.finished.emit()
+            return
+        name, step = self._steps.popleft()
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # A screen that fails here is built (and reports) again when opened
+            print(f"Startup step {name} failed: {e}")
+        self.timings[name] = time.perf_counter() - start
+        QtCore.QTimer.singleShot(0, self._run_next)
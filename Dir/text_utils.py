@@ -0,0 +1,76 @@
+"""Normalization of Persian text used as search keys.
+
+Desk input mixes Arabic and Persian letters (ي/ی, ك/ک), zero-width joiners
+and Persian, Arabic-Indic or ASCII digits. normalize_text folds all of these
+to one form. The same folding is available as a SQL expression so triggers
+can fill the members.*_norm shadow columns for any writer of the database,
+and query text is run through the Python version before matching.
+"""
+
+# Single characters replaced by another string ('' drops them).
+_CHAR_MAP = {
+    '\u064a': '\u06cc',  # Arabic yeh -> Persian yeh
+    '\u0649': '\u06cc',  # Alef maksura -> Persian yeh
+    '\u0643': '\u06a9',  # Arabic kaf -> Persian keheh
+    '\u200c': '',        # Zero-width non-joiner
+    '\u200d': '',        # Zero-width joiner
+    '\u200b': '',        # Zero-width space
+    '\ufeff': '',        # Byte order mark
+    '\u0640': '',        # Tatweel
+}
+# Harakat and superscript alef
+for _code in list(range(0x064B, 0x0653)) + [0x0670]:
+    _CHAR_MAP[chr(_code)] = ''
+# Persian and Arabic-Indic digits -> ASCII
+for _digit in range(10):
+    _CHAR_MAP[chr(0x06F0 + _digit)] = str(_digit)
+    _CHAR_MAP[chr(0x0660 + _digit)] = str(_digit)
+
+# Separators dropped from phone numbers after normalize_text.
+PHONE_SEPARATORS = ' -()./'
+
+# SQLite's lower() only folds ASCII, so Python folds exactly the same set.
+_TEXT_TABLE = str.maketrans({**_CHAR_MAP, **{chr(c): chr(c + 32) for c in range(ord('A'), ord('Z') + 1)}})
+_PHONE_TABLE = str.maketrans({sep: '' for sep in PHONE_SEPARATORS})
+
+
+def normalize_text(value):
+    """Fold a name, id or query to its search form; None stays None."""
+    if value is None:
+        return None
+    return str(value).translate(_TEXT_TABLE)
+
+
+def normalize_phone(value):
+    """normalize_text plus removal of the usual phone separators."""
+    if value is None:
+        return None
+    return normalize_text(value).translate(_PHONE_TABLE)
+
+
+# SQLite's parser overflows at about 30 nested calls, so the replace() chain
+# is split into steps of at most this many.
+_SQL_STEP_SIZE = 12
+
+
+def _sql_replace_chain(expr, items):
+    for source, target in items:
+        expr = f"replace({expr}, '{source}', '{target}')"
+    return expr
+
+
+def sql_normalize_steps(source, current, phone=False):
+    """SQL expressions that together compute normalize_text (or normalize_phone).
+
+    The first expression reads ``source``; each later one refines ``current``,
+    the column the previous step was stored in, so callers run them as
+    successive ``SET current = <step>`` updates.
+    """
+    items = list(_CHAR_MAP.items())
+    if phone:
+        items += [(sep, '') for sep in PHONE_SEPARATORS]
+    steps = []
+    for start in range(0, len(items), _SQL_STEP_SIZE):
+        steps.append(_sql_replace_chain(current if steps else source, items[start:start + _SQL_STEP_SIZE]))
+    steps[0] = f"lower({steps[0]})"
+    return steps
@@ -0,0 +1,76 @@
+"""One style sheet for the app's repeated widgets, parsed once.
+
+Widgets built per row (the equipment cards) used to call setStyleSheet on
+themselves and on each of their children, so every card re-parsed the same
+CSS and was polished from scratch. Here those rules are compiled once into
+a single sheet. Widgets select rules by object name, and by dynamic
+properties for state, such as an equipment status:
+
+    label.setObjectName('equipmentStatus')
+    theme.set_state(label, 'status', 'broken')
+
+The sheet is installed once on each screen that hosts themed widgets,
+not on the QApplication: the main window's Designer style sheets have no
+selectors and so apply to every descendant, and Qt prefers an ancestor's
+sheet over the application's. An app-wide sheet would also move every
+widget onto the style sheet style for rules that only match these screens.
+"""
+from functools import lru_cache
+
+FONT = "'B Yekan'"
+
+# Card buttons: the purple gradient of the card actions, and solid colours
+GRADIENT = ("qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:0, stop:0 rgba(51, 153, 255, 255), "
+            "stop:0.55 rgba(102, 0, 255, 255), stop:0.98 rgba(255, 0, 255, 255), stop:1 rgba(0, 0, 0, 0))")
+
+# Equipment status -> state name used in the sheet, and the colour of each state
+EQUIPMENT_STATES = {
+    'سالم و ایمن': 'ok',
+    'نیازمند تعمیر': 'broken',
+    'خراب': 'broken',
+    'در حال تعمیر': 'repairing',
+}
+STATE_COLORS = {'ok': '#009966', 'broken': '#d32f2f', 'repairing': '#ff9800', 'unknown': '#666'}
+
+
+def _equipment_card_rules():
+    card = "QWidget#equipmentCard"
+    rules = [
+        f"{card}, {card} QWidget {{ background: rgba(255,255,255,100); border-radius: 18px; "
+        f"padding: 18px; font-family: {FONT}; }}",
+        f"{card} QLabel {{ background: transparent; border-radius: 0; padding: 0 10px; color: black; }}",
+        f"{card} QLabel#equipmentName {{ font-size: 18pt; font-weight: bold; }}",
+        f"{card} QLabel#equipmentDate {{ font-size: 12pt; }}",
+        f"{card} QLabel#equipmentStatus {{ font-size: 12pt; font-weight: bold; }}",
+        f"{card} QLabel#equipmentDescription {{ font-size: 11pt; color: #666; }}",
+        f"{card} QLineEdit, {card} QComboBox {{ font-size: 15pt; padding: 8px 16px; border-radius: 8px; }}",
+        f"{card} QPushButton {{ color: white; font-size: 12pt; border-radius: 8px; padding: 6px 18px; }}",
+        f"{card} QPushButton#editButton {{ background-color: {GRADIENT}; }}",
+        f"{card} QPushButton#deleteButton {{ background: #d32f2f; }}",
+        f"{card} QPushButton#saveButton {{ background: #009966; padding: 8px 16px; }}",
+        f"{card} QPushButton#cancelButton {{ background: #888; padding: 8px 16px; }}",
+    ]
+    for state, color in STATE_COLORS.items():
+        rules.append(f'{card} QLabel#equipmentStatus[status="{state}"] {{ color: {color}; }}')
+    return rules
+
+
+@lru_cache(maxsize=None)
+def stylesheet():
+    """The compiled style sheet."""
+    return "\n".join(_equipment_card_rules())
+
+
+def apply(target):
+    """Install the sheet on a screen's root widget."""
+    target.setStyleSheet(stylesheet())
+
+
+def set_state(widget, name, value):
+    """Set a dynamic property the sheet selects on, and restyle the widget if it changed."""
+    if widget.property(name) == value:
+        return
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
@@ -0,0 +1,42 @@
+"""Recount the trigger-maintained dashboard counters and report any drift.
+
+The counters only stay right while every write goes through the members
+triggers; a restored backup or a script that dropped them can leave them
+off. This recounts them from members and prints each one that disagrees;
+with --fix the recounted values are written back. Exits with 1 if drift
+was found and not fixed.
+
+Run from the project root:
+
+    python -m Dir.verify_dashboard_counters [--fix] [--db path/to/gym.db]
+"""
+import argparse
+import sys
+
+from .database import Database
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fix', action='store_true', help="write the recounted values back")
+    parser.add_argument('--db', help="database file (default: the app's database)")
+    args = parser.parse_args(argv)
+    database = Database(args.db)
+    try:
+        drift = database.verify_dashboard_counters(fix=args.fix)
+    finally:
+        database.close_all()
+    for key, (stored, actual) in sorted(drift.items()):
+        print(f"  {key}: stored {stored}, actual {actual}")
+    if not drift:
+        print("OK")
+        return 0
+    if args.fix:
+        print(f"\nFixed {len(drift)} counters")
+        return 0
+    print(f"\n{len(drift)} counters drifted; run with --fix to correct them")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())